@@ -3,34 +3,22 @@
 """
 import os
 import json
+import functools
+import uuid
 import subprocess
-from flask import Flask, request, jsonify, send_file
+import click
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import NotFound
 from werkzeug.utils import secure_filename
 from datetime import datetime
+from sqlalchemy.engine import make_url
 
 from config import config_map, Config
-from models import db, Report, Vulnerability, VulnInstance, FixStatus, SeverityLevel, OperationLog
-PROT = 10000
-
-def _ensure_database_exists():
-    """確保資料庫存在，不存在則建立"""
-    import pymysql
-    try:
-        conn = pymysql.connect(
-            host=Config.DB_HOST,
-            port=int(Config.DB_PORT),
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD,
-            charset='utf8mb4'
-        )
-        db_name = Config.DB_NAME
-        with conn.cursor() as cursor:
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-        conn.close()
-        print(f"✅ 資料庫 '{db_name}' 已就緒")
-    except Exception as e:
-        print(f"⚠️ 無法自動建立資料庫: {e}")
+import database
+import metrics
+import query_budget
+from models import db, Report, SeverityLevel
 
 
 def create_app(config_name='default'):
@@ -41,50 +29,80 @@ def create_app(config_name='default'):
     CORS(app, 
          origins=Config.CORS_ORIGINS,
          methods=Config.CORS_METHODS,
-         allow_headers=Config.CORS_HEADERS)
+         allow_headers=Config.CORS_HEADERS,
+         expose_headers=Config.CORS_EXPOSE_HEADERS)
     
     # 確保資料夾存在
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['EXPORT_FOLDER'], exist_ok=True)
     
-    # 自動建立資料庫（如果不存在）
-    _ensure_database_exists()
-    
-    # 初始化資料庫
+    # 初始化資料庫（只設定 engine，不連線；建立資料庫與資料表由 init-db 負責，
+    # 多個 worker 行程啟動時不會各自執行 CREATE DATABASE / create_all）
+    database.configure(app)
     db.init_app(app)
-    
     with app.app_context():
-        db.create_all()
+        metrics.init_app(app, db.engine)
+        query_budget.init_app(app, db.engine)
     
     # 引入 services（在 app context 之後）
-    from services import ReportService, StatusService, LogService
+    from services import ReportService, StatusService, LogService, JobService, CounterService, InstanceService, TreeService, SchemaService, DiffService
+    from search import SearchService
+    from pagination import keyset_page, cached_count, get_limit
+    from cache import cached, invalidate, invalidate_all
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """建立資料庫與資料表（部署或升級後、啟動 worker 前執行一次）"""
+        from init_db import create_database
+        create_database(app.config['SQLALCHEMY_DATABASE_URI'])
+        changes = SchemaService.upgrade()
+        click.echo(f'資料表已就緒（{len(changes)} 項變更）')
+    
+    @app.cli.command('rebuild-counters')
+    @click.option('--report-id', type=int, default=None, help='只重建指定報告')
+    def rebuild_counters_command(report_id):
+        """由原始資料重建 report_counters 與漏洞實例數"""
+        CounterService.rebuild(report_id)
+        click.echo('統計計數已重建')
+    
+    @app.cli.command('reindex-search')
+    @click.option('--report-id', type=int, default=None, help='只重建指定報告')
+    def reindex_search_command(report_id):
+        """重建全文搜尋索引"""
+        count = SearchService.reindex(report_id)
+        click.echo(f'搜尋索引已重建（{count} 筆文件）')
+    
+    from jobs import get_runner, run_import_job, run_bulk_import_job, run_restore_job
     
     # ==================== API 路由 ====================
     
     # --- 儀表板統計 ---
     @app.route('/api/dashboard/stats')
+    @cached('dashboard')
+    @query_budget.limit(5)
     def api_dashboard_stats():
-        """取得儀表板統計資料"""
+        """取得儀表板統計資料（固定次數的彙總查詢，不載入實例列）"""
         total_reports = Report.query.count()
-        total_vulns = Vulnerability.query.count()
-        total_instances = VulnInstance.query.count()
         
         # 嚴重等級統計
-        severity_stats = {}
-        for level in SeverityLevel:
-            count = Vulnerability.query.filter_by(severity=level.value).count()
-            severity_stats[level.value] = count
+        severity_counts = ReportService.get_severity_counts()
+        severity_stats = {level.value: severity_counts.get(level.value, 0) for level in SeverityLevel}
+        total_vulns = sum(severity_counts.values())
         
         # 修復狀態統計
-        status_stats = StatusService.get_status_summary()
+        status_counts = StatusService.get_status_counts()
+        status_stats = StatusService.get_status_summary(counts=status_counts)
+        total_instances = sum(status_counts.values())
         
         # 最近報告
-        recent_reports = Report.query.order_by(Report.imported_at.desc()).limit(5).all()
+        recent_reports = db.session.query(Report.id, Report.site_url, Report.imported_at) \
+            .order_by(Report.imported_at.desc()).limit(5).all()
+        recent_stats = ReportService.get_report_stats([r.id for r in recent_reports])
         recent = [{
             'id': r.id,
             'site_url': r.site_url,
             'imported_at': r.imported_at.isoformat(),
-            'stats': r.stats
+            'stats': recent_stats[r.id]
         } for r in recent_reports]
         
         return jsonify({
@@ -96,89 +114,99 @@ def create_app(config_name='default'):
             'recent_reports': recent
         })
     
+    def _include_total():
+        """列表是否附帶總筆數（include_total=1，結果會短暫快取）"""
+        return request.args.get('include_total', '').lower() in ('1', 'true')
+    
+    # 差異結果只在共用的快取後端上延長存活時間：行程內快取的失效不會同步到其他行程
+    diff_cache_ttl = app.config.get('DIFF_CACHE_TTL') if app.config.get('CACHE_BACKEND') == 'redis' else None
+    
     # --- 報告 CRUD ---
     @app.route('/api/reports', methods=['GET'])
+    @query_budget.limit(3)
     def api_list_reports():
-        """列出所有報告"""
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        """列出所有報告（依匯入時間新到舊，以 cursor 分頁）"""
         search = request.args.get('search', '')
         
-        query = Report.query
+        query = db.select(Report.id, Report.site_url, Report.file_name, Report.imported_at, Report.notes)
         if search:
-            query = query.filter(Report.site_url.contains(search))
+            query = query.where(Report.site_url.contains(search))
         
-        pagination = query.order_by(Report.imported_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        try:
+            rows, next_cursor = keyset_page(
+                query, [(Report.imported_at, 'imported_at'), (Report.id, 'id')],
+                cursor=request.args.get('cursor'),
+                limit=get_limit(request.args.get('per_page', type=int), default=20)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
+        stats = ReportService.get_report_stats([r.id for r in rows])
         reports = [{
             'id': r.id,
             'site_url': r.site_url,
             'file_name': r.file_name,
             'imported_at': r.imported_at.isoformat(),
             'notes': r.notes,
-            'stats': r.stats,
-            'vuln_count': r.vulnerabilities.count()
-        } for r in pagination.items]
-        
-        return jsonify({
-            'reports': reports,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
-        })
+            'stats': stats[r.id],
+            'vuln_count': sum(stats[r.id].values())
+        } for r in rows]
+        
+        result = {'reports': reports, 'next_cursor': next_cursor}
+        if _include_total():
+            result['total'] = cached_count(('reports', search), query)
+        return jsonify(result)
     
     @app.route('/api/reports/<int:report_id>', methods=['GET'])
+    @cached('report:{report_id}')
+    @query_budget.limit(3)
     def api_get_report(report_id):
         """取得單一報告詳情"""
-        report = Report.query.get_or_404(report_id)
-        
-        vulnerabilities = []
-        for vuln in report.vulnerabilities:
-            instances = [{
-                'id': inst.id,
-                'url': inst.url,
-                'method': inst.method,
-                'parameter': inst.parameter,
-                'attack': inst.attack,
-                'evidence': inst.evidence,
-                'other_info': inst.other_info,
-                'extra_data': inst.extra_data,
-                'fix_status': inst.fix_status,
-                'fixed_at': inst.fixed_at.isoformat() if inst.fixed_at else None,
-                'fixed_by': inst.fixed_by,
-                'fix_notes': inst.fix_notes
-            } for inst in vuln.instances]
-            
-            vulnerabilities.append({
-                'id': vuln.id,
-                'severity': vuln.severity,
-                'title': vuln.title,
-                'description': vuln.description,
-                'instance_count': len(instances),
-                'instances': instances
-            })
-        
-        return jsonify({
-            'id': report.id,
-            'site_url': report.site_url,
-            'summary_sequences': report.summary_sequences,
-            'sequence_details': report.sequence_details,
-            'file_name': report.file_name,
-            'imported_at': report.imported_at.isoformat(),
-            'notes': report.notes,
-            'stats': report.stats,
-            'vulnerabilities': vulnerabilities
-        })
+        return jsonify(ReportService.get_report_detail(report_id))
+    
+    @app.route('/api/reports/<int:base_id>/diff/<int:compare_id>')
+    @cached('report:{base_id}', 'report:{compare_id}', ttl=diff_cache_ttl)
+    @query_budget.limit(4)
+    def api_diff_reports(base_id, compare_id):
+        """比較同一網站的兩份報告：新增、已解決與未變更的發現（include 指定回傳明細的類別）"""
+        try:
+            return jsonify(DiffService.diff(base_id, compare_id, request.args.get('include')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    @app.route('/api/reports/<int:report_id>/summary')
+    @cached('report:{report_id}')
+    @query_budget.limit(2)
+    def api_get_report_summary(report_id):
+        """取得報告摘要（漏洞清單與實例數，不含實例內容）"""
+        return jsonify(ReportService.get_report_summary(report_id))
+    
+    @app.route('/api/vulnerabilities/<int:vuln_id>/instances')
+    @query_budget.limit(2)
+    def api_list_vuln_instances(vuln_id):
+        """分頁列出漏洞實例（after/limit/fields/status/url）"""
+        try:
+            return jsonify(InstanceService.list_instances(
+                vuln_id,
+                after=request.args.get('after', type=int),
+                limit=request.args.get('limit', type=int),
+                fields=request.args.get('fields'),
+                status=request.args.get('status'),
+                url=request.args.get('url')
+            ))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    @app.route('/api/instances/<int:instance_id>')
+    @query_budget.limit(1)
+    def api_get_instance(instance_id):
+        """取得單一漏洞實例完整內容"""
+        return jsonify(InstanceService.get_instance(instance_id))
     
     @app.route('/api/reports/<int:report_id>', methods=['DELETE'])
     def api_delete_report(report_id):
         """刪除報告"""
-        report = Report.query.get_or_404(report_id)
-        site_url = report.site_url
-        db.session.delete(report)
-        db.session.commit()
+        site_url = ReportService.delete_report(report_id)
         
         # 記錄日誌
         LogService.log('DELETE', f'刪除報告: {site_url} (ID: {report_id})')
@@ -192,9 +220,49 @@ def create_app(config_name='default'):
         data = request.get_json()
         report.notes = data.get('notes', '')
         db.session.commit()
+        invalidate(f'report:{report_id}')
         return jsonify({'success': True, 'notes': report.notes})
     
     # --- 匯入匯出 ---
+    def _use_streaming():
+        """判斷本次匯入是否串流解析（可用 stream=0/1 參數覆寫 IMPORT_STREAMING）"""
+        value = request.args.get('stream', request.form.get('stream'))
+        if value is None:
+            return app.config.get('IMPORT_STREAMING', True)
+        return value.lower() in ('1', 'true')
+    
+    def _import_mode():
+        """本次匯入模式（可用 mode=append/upsert 參數覆寫 IMPORT_MODE），無效時拋出 ValueError"""
+        return ReportService.get_import_mode(request.args.get('mode', request.form.get('mode')))
+    
+    def _import_upload(file, mode):
+        """匯入單一上傳檔案"""
+        if _use_streaming():
+            return ReportService.import_json_stream(file.stream, file.filename, mode=mode)
+        return ReportService.import_json(json.load(file), file.filename, mode=mode)
+    
+    def _use_async():
+        """判斷本次匯入是否排入背景工作（可用 async=0/1 參數覆寫 IMPORT_ASYNC）"""
+        value = request.args.get('async', request.form.get('async'))
+        if value is None:
+            return app.config.get('IMPORT_ASYNC', True)
+        return value.lower() in ('1', 'true')
+    
+    def _stage_upload(file):
+        """將上傳檔案暫存到 UPLOAD_FOLDER，回傳暫存路徑"""
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'],
+                                f'{uuid.uuid4().hex}_{secure_filename(file.filename)}')
+        file.save(filepath)
+        return filepath
+    
+    def _job_accepted(job, message='已排入背景匯入'):
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': f'/api/jobs/{job.id}',
+            'message': message
+        }), 202
+    
     @app.route('/api/import', methods=['POST'])
     def api_import_json():
         """匯入 JSON 檔案"""
@@ -209,19 +277,33 @@ def create_app(config_name='default'):
             return jsonify({'error': '僅支援 JSON 檔案'}), 400
         
         try:
-            json_data = json.load(file)
-            report = ReportService.import_json(json_data, file.filename)
+            mode = _import_mode()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if _use_async():
+            filepath = _stage_upload(file)
+            job = JobService.create('IMPORT', file.filename, os.path.getsize(filepath))
+            get_runner(app).submit(run_import_job, job.id, filepath, file.filename, _use_streaming(), mode)
+            return _job_accepted(job)
+        
+        try:
+            report = _import_upload(file, mode)
+            stats = report.import_stats
             
             # 記錄日誌
-            LogService.log('IMPORT', f'匯入報告: {file.filename} → {report.site_url} (ID: {report.id})')
+            LogService.log('IMPORT', f'匯入報告: {file.filename} → {report.site_url} (ID: {report.id}, '
+                                     f'{stats["rows"]} 列, {stats["rows_per_sec"]} 列/秒)')
             
             return jsonify({
                 'success': True,
                 'report_id': report.id,
                 'site_url': report.site_url,
+                'stats': stats,
                 'message': '匯入成功'
             })
         except json.JSONDecodeError:
+            db.session.rollback()
             return jsonify({'error': 'JSON 格式錯誤'}), 400
         except Exception as e:
             db.session.rollback()
@@ -234,54 +316,74 @@ def create_app(config_name='default'):
             return jsonify({'error': '未提供檔案'}), 400
         
         files = request.files.getlist('files')
-        results = {'imported': [], 'errors': []}
-        
-        for file in files:
-            if not file.filename.endswith('.json'):
-                results['errors'].append({
-                    'file': file.filename,
-                    'error': '非 JSON 檔案'
-                })
-                continue
+        skipped = []
+        staged = []
+        
+        try:
+            mode = _import_mode()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            # 先暫存到 UPLOAD_FOLDER，由行程池平行解析
+            for file in files:
+                if not file.filename.endswith('.json'):
+                    skipped.append({
+                        'file': file.filename,
+                        'error': '非 JSON 檔案'
+                    })
+                    continue
+                
+                staged.append((_stage_upload(file), file.filename))
             
-            try:
-                json_data = json.load(file)
-                report = ReportService.import_json(json_data, file.filename)
-                results['imported'].append({
-                    'file': file.filename,
-                    'report_id': report.id,
-                    'site_url': report.site_url
-                })
-            except Exception as e:
-                db.session.rollback()
-                results['errors'].append({
-                    'file': file.filename,
-                    'error': str(e)
-                })
+            if _use_async():
+                total_bytes = sum(os.path.getsize(filepath) for filepath, _ in staged)
+                job = JobService.create('BULK_IMPORT', f'{len(staged)} 個檔案', total_bytes)
+                get_runner(app).submit(run_bulk_import_job, job.id, staged, skipped, mode)
+                staged = []  # 暫存檔交由背景工作清理
+                return _job_accepted(job)
+            
+            results = ReportService.parallel_import_files(staged, mode=mode)
+        finally:
+            for filepath, _ in staged:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+        
+        results['errors'] = skipped + results['errors']
         
         # 記錄日誌
         LogService.log('IMPORT', f'批次匯入: 成功 {len(results["imported"])} 個, 失敗 {len(results["errors"])} 個')
         
         return jsonify(results)
     
+    @app.route('/api/jobs/<job_id>')
+    @query_budget.limit(1)
+    def api_get_job(job_id):
+        """取得背景工作進度"""
+        job = JobService.get_job(job_id)
+        if job is None:
+            return jsonify({'error': '找不到工作'}), 404
+        return jsonify(job)
+    
     @app.route('/api/export/<int:report_id>')
+    @query_budget.limit(3)
     def api_export_report(report_id):
-        """匯出報告為 JSON"""
+        """匯出報告為 JSON（串流回應，可用 save=1 同時寫入 EXPORT_FOLDER）"""
         include_status = request.args.get('include_status', 'true').lower() == 'true'
+        save = request.args.get('save')
+        save = app.config.get('EXPORT_SAVE', False) if save is None else save.lower() in ('1', 'true')
         
+        filename = f"report_{report_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filepath = os.path.join(app.config['EXPORT_FOLDER'], filename) if save else None
         try:
-            data = ReportService.export_report(report_id, include_status)
-            
-            # 產生檔案
-            filename = f"report_{report_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(app.config['EXPORT_FOLDER'], filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            return send_file(filepath, as_attachment=True, download_name=filename)
+            chunks = ReportService.stream_export(report_id, include_status, filepath)
+        except NotFound:
+            return jsonify({'error': '報告不存在'}), 404
         except Exception as e:
             return jsonify({'error': str(e)}), 500
+        
+        return Response(stream_with_context(metrics.count_stream(chunks, 'json')), mimetype='application/json',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
     
     # --- 漏洞實例狀態更新 ---
     @app.route('/api/instances/<int:instance_id>/status', methods=['PUT'])
@@ -316,197 +418,134 @@ def create_app(config_name='default'):
     @app.route('/api/instances/batch-status', methods=['PUT'])
     def api_batch_update_status():
         """批次更新漏洞實例狀態"""
-        data = request.get_json()
-        instance_ids = data.get('instance_ids', [])
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': '參數不完整'}), 400
+        instance_ids = data.get('instance_ids') or []
+        filters = data.get('filter')
         status = data.get('status')
         notes = data.get('notes')
         fixed_by = data.get('fixed_by')
         
-        if not instance_ids or not status:
+        if not (instance_ids or filters) or not status:
             return jsonify({'error': '參數不完整'}), 400
+        if not isinstance(instance_ids, list):
+            return jsonify({'error': 'instance_ids 必須是陣列'}), 400
+        if filters:
+            if not isinstance(filters, dict):
+                return jsonify({'error': 'filter 必須是物件'}), 400
+            unknown = set(filters) - StatusService.FILTER_FIELDS
+            if unknown:
+                return jsonify({'error': f"不支援的篩選條件: {', '.join(sorted(unknown))}"}), 400
+            if any(not isinstance(value, (str, int)) or isinstance(value, bool) for value in filters.values()):
+                return jsonify({'error': '篩選條件的值必須是字串或整數'}), 400
         
-        updated = StatusService.batch_update_status(instance_ids, status, notes, fixed_by)
+        try:
+            if filters:
+                # 依條件更新（例如報告 X 中所有 Low 實例 → false_positive）
+                updated_count = StatusService.update_status_by_filter(filters, status, notes, fixed_by)
+                result = {'success': True, 'updated_count': updated_count}
+            else:
+                updated = StatusService.batch_update_status(instance_ids, status, notes, fixed_by)
+                updated_count = len(updated['updated'])
+                result = {
+                    'success': True,
+                    'updated_count': updated_count,
+                    'updated_ids': updated['updated'],
+                    'not_found': updated['not_found']
+                }
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # 記錄日誌
-        LogService.log('STATUS', f'批次更新狀態: {updated} 個實例 → {status}')
+        LogService.log('STATUS', f'批次更新狀態: {updated_count} 個實例 → {status}')
         
-        return jsonify({
-            'success': True,
-            'updated_count': updated
-        })
+        return jsonify(result)
     
     # --- 搜尋與篩選 ---
     @app.route('/api/search')
+    @query_budget.limit(2)
     def api_search():
-        """全域搜尋"""
-        q = request.args.get('q', '')
-        severity = request.args.get('severity')
-        status = request.args.get('status')
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        
-        query = VulnInstance.query.join(Vulnerability).join(Report)
-        
-        if q:
-            query = query.filter(
-                db.or_(
-                    VulnInstance.url.contains(q),
-                    Vulnerability.title.contains(q),
-                    Report.site_url.contains(q)
-                )
-            )
-        
-        if severity:
-            query = query.filter(Vulnerability.severity == severity)
-        
-        if status:
-            query = query.filter(VulnInstance.fix_status == status)
-        
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        results = [{
-            'instance_id': inst.id,
-            'url': inst.url,
-            'severity': inst.vulnerability.severity,
-            'title': inst.vulnerability.title,
-            'fix_status': inst.fix_status,
-            'report_id': inst.vulnerability.report.id,
-            'site_url': inst.vulnerability.report.site_url
-        } for inst in pagination.items]
-        
-        return jsonify({
-            'results': results,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
-        })
+        """全域搜尋（依相關度排序，以 cursor 分頁，見 search.py）"""
+        try:
+            return jsonify(SearchService.search(
+                q=request.args.get('q', '').strip(),
+                severity=request.args.get('severity'),
+                status=request.args.get('status'),
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('per_page', type=int),
+                include_total=_include_total()
+            ))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     # --- 漏洞樹狀結構 ---
     @app.route('/api/tree')
+    @cached('tree')
+    @query_budget.limit(3)
     def api_vuln_tree():
-        """取得漏洞樹狀結構（用於檔案樹視圖）"""
-        reports = Report.query.order_by(Report.imported_at.desc()).all()
-        
-        tree = []
-        for report in reports:
-            report_node = {
-                'id': f'report-{report.id}',
-                'name': report.site_url or report.file_name,
-                'type': 'report',
-                'children': []
-            }
-            
-            # 按嚴重等級分組
-            severity_groups = {}
-            for vuln in report.vulnerabilities:
-                if vuln.severity not in severity_groups:
-                    severity_groups[vuln.severity] = {
-                        'id': f'severity-{report.id}-{vuln.severity}',
-                        'name': vuln.severity,
-                        'type': 'severity',
-                        'children': []
-                    }
-                
-                vuln_node = {
-                    'id': f'vuln-{vuln.id}',
-                    'name': vuln.title,
-                    'type': 'vulnerability',
-                    'instance_count': vuln.instances.count(),
-                    'children': [{
-                        'id': f'instance-{inst.id}',
-                        'name': inst.url[:80] + '...' if len(inst.url) > 80 else inst.url,
-                        'type': 'instance',
-                        'status': inst.fix_status
-                    } for inst in vuln.instances]
-                }
-                severity_groups[vuln.severity]['children'].append(vuln_node)
-            
-            # 按嚴重等級排序
-            severity_order = ['High', 'Medium', 'Low', 'Informational']
-            for sev in severity_order:
-                if sev in severity_groups:
-                    report_node['children'].append(severity_groups[sev])
-            
-            tree.append(report_node)
-        
-        return jsonify(tree)
+        """取得漏洞樹狀結構（用於檔案樹視圖，depth=1-4 限制展開深度）"""
+        try:
+            return jsonify(TreeService.build_tree(depth=request.args.get('depth', type=int)))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     @app.route('/api/tree/<int:report_id>')
+    @cached('report:{report_id}')
+    @query_budget.limit(3)
     def api_vuln_tree_by_report(report_id):
         """取得單一報告的漏洞樹狀結構"""
-        report = Report.query.get_or_404(report_id)
-        
-        report_node = {
-            'id': f'report-{report.id}',
-            'name': report.site_url or report.file_name,
-            'type': 'report',
-            'children': []
-        }
-        
-        # 按嚴重等級分組
-        severity_groups = {}
-        for vuln in report.vulnerabilities:
-            if vuln.severity not in severity_groups:
-                severity_groups[vuln.severity] = {
-                    'id': f'severity-{report.id}-{vuln.severity}',
-                    'name': vuln.severity,
-                    'type': 'severity',
-                    'children': []
-                }
-            
-            vuln_node = {
-                'id': f'vuln-{vuln.id}',
-                'name': vuln.title,
-                'type': 'vulnerability',
-                'instance_count': vuln.instances.count(),
-                'children': [{
-                    'id': f'instance-{inst.id}',
-                    'name': inst.url[:80] + '...' if len(inst.url) > 80 else inst.url,
-                    'type': 'instance',
-                    'status': inst.fix_status
-                } for inst in vuln.instances]
-            }
-            severity_groups[vuln.severity]['children'].append(vuln_node)
-        
-        # 按嚴重等級排序
-        severity_order = ['High', 'Medium', 'Low', 'Informational']
-        for sev in severity_order:
-            if sev in severity_groups:
-                report_node['children'].append(severity_groups[sev])
-        
-        return jsonify([report_node])
+        try:
+            tree = TreeService.build_tree([report_id], depth=request.args.get('depth', type=int))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not tree:
+            return jsonify({'error': '報告不存在'}), 404
+        return jsonify(tree)
+    
+    @app.route('/api/tree/nodes/<node_id>')
+    @cached('tree')
+    @query_budget.limit(2)
+    def api_vuln_tree_children(node_id):
+        """延遲載入節點的子節點（實例層以 after/limit 分頁）"""
+        try:
+            return jsonify(TreeService.get_children(
+                node_id,
+                after=request.args.get('after', type=int),
+                limit=request.args.get('limit', type=int)
+            ))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     # --- 操作日誌 ---
     @app.route('/api/logs')
+    @query_budget.limit(2)
     def api_get_logs():
-        """取得操作日誌"""
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        action_type = request.args.get('type', '')
-        
-        query = OperationLog.query
-        if action_type:
-            query = query.filter(OperationLog.action_type == action_type)
-        
-        pagination = query.order_by(OperationLog.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        logs = [{
-            'id': log.id,
-            'action_type': log.action_type,
-            'message': log.message,
-            'created_at': log.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        } for log in pagination.items]
-        
-        return jsonify({
-            'logs': logs,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': page
-        })
+        """取得操作日誌（依時間新到舊，以 cursor 分頁）"""
+        try:
+            return jsonify(LogService.get_logs(
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('per_page', type=int),
+                action_type=request.args.get('type', ''),
+                include_total=_include_total()
+            ))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     # --- 資料庫管理 ---
+    @app.route('/api/metrics')
+    def api_metrics():
+        """Prometheus 文字格式的效能指標（METRICS_ENABLED=false 時為 404）"""
+        registry = metrics.get_registry()
+        if registry is None:
+            return jsonify({'error': '未啟用效能指標'}), 404
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    
+    @app.route('/api/db/pool')
+    def api_db_pool():
+        """取得連線池狀態（借出數、溢出數、等待時間）"""
+        return jsonify(database.pool_stats())
+    
     @app.route('/api/db/reset', methods=['POST'])
     def api_reset_database():
         """重置資料庫（需要密碼驗證）"""
@@ -518,16 +557,11 @@ def create_app(config_name='default'):
             return jsonify({'error': '密碼錯誤'}), 403
         
         try:
-            import pymysql
-            conn = pymysql.connect(
-                host=Config.DB_HOST,
-                port=int(Config.DB_PORT),
-                user=Config.DB_USER,
-                password=Config.DB_PASSWORD,
-                charset='utf8mb4'
-            )
+            uri = app.config['SQLALCHEMY_DATABASE_URI']
+            db.session.remove()
+            conn = database.server_connection(uri)
             
-            db_name = Config.DB_NAME
+            db_name = make_url(uri).database
             with conn.cursor() as cursor:
                 # 刪除資料庫
                 cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
@@ -535,9 +569,12 @@ def create_app(config_name='default'):
                 cursor.execute(f"CREATE DATABASE `{db_name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
             conn.close()
             
+            # 連線池中的連線仍指向已刪除的資料庫，全部重建
+            database.dispose()
+            
             # 重新建立表
-            with app.app_context():
-                db.create_all()
+            SchemaService.upgrade()
+            invalidate_all()
             
             return jsonify({'success': True, 'message': '資料庫已重置'})
         except Exception as e:
@@ -545,11 +582,20 @@ def create_app(config_name='default'):
     
     @app.route('/api/db/export/sql')
     def api_export_sql():
-        """匯出資料庫為 SQL dump"""
+        """匯出資料庫為 SQL dump（gzip=1 壓縮、workers=N 平行匯出資料表）"""
         try:
+            compress = request.args.get('gzip')
+            compress = app.config.get('SQL_DUMP_GZIP', False) if compress is None else compress.lower() in ('1', 'true')
+            workers = request.args.get('workers', app.config.get('SQL_DUMP_WORKERS', 1), type=int)
             filename = f"vuln_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql"
+            if compress:
+                filename += '.gz'
             filepath = os.path.join(app.config['EXPORT_FOLDER'], filename)
             
+            # 壓縮或平行匯出時直接使用 Python 匯出
+            if compress or workers > 1:
+                return _export_sql_python(app, filepath, filename, compress, workers)
+            
             # 使用 mysqldump
             cmd = [
                 'mysqldump',
@@ -563,47 +609,35 @@ def create_app(config_name='default'):
                 Config.DB_NAME
             ]
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True)
+            try:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True)
+                returncode = result.returncode
+            except FileNotFoundError:
+                returncode = -1
             
-            if result.returncode != 0:
+            if returncode != 0:
                 # 如果 mysqldump 失敗，使用 Python 方式匯出
                 return _export_sql_python(app, filepath, filename)
             
             LogService.log('EXPORT', f'匯出 SQL: {filename}')
+            metrics.inc('export_bytes_total', os.path.getsize(filepath), kind='sql')
             return send_file(filepath, as_attachment=True, download_name=filename)
         except Exception as e:
             return jsonify({'error': f'匯出失敗: {str(e)}'}), 500
     
     @app.route('/api/db/export/json')
     def api_export_all_json():
-        """匯出所有報告為 JSON ZIP"""
-        import zipfile
-        
-        try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            zip_filename = f"all_reports_{timestamp}.zip"
-            zip_filepath = os.path.join(app.config['EXPORT_FOLDER'], zip_filename)
-            
-            reports = Report.query.all()
-            
-            with zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for report in reports:
-                    data = ReportService.export_report(report.id, include_status=True)
-                    json_str = json.dumps(data, ensure_ascii=False, indent=2)
-                    
-                    # 檔名使用 site_url 或 id
-                    safe_name = (report.site_url or f'report_{report.id}').replace('://', '_').replace('/', '_')[:50]
-                    zf.writestr(f"{safe_name}_{report.id}.json", json_str)
-            
-            LogService.log('EXPORT', f'匯出全部 JSON: {len(reports)} 個報告')
-            return send_file(zip_filepath, as_attachment=True, download_name=zip_filename)
-        except Exception as e:
-            return jsonify({'error': f'匯出失敗: {str(e)}'}), 500
+        """匯出所有報告為 JSON ZIP（串流回應，可用 workers 參數平行產生）"""
+        zip_filename = f"all_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        workers = request.args.get('workers', type=int)
+        chunks = metrics.count_stream(ReportService.stream_export_zip(workers), 'zip')
+        return Response(stream_with_context(chunks), mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename={zip_filename}'})
     
     @app.route('/api/db/import/sql', methods=['POST'])
     def api_import_sql():
-        """從 SQL dump 還原資料庫"""
+        """從 SQL dump 還原資料庫（.sql 或 .sql.gz，背景執行並回傳 job id）"""
         if 'file' not in request.files:
             return jsonify({'error': '未提供檔案'}), 400
         
@@ -614,116 +648,55 @@ def create_app(config_name='default'):
         if password != Config.DB_PASSWORD:
             return jsonify({'error': '密碼錯誤'}), 403
         
-        if not file.filename.endswith('.sql'):
-            return jsonify({'error': '僅支援 .sql 檔案'}), 400
+        if not file.filename.endswith(('.sql', '.sql.gz')):
+            return jsonify({'error': '僅支援 .sql 或 .sql.gz 檔案'}), 400
         
-        try:
-            # 儲存上傳的檔案
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
-            file.save(filepath)
-            
-            import pymysql
-            conn = pymysql.connect(
-                host=Config.DB_HOST,
-                port=int(Config.DB_PORT),
-                user=Config.DB_USER,
-                password=Config.DB_PASSWORD,
-                database=Config.DB_NAME,
-                charset='utf8mb4',
-                autocommit=True
-            )
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                sql_content = f.read()
-            
-            # 分割 SQL 語句執行
-            with conn.cursor() as cursor:
-                # 簡單分割（以分號結尾）
-                statements = sql_content.split(';\n')
-                for stmt in statements:
-                    stmt = stmt.strip()
-                    if stmt and not stmt.startswith('--'):
-                        try:
-                            cursor.execute(stmt)
-                        except Exception as e:
-                            print(f"SQL 執行警告: {e}")
-            
-            conn.close()
-            os.remove(filepath)  # 清理上傳的檔案
-            
-            LogService.log('IMPORT', f'還原 SQL: {file.filename}')
-            return jsonify({'success': True, 'message': 'SQL 還原成功'})
-        except Exception as e:
-            return jsonify({'error': f'還原失敗: {str(e)}'}), 500
+        stop_on_error = request.form.get('stop_on_error')
+        stop_on_error = app.config.get('RESTORE_STOP_ON_ERROR', False) if stop_on_error is None \
+            else stop_on_error.lower() in ('1', 'true')
+        
+        filepath = _stage_upload(file)
+        job = JobService.create('RESTORE', file.filename, os.path.getsize(filepath))
+        future = get_runner(app).submit(run_restore_job, job.id, filepath, file.filename,
+                                        app.config.get('RESTORE_BATCH_SIZE', 100), stop_on_error)
+        if _use_async():
+            return _job_accepted(job, '已排入背景還原')
+        
+        future.result()
+        db.session.expire_all()
+        result = JobService.get_job(job.id)
+        return jsonify({'success': result['status'] == 'succeeded', **result}), 200
     
     return app
 
 
-def _export_sql_python(app, filepath, filename):
-    """使用 Python 方式匯出 SQL（備用方案）"""
+def _export_sql_python(app, filepath, filename, compress=False, workers=1):
+    """使用 Python 方式匯出 SQL（備用方案，見 sqldump.py）"""
     from services import LogService
-    import pymysql
-    
-    conn = pymysql.connect(
-        host=Config.DB_HOST,
-        port=int(Config.DB_PORT),
-        user=Config.DB_USER,
-        password=Config.DB_PASSWORD,
-        database=Config.DB_NAME,
-        charset='utf8mb4'
+    import sqldump
+    
+    # 平行匯出時在其他執行緒借連線，需直接傳入 engine
+    connect = functools.partial(database.raw_connection, db.engine)
+    result = sqldump.dump(
+        connect, filepath, compress=compress, workers=workers,
+        rows_per_statement=app.config.get('SQL_DUMP_ROWS_PER_STATEMENT', sqldump.DEFAULT_ROWS_PER_STATEMENT),
+        max_packet=app.config.get('SQL_DUMP_MAX_PACKET', sqldump.DEFAULT_MAX_PACKET)
     )
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(f"-- VulnTracker SQL Dump\n")
-        f.write(f"-- Generated: {datetime.now().isoformat()}\n\n")
-        f.write(f"SET NAMES utf8mb4;\n")
-        f.write(f"SET FOREIGN_KEY_CHECKS = 0;\n\n")
-        
-        with conn.cursor() as cursor:
-            # 取得所有表
-            cursor.execute("SHOW TABLES")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            for table in tables:
-                # 取得建表語句
-                cursor.execute(f"SHOW CREATE TABLE `{table}`")
-                create_stmt = cursor.fetchone()[1]
-                f.write(f"DROP TABLE IF EXISTS `{table}`;\n")
-                f.write(f"{create_stmt};\n\n")
-                
-                # 取得資料
-                cursor.execute(f"SELECT * FROM `{table}`")
-                rows = cursor.fetchall()
-                if rows:
-                    for row in rows:
-                        values = []
-                        for val in row:
-                            if val is None:
-                                values.append('NULL')
-                            elif isinstance(val, (int, float)):
-                                values.append(str(val))
-                            elif isinstance(val, datetime):
-                                values.append(f"'{val.strftime('%Y-%m-%d %H:%M:%S')}'")
-                            else:
-                                escaped = str(val).replace("'", "''").replace("\\", "\\\\")
-                                values.append(f"'{escaped}'")
-                        
-                        f.write(f"INSERT INTO `{table}` VALUES ({', '.join(values)});\n")
-                    f.write("\n")
-        
-        f.write("SET FOREIGN_KEY_CHECKS = 1;\n")
-    
-    conn.close()
-    
-    LogService.log('EXPORT', f'匯出 SQL: {filename}')
+    LogService.log('EXPORT', f"匯出 SQL: {filename}（{result['tables']} 個資料表，{result['rows']} 列）")
+    metrics.inc('sql_dump_rows_total', result['rows'])
+    metrics.inc('export_bytes_total', os.path.getsize(filepath), kind='sql')
     return send_file(filepath, as_attachment=True, download_name=filename)
 
 
-# 主程式入口
+# 主程式入口（單一行程的開發伺服器；正式環境請使用 gunicorn -c gunicorn.conf.py wsgi:app）
 if __name__ == '__main__':
-    app = create_app('development')
+    from config import CONFIG_NAME
+    from init_db import bootstrap
+    app = create_app(CONFIG_NAME or 'development')
+    bootstrap(app)
     print("🚀 漏洞報告管理系統 API 伺服器啟動中...")
-    print(f"📡 API 端點: http://0.0.0.0:{PROT}/api/")
+    print(f"📡 API 端點: http://{Config.SERVER_HOST}:{Config.SERVER_PORT}/api/")
     print("🔒 CORS 設定: 允許所有來源（開發模式）")
-    app.run(host='0.0.0.0', port=PROT, debug=True)
+    app.run(host=Config.SERVER_HOST, port=Config.SERVER_PORT, debug=app.config['DEBUG'])
 
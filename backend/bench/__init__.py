@@ -0,0 +1,10 @@
+"""
+效能基準
+
+在 backend 目錄執行：
+
+    python -m bench --sizes 1000,10000,100000 -o results.json
+
+- generator: 產生 ReportService.import_json 格式的合成掃描報告
+- runner: 匯入後量測 export_report 與主要 API 的延遲、處理量、SQL 查詢數與 peak RSS
+"""
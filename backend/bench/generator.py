@@ -0,0 +1,167 @@
+"""
+合成掃描報告產生器
+
+產生與 ReportService.import_json 相同格式的 JSON：
+
+    {
+        "SiteURL": "...", "SummaryofSequences": "...", "SequenceDetails": "...",
+        "High": [{"<漏洞標題>": {"Description": "...", "instances": [
+            {"URL": "...", "content": {"方法": "GET", "Parameter": "...", "攻擊": "...",
+                                       "Evidence": "...", "Other Info": "..."}}
+        ]}}],
+        "Medium": [...], "Low": [...], "Informational": [...]
+    }
+
+相同參數與 seed 一定產生相同內容。實例數依 Pareto 分布分配到各漏洞
+（少數漏洞佔大部分實例，與實際掃描結果相近），同一漏洞內的
+URL / method / parameter 不重複。write_report() 逐筆寫出，
+一百萬筆實例也不需要整份報告放在記憶體中。
+"""
+import json
+import os
+import random
+from collections import Counter
+
+SEVERITIES = ('High', 'Medium', 'Low', 'Informational')
+SEVERITY_WEIGHTS = (1, 3, 4, 2)
+TITLES = (
+    'SQL 注入', '跨站腳本攻擊（反射型）', '跨站腳本攻擊（儲存型）', '路徑遍歷', '遠端作業系統命令注入',
+    '未設定內容安全政策（CSP）標頭', '缺少防點擊劫持標頭', 'Cookie 未設定 HttpOnly 旗標',
+    'Cookie 未設定 SameSite 屬性', '伺服器透過 X-Powered-By 洩漏資訊', '應用程式錯誤揭露',
+    '目錄瀏覽', '缺少 Anti-CSRF 權杖', '未設定 X-Content-Type-Options 標頭', '敏感資訊出現在 URL 中',
+    '可疑的註解', '時間戳記洩漏', 'Strict-Transport-Security 標頭未設定', '跨網域 JavaScript 檔案引用',
+    '使用者可控制的 HTML 屬性',
+)
+PATHS = ('login', 'search', 'product', 'cart', 'account', 'admin', 'api/v1/items', 'news', 'download', 'upload')
+PARAMETERS = ('id', 'q', 'page', 'sort', 'user', 'token', 'file', 'redirect', 'lang', 'category')
+ATTACKS = (
+    "' OR '1'='1", '<script>alert(1)</script>', '../../../../etc/passwd', ';cat /etc/passwd',
+    '" onmouseover="alert(1)', 'ZAP', '', '',
+)
+WORDS = (
+    '伺服器', '回應', '參數', '輸入', '驗證', '輸出', '編碼', '瀏覽器', '標頭', '攻擊者',
+    'response', 'header', 'injection', 'payload', 'session', 'cookie', 'redirect', 'script',
+)
+
+DEFAULT_SITE = 'https://bench.example.com'
+MAX_VULNERABILITIES = 500
+
+
+def vulnerability_count(instances: int) -> int:
+    """依實例數決定漏洞種類數（約為實例數的平方根，介於 1 到 MAX_VULNERABILITIES）"""
+    return max(1, min(MAX_VULNERABILITIES, instances, round(instances ** 0.5)))
+
+
+def _text(r: random.Random, words: int) -> str:
+    return ' '.join(r.choice(WORDS) for _ in range(words))
+
+
+def _plan(instances: int, vulnerabilities: int, seed) -> list:
+    """
+    決定各漏洞的嚴重等級、標題與實例數
+
+    Returns:
+        list: [(index, severity, title, count)]，依 SEVERITIES 順序排列
+    """
+    r = random.Random(f'{seed}:plan')
+    weights = [r.paretovariate(1.2) for _ in range(vulnerabilities)]
+    # 每個漏洞至少一筆實例，其餘依權重分配
+    counts = Counter(range(vulnerabilities))
+    counts.update(r.choices(range(vulnerabilities), weights, k=instances - vulnerabilities))
+
+    plan = []
+    for index in range(vulnerabilities):
+        title = TITLES[index % len(TITLES)]
+        if index >= len(TITLES):
+            title = f'{title} #{index // len(TITLES) + 1}'
+        severity = r.choices(SEVERITIES, SEVERITY_WEIGHTS)[0]
+        plan.append((index, severity, title, counts[index]))
+    plan.sort(key=lambda item: (SEVERITIES.index(item[1]), item[0]))
+    return plan
+
+
+def _instances(site_url: str, index: int, count: int, seed):
+    """產生單一漏洞的實例（以漏洞序號決定亂數，與其他漏洞的產生順序無關）"""
+    r = random.Random(f'{seed}:{index}')
+    for i in range(count):
+        path = r.choice(PATHS)
+        parameter = r.choice(PARAMETERS)
+        inst = {
+            'URL': f'{site_url}/{path}/{i}?{parameter}={r.randrange(1000)}',
+            'content': {
+                '方法': r.choice(('GET', 'GET', 'POST')),
+                'Parameter': parameter,
+                '攻擊': r.choice(ATTACKS),
+                'Evidence': f'<input name="{parameter}" value="{_text(r, 3)}">',
+                'Other Info': _text(r, r.randrange(5, 40)),
+            }
+        }
+        if r.random() < 0.1:
+            inst['Confidence'] = r.choice(('High', 'Medium', 'Low'))  # 非標準欄位（存入 extra_data）
+        yield inst
+
+
+def _description(title: str, index: int, seed) -> str:
+    return f'{title}：{_text(random.Random(f"{seed}:{index}:description"), 20)}'
+
+
+def _header(site_url: str, instances: int) -> dict:
+    return {
+        'SiteURL': site_url,
+        'SummaryofSequences': f'合成掃描報告（{instances} 筆實例）',
+        'SequenceDetails': '由 bench.generator 產生',
+    }
+
+
+def iter_report(instances: int, seed=0, site_url: str = DEFAULT_SITE, vulnerabilities: int = None):
+    """
+    以 JSON 文字片段產生報告（每個實例一段）
+
+    Args:
+        instances: 實例總數
+        seed: 亂數種子
+        site_url: 報告的 SiteURL
+        vulnerabilities: 漏洞種類數（預設依實例數決定，見 vulnerability_count）
+    """
+    vulnerabilities = vulnerabilities or vulnerability_count(instances)
+    header = _header(site_url, instances)
+    yield '{' + ', '.join(f'{json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}' for k, v in header.items())
+
+    current = None
+    for index, severity, title, count in _plan(instances, vulnerabilities, seed):
+        if severity != current:
+            if current is not None:
+                yield ']'
+            yield f', {json.dumps(severity)}: ['
+            current = severity
+        else:
+            yield ', '
+        description = json.dumps(_description(title, index, seed), ensure_ascii=False)
+        yield '{' + json.dumps(title, ensure_ascii=False) + ': {"Description": ' + description + ', "instances": ['
+        for i, inst in enumerate(_instances(site_url, index, count, seed)):
+            yield (', ' if i else '') + json.dumps(inst, ensure_ascii=False)
+        yield ']}}'
+    if current is not None:
+        yield ']'
+    yield '}'
+
+
+def write_report(path: str, instances: int, seed=0, site_url: str = DEFAULT_SITE,
+                 vulnerabilities: int = None) -> int:
+    """將報告寫入檔案，回傳位元組數"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in iter_report(instances, seed, site_url, vulnerabilities):
+            f.write(chunk)
+    return os.path.getsize(path)
+
+
+def generate_report(instances: int, seed=0, site_url: str = DEFAULT_SITE, vulnerabilities: int = None) -> dict:
+    """產生報告 dict（與 write_report 的內容相同，適合小型資料）"""
+    vulnerabilities = vulnerabilities or vulnerability_count(instances)
+    report = _header(site_url, instances)
+    for index, severity, title, count in _plan(instances, vulnerabilities, seed):
+        report.setdefault(severity, []).append({title: {
+            'Description': _description(title, index, seed),
+            'instances': list(_instances(site_url, index, count, seed))
+        }})
+    return report
@@ -0,0 +1,236 @@
+"""
+/api/* 路由的 SQL 查詢數檢查
+
+以兩種資料量建立資料（報告數、漏洞種類數與實例數都不同），逐一請求所有
+/api/* 路由並以 engine 事件計算 SQL 語句數；每個路由在兩種資料量下的查詢數
+必須相同，查詢數隨資料成長通常就是 N+1 查詢或逐筆處理的迴圈。testing 設定的
+QUERY_BUDGET_MODE 為 raise，超過 @query_budget.limit 上限的路由也會失敗。
+
+- GET 路由共用一份資料
+- 寫入路由（匯入、狀態更新、備註、刪除）每個案例各自建立新的 app 與資料，
+  互不影響；批次寫入的筆數設為大於資料量，批次數不影響查詢數
+- 只能在 MariaDB 上執行的路由列在 UNSUPPORTED，輸出中標示為不支援
+- 沒有被任何案例涵蓋、也不在 UNSUPPORTED 中的路由視為失敗（新增路由時需補上案例）
+
+在 backend 目錄執行（有失敗時結束代碼為 1）：
+
+    python -m bench.query_counts
+"""
+import argparse
+import io
+import json
+import sys
+
+from bench import generator
+from bench.runner import QueryCounter
+
+SIZES = ((2, 100), (6, 1000))  # (報告數, 每份報告實例數)
+SITE_URL = 'https://query-counts.example.com'  # 前兩份報告同一網站（差異比較與 upsert 用）
+# 匯入、匯出、狀態更新每批處理的筆數大於資料量，批次數不影響查詢數
+BATCH_SIZE = 100000
+UNSUPPORTED = {
+    'GET /api/db/export/sql': 'Python 匯出使用 SHOW FULL TABLES / SHOW CREATE TABLE，只支援 MariaDB，'
+                              '且經由 DBAPI 連線執行，engine 事件無法計數',
+    'POST /api/db/import/sql': 'SQL dump 還原使用 MariaDB 語法，在背景工作中經由 DBAPI 連線執行',
+    'POST /api/db/reset': '以 DROP / CREATE DATABASE 重建 MariaDB 資料庫',
+}
+# 每份報告各自產生一個檔案的路由：查詢數扣除「報告數 × 每份報告查詢數」後必須相同
+PER_REPORT = {
+    'GET /api/db/export/json': 3,
+}
+
+
+def _create_app():
+    from config import config_map, TestingConfig
+
+    class QueryCountConfig(TestingConfig):
+        IMPORT_BATCH_SIZE = BATCH_SIZE
+        IMPORT_WORKERS = 1  # 批次匯入不建立行程池，寫入都在請求中執行
+        EXPORT_BATCH_SIZE = BATCH_SIZE
+        STATUS_BATCH_SIZE = BATCH_SIZE
+        EXPORT_SAVE = False
+
+    config_map['query_counts'] = QueryCountConfig
+    from app import create_app
+    return create_app('query_counts')
+
+
+def _seed(app, reports: int, instances: int) -> dict:
+    """匯入報告並回傳路由參數使用的 id"""
+    from models import db, Vulnerability, VulnInstance
+    from services import JobService, LogService, ReportService, SchemaService, StatusService
+
+    with app.app_context():
+        SchemaService.upgrade()
+        report_ids = []
+        for n in range(reports):
+            site_url = SITE_URL if n < 2 else f'https://site-{n}.example.com'
+            data = generator.generate_report(instances, seed=n, site_url=site_url)
+            report_ids.append(ReportService.import_json(data, f'report-{n}.json').id)
+            LogService.log('IMPORT', f'匯入報告: report-{n}.json')
+
+        vuln = Vulnerability.query.filter_by(report_id=report_ids[0]).order_by(Vulnerability.id).first()
+        instance_ids = [
+            row.id for row in VulnInstance.query.filter_by(vulnerability_id=vuln.id).order_by(VulnInstance.id)
+        ]
+        StatusService.batch_update_status(instance_ids[::2], 'fixed', '已修復', 'bench')
+        report_instance_ids = [
+            row.id for row in VulnInstance.query.join(Vulnerability)
+            .filter(Vulnerability.report_id == report_ids[0]).order_by(VulnInstance.id)
+        ]
+        ids = {
+            'report_id': report_ids[0],
+            'base_id': report_ids[0],
+            'compare_id': report_ids[1],
+            'vuln_id': vuln.id,
+            'instance_id': instance_ids[0],
+            'job_id': JobService.create('import', 'report-0.json').id,
+            'severity': vuln.severity,
+            'sample_ids': report_instance_ids[::10],  # 報告中 10% 的實例，數量隨資料量成長
+        }
+        db.session.remove()
+    return ids
+
+
+def _read_cases(rule: str, ids: dict) -> list:
+    """GET 路由規則 → [(名稱, 路徑, query string)]"""
+    key = f'GET {rule}'
+    if rule == '/api/tree/nodes/<node_id>':
+        nodes = (f"report-{ids['report_id']}", f"severity-{ids['report_id']}-{ids['severity']}",
+                 f"vuln-{ids['vuln_id']}")
+        return [(f'{key} ({node.split("-")[0]})', f'/api/tree/nodes/{node}', {}) for node in nodes]
+
+    path = rule
+    for name, value in ids.items():
+        path = path.replace(f'<int:{name}>', str(value)).replace(f'<{name}>', str(value))
+    cases = [(key, path, {})]
+    if rule in ('/api/reports', '/api/logs', '/api/search'):
+        cases.append((f'{key} (include_total)', path, {'include_total': 1}))
+    if rule == '/api/search':
+        cases = [(name, path, dict(query, q='injection')) for name, path, query in cases]
+    if rule == '/api/reports/<int:base_id>/diff/<int:compare_id>':
+        cases.append((f'{key} (all)', path, {'include': 'new,resolved,unchanged'}))
+    return cases
+
+
+def _upload(instances: int, seed, name: str):
+    """匯入用的上傳檔（與 SITE_URL 報告同一網站，seed=1 時與第二份報告內容相同）"""
+    data = generator.generate_report(instances, seed=seed, site_url=SITE_URL)
+    return io.BytesIO(json.dumps(data, ensure_ascii=False).encode('utf-8')), name
+
+
+def _write_cases(ids: dict, instances: int) -> list:
+    """寫入路由 → [(名稱, method, 路徑, test client 參數)]（每次呼叫重新建立上傳檔）"""
+    report_id = ids['report_id']
+    return [
+        ('PUT /api/instances/batch-status (ids)', 'PUT', '/api/instances/batch-status',
+         {'json': {'instance_ids': ids['sample_ids'], 'status': 'fixed', 'fixed_by': 'bench'}}),
+        ('PUT /api/instances/batch-status (filter)', 'PUT', '/api/instances/batch-status',
+         {'json': {'filter': {'report_id': report_id}, 'status': 'false_positive'}}),
+        ('PUT /api/instances/<int:instance_id>/status', 'PUT', f"/api/instances/{ids['instance_id']}/status",
+         {'json': {'status': 'in_progress', 'notes': '處理中'}}),
+        ('PUT /api/reports/<int:report_id>/notes', 'PUT', f'/api/reports/{report_id}/notes',
+         {'json': {'notes': '已確認'}}),
+        ('DELETE /api/reports/<int:report_id>', 'DELETE', f'/api/reports/{report_id}', {}),
+        ('POST /api/import', 'POST', '/api/import',
+         {'data': {'file': _upload(instances, 'upload', 'scan.json'), 'async': '0'}}),
+        ('POST /api/import (stream=0)', 'POST', '/api/import',
+         {'data': {'file': _upload(instances, 'upload', 'scan.json'), 'async': '0', 'stream': '0'}}),
+        ('POST /api/import (upsert)', 'POST', '/api/import',
+         {'data': {'file': _upload(instances, 1, 'scan.json'), 'async': '0', 'mode': 'upsert'}}),
+        ('POST /api/import/bulk', 'POST', '/api/import/bulk',
+         {'data': {'files': [_upload(instances, 'upload', 'a.json'), _upload(instances, 'upload-2', 'b.json')],
+                   'async': '0'}}),
+    ]
+
+
+def _request(client, counter, method: str, path: str, **kwargs):
+    """送出請求，回傳查詢數或錯誤訊息"""
+    before = counter.count
+    try:
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()
+    except AssertionError as e:  # QueryBudgetExceeded
+        return str(e)
+    if response.status_code not in (200, 202):
+        return f'HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}'
+    return counter.count - before
+
+
+def _api_routes(app) -> set:
+    """所有 /api/* 路由（'METHOD rule'）"""
+    return {
+        f'{method} {rule.rule}'
+        for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+    }
+
+
+def measure(reports: int, instances: int) -> dict:
+    """建立一個資料量的資料並請求所有路由，回傳 {名稱: 查詢數或錯誤}"""
+    from models import db
+
+    app = _create_app()
+    ids = _seed(app, reports, instances)
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    counts = {}
+    rules = sorted(route.split(' ', 1)[1] for route in _api_routes(app)
+                   if route.startswith('GET ') and route not in UNSUPPORTED)
+    for rule in rules:
+        for name, path, query in _read_cases(rule, ids):
+            counts[name] = _request(client, counter, 'GET', path, query_string=query)
+
+    # 寫入路由：每個案例使用新的 app 與資料
+    for index in range(len(_write_cases(ids, instances))):
+        app = _create_app()
+        ids = _seed(app, reports, instances)
+        with app.app_context():
+            counter = QueryCounter(db.engine)
+        name, method, path, kwargs = _write_cases(ids, instances)[index]
+        counts[name] = _request(app.test_client(), counter, method, path, **kwargs)
+        with app.app_context():
+            db.engine.dispose()
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m bench.query_counts', description=__doc__.strip().split('\n')[0])
+    parser.parse_args(argv)
+
+    results = [measure(reports, instances) for reports, instances in SIZES]
+    failed = 0
+    headers = [f'{reports}x{instances}' for reports, instances in SIZES]
+    print(f"{'路由':<64} " + ' '.join(f'{header:>10}' for header in headers))
+    for name in results[0]:
+        values = [result.get(name) for result in results]
+        per_report = PER_REPORT.get(name, 0)
+        ok = all(isinstance(value, int) for value in values) and len({
+            value - per_report * reports for value, (reports, _) in zip(values, SIZES)
+        }) == 1
+        failed += not ok
+        print(f'{name:<64} ' + ' '.join(f'{value:>10}' if isinstance(value, int) else f'{"錯誤":>10}'
+                                        for value in values) + ('' if ok else '  ✗'))
+        for value in values:
+            if not isinstance(value, int):
+                print(f'    {value}')
+
+    # 每個路由至少要有一個案例或列在 UNSUPPORTED
+    covered = {' '.join(name.split(' ')[:2]) for name in results[0]}
+    missing = sorted(_api_routes(_create_app()) - covered - set(UNSUPPORTED))
+    for route in missing:
+        print(f'{route:<64} {"未檢查":>10}  ✗（請在 _read_cases / _write_cases 加入案例或列入 UNSUPPORTED）')
+    failed += len(missing)
+
+    print('\n不支援（SQLite 無法執行，未檢查）:')
+    for route, reason in UNSUPPORTED.items():
+        print(f'  {route}: {reason}')
+
+    print(f'\n{len(results[0]) - failed + len(missing)} 個通過，{failed} 個失敗，{len(UNSUPPORTED)} 個不支援')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+效能基準執行器
+
+每個資料量在獨立的子行程中執行（peak RSS 互不影響）：
+
+1. 以 generator 產生報告檔（instances 平均分到 --reports 份報告）
+2. 建立空資料庫（預設為暫存目錄中的 SQLite）並以 import_json_stream 匯入
+3. 依序量測 export_report 與各 API，每項先執行 --warmup 次不計時
+
+每項操作輸出樣本數、p50 / p99 / 最長延遲、處理量、平均 SQL 查詢數
+（SQLAlchemy engine 事件）與量測後的 peak RSS，結果以 JSON 輸出，方便比較不同版本。
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import sqlalchemy
+from sqlalchemy import event, func
+from sqlalchemy.engine import make_url
+
+from bench import generator
+
+DEFAULT_SIZES = (1000, 10000)
+SEARCH_TERMS = ('injection', '伺服器', 'session cookie', '攻擊者 輸入')
+BATCH_STATUSES = ('in_progress', 'fixed', 'false_positive', 'pending')
+
+
+def percentile(samples: list, pct: float) -> float:
+    """最近排名法百分位數"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb() -> float:
+    """目前行程的最大常駐記憶體（MB，無 resource 模組時為 None）"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 為單位，macOS 以位元組為單位
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class QueryCounter:
+    """以 engine 事件計算執行的 SQL 語句數"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._before)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def measure(operation, counter: QueryCounter, repeat: int, warmup: int = 0, items: int = 1) -> dict:
+    """
+    重複執行 operation() 並統計
+
+    Args:
+        operation: 以呼叫序號 n 為參數的函式（預熱也計入序號）
+        counter: 查詢計數器
+        repeat: 計時次數
+        warmup: 不計時的預熱次數
+        items: 每次處理的項目數（計算處理量）
+    """
+    for n in range(warmup):
+        operation(n)
+    durations, queries = [], []
+    for n in range(warmup, warmup + repeat):
+        before = counter.count
+        start = time.perf_counter()
+        operation(n)
+        durations.append(time.perf_counter() - start)
+        queries.append(counter.count - before)
+    total = sum(durations)
+    return {
+        'samples': repeat,
+        'items': items,
+        'seconds_total': round(total, 6),
+        'throughput_per_sec': round(items * repeat / total, 1) if total else None,
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3),
+        'max_ms': round(max(durations) * 1000, 3),
+        'queries': round(sum(queries) / repeat, 1),
+        'queries_max': max(queries),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _prepare_database(uri: str):
+    """刪除後重建資料庫（必須是專用於效能基準的資料庫）"""
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database and os.path.exists(url.database):
+            os.remove(url.database)
+        return
+    import database
+    conn = database.server_connection(uri)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{url.database}`")
+            cursor.execute(f"CREATE DATABASE `{url.database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    finally:
+        conn.close()
+
+
+def _create_app(uri: str):
+    from config import config_map, TestingConfig
+
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = uri
+
+    config_map['bench'] = BenchConfig
+    from app import create_app
+    return create_app('bench')
+
+
+def _check(response, expected: int = 200):
+    data = response.get_data()
+    if response.status_code != expected:
+        raise RuntimeError(f'{response.request.method} {response.request.path} 回傳 '
+                           f'{response.status_code}: {data[:200]!r}')
+    return data
+
+
+def run_size(size: int, options: dict) -> dict:
+    """在目前行程中執行單一資料量的所有量測"""
+    workdir = tempfile.mkdtemp(prefix=f'bench-{size}-')
+    try:
+        uri = options.get('database_uri') or 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        _prepare_database(uri)
+        app = _create_app(uri)
+
+        from models import db, VulnInstance
+        from services import ReportService, SchemaService
+
+        repeat, warmup = options['repeat'], options['warmup']
+        reports = max(1, min(options['reports'], size))
+        result = {'instances': size, 'reports': reports, 'database': make_url(uri).get_backend_name()}
+
+        # 產生報告檔
+        start = time.perf_counter()
+        files = []
+        for n in range(reports):
+            count = size // reports + (1 if n < size % reports else 0)
+            path = os.path.join(workdir, f'report-{n}.json')
+            generator.write_report(path, count, seed=f"{options['seed']}:{n}",
+                                   site_url=f'https://bench-{n}.example.com')
+            files.append((path, count))
+        result['generate_seconds'] = round(time.perf_counter() - start, 3)
+        result['file_bytes'] = sum(os.path.getsize(path) for path, _ in files)
+
+        with app.app_context():
+            SchemaService.upgrade()
+            counter = QueryCounter(db.engine)
+            operations = {}
+
+            # 匯入（每份報告一次，不預熱）
+            report_ids = []
+
+            def import_report(n):
+                path, _ = files[n]
+                with open(path, 'rb') as f:
+                    report_ids.append(ReportService.import_json_stream(f, os.path.basename(path)).id)
+                db.session.remove()
+
+            operations['import'] = measure(import_report, counter, reports, items=size // reports)
+            report_id = report_ids[0]
+            first_size = files[0][1]
+
+            def export_report(n):
+                ReportService.export_report(report_id)
+                db.session.remove()
+
+            operations['export_report'] = measure(export_report, counter, repeat, warmup, first_size)
+            low, high = db.session.query(func.min(VulnInstance.id), func.max(VulnInstance.id)).one()
+            db.session.remove()
+
+        # API 請求不在外層 app context 中執行，每個請求各自取得 session
+        client = app.test_client()
+        requests = {
+            'get_report': (f'/api/reports/{report_id}', first_size),
+            'tree': ('/api/tree', size),
+            'dashboard_stats': ('/api/dashboard/stats', size),
+        }
+        for name, (path, items) in requests.items():
+            operations[name] = measure(lambda n, path=path: _check(client.get(path)), counter, repeat, warmup, items)
+
+        operations['search'] = measure(
+            lambda n: _check(client.get('/api/search', query_string={'q': SEARCH_TERMS[n % len(SEARCH_TERMS)]})),
+            counter, repeat, warmup
+        )
+
+        r = random.Random(f"{options['seed']}:status")
+        batch = min(options['batch_size'], high - low + 1)
+
+        def batch_status(n):
+            _check(client.put('/api/instances/batch-status', json={
+                'instance_ids': r.sample(range(low, high + 1), batch),
+                'status': BATCH_STATUSES[n % len(BATCH_STATUSES)]
+            }))
+
+        operations['batch_status'] = measure(batch_status, counter, repeat, warmup, batch)
+
+        result['operations'] = operations
+        result['peak_rss_mb'] = peak_rss_mb()
+        return result
+    finally:
+        if options.get('keep'):
+            print(f'保留資料於 {workdir}', file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(sizes, **options) -> dict:
+    """依序執行各資料量（每個資料量使用新的子行程）"""
+    options.setdefault('repeat', 20)
+    options.setdefault('warmup', 1)
+    options.setdefault('reports', 1)
+    options.setdefault('batch_size', 100)
+    options.setdefault('seed', 0)
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        print(f'執行 {size} 筆實例...', file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(run_size, size, options).result())
+    return {
+        'started_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'platform': platform.platform(),
+        'options': {key: value for key, value in options.items() if key != 'database_uri'},
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='漏洞報告管理系統效能基準')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='實例數，以逗號分隔（例如 1000,10000,100000,1000000）')
+    parser.add_argument('--reports', type=int, default=1, help='實例平均分配的報告數（預設: 1）')
+    parser.add_argument('--repeat', type=int, default=20, help='每項操作的計時次數（預設: 20）')
+    parser.add_argument('--warmup', type=int, default=1, help='每項操作計時前的預熱次數（預設: 1）')
+    parser.add_argument('--batch-size', type=int, default=100, help='批次狀態更新每次的實例數（預設: 100）')
+    parser.add_argument('--seed', default='0', help='產生資料的亂數種子（預設: 0）')
+    parser.add_argument('--database-uri', help='改用其他資料庫（會刪除並重建該資料庫，預設為暫存 SQLite）')
+    parser.add_argument('--output', '-o', help='結果 JSON 檔（預設輸出到 stdout）')
+    parser.add_argument('--keep', action='store_true', help='保留產生的報告檔與 SQLite 資料庫')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    result = run(sizes, reports=args.reports, repeat=args.repeat, warmup=args.warmup,
+                 batch_size=args.batch_size, seed=args.seed, database_uri=args.database_uri, keep=args.keep)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,233 @@
+"""
+API 回應快取
+
+讀多寫少的端點（儀表板、漏洞樹、報告詳情）以 @cached 裝飾，回應 JSON
+依「路徑 + 查詢參數 + 標籤版本」快取，並附上 ETag，前端帶 If-None-Match
+時回傳 304。
+
+失效採標籤版本號：每個快取項目記錄它依賴的標籤（dashboard、tree、
+report:<id>），寫入操作呼叫 invalidate() 遞增標籤版本，舊項目不再被
+命中，之後由 LRU / TTL 自然淘汰。
+
+後端（CACHE_BACKEND）：
+- memory: 行程內 LRU，限制項目數與總位元組數（預設）
+- redis: 多個 worker 共用（需安裝 redis 套件並設定 CACHE_REDIS_URL）
+- none: 不快取，仍提供 ETag / 304
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request, make_response
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+ALL = '*'  # 所有項目都依賴的標籤，invalidate_all() 時遞增
+
+
+class MemoryBackend:
+    """行程內 LRU 快取（TTL + 項目數 / 位元組上限）"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key → (value, expires_at)
+        self.versions = {}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: int):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.size += len(value)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: str):
+        value, _ = self.entries.pop(key)
+        self.size -= len(value)
+
+    def get_versions(self, tags: list) -> list:
+        with self.lock:
+            return [self.versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags: list):
+        with self.lock:
+            for tag in tags:
+                self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size}
+
+
+class RedisBackend:
+    """以 Redis 共用快取與標籤版本（多個 worker 行程間一致失效）"""
+
+    PREFIX = 'vuln-cache:'
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND=redis 需要安裝 redis 套件')
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        return self.client.get(self.PREFIX + key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(self.PREFIX + key, value, ex=ttl)
+
+    def get_versions(self, tags: list) -> list:
+        values = self.client.mget([f'{self.PREFIX}tag:{tag}' for tag in tags])
+        return [int(v) if v else 0 for v in values]
+
+    def bump(self, tags: list):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(f'{self.PREFIX}tag:{tag}')
+        pipe.execute()
+
+    def stats(self) -> dict:
+        return {}
+
+
+class ResponseCache:
+    """回應快取（backend 為 None 時只計算 ETag）"""
+
+    def __init__(self, backend=None, ttl: int = 60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, tags: list) -> str:
+        args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+        versions = self.backend.get_versions(tags)
+        raw = f'{request.path}?{args}|' + ','.join(f'{t}={v}' for t, v in zip(tags, versions))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def respond(self, view, args, kwargs, tags: list, ttl: int = None):
+        """取得快取的回應，未命中時執行 view 並存入快取"""
+        key = None
+        if self.backend is not None:
+            # 先取得標籤版本再執行 view：執行期間若有寫入，結果會存在舊版本下而不被命中
+            key = self._key([ALL] + tags)
+            value = self.backend.get(key)
+            if value is not None:
+                self.hits += 1
+                etag, _, body = value.partition(b'\n')
+                response = current_app.response_class(body, mimetype='application/json')
+                return self._conditional(response, etag.decode('ascii'))
+            self.misses += 1
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.mimetype != 'application/json':
+            return response
+        body = response.get_data()
+        etag = hashlib.sha1(body).hexdigest()
+        if key is not None:
+            self.backend.set(key, etag.encode('ascii') + b'\n' + body, ttl or self.ttl)
+        return self._conditional(response, etag)
+
+    @staticmethod
+    def _conditional(response, etag: str):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.bump(list(tags))
+
+    def stats(self) -> dict:
+        data = {'hits': self.hits, 'misses': self.misses}
+        if self.backend is not None:
+            data.update(self.backend.stats())
+        return data
+
+
+def get_cache() -> ResponseCache:
+    """取得目前 app 的回應快取（依 CACHE_BACKEND 建立）"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        config = current_app.config
+        name = config.get('CACHE_BACKEND', 'memory')
+        if name == 'memory':
+            backend = MemoryBackend(config.get('CACHE_MAX_ENTRIES', 1000), config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        elif name == 'redis':
+            backend = RedisBackend(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        elif name == 'none':
+            backend = None
+        else:
+            raise ValueError(f"無效快取後端: {name}")
+        cache = current_app.extensions['response_cache'] = ResponseCache(backend, config.get('CACHE_TTL', 60))
+    return cache
+
+
+def disable_process_local(app, processes: int) -> bool:
+    """
+    多個 worker 行程時停用 memory 快取（改為 none）
+
+    memory 後端的失效只作用於處理寫入的行程，其他行程會繼續回傳（並以 304 確認）
+    過期的回應，直到 CACHE_TTL 到期。多個行程需要快取時請使用 redis。
+
+    Returns:
+        bool: 是否停用
+    """
+    if processes <= 1 or app.config.get('CACHE_BACKEND', 'memory') != 'memory':
+        return False
+    app.config['CACHE_BACKEND'] = 'none'
+    app.extensions.pop('response_cache', None)
+    return True
+
+
+def cached(*tags, ttl: int = None):
+    """
+    快取 GET 端點的 JSON 回應
+
+    Args:
+        tags: 依賴的標籤，可使用路由參數，例如 'report:{report_id}'
+        ttl: 存活秒數（預設 CACHE_TTL）
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            resolved = [tag.format(**kwargs) for tag in tags]
+            return get_cache().respond(view, args, kwargs, resolved, ttl)
+        return wrapper
+    return decorator
+
+
+def invalidate(*tags):
+    """使依賴這些標籤的快取失效（需在寫入提交之後呼叫）"""
+    get_cache().invalidate(*tags)
+
+
+def invalidate_reports(report_ids):
+    """報告內容變更：報告本身、儀表板與漏洞樹"""
+    invalidate('dashboard', 'tree', *[f'report:{report_id}' for report_id in report_ids])
+
+
+def invalidate_all():
+    """使全部快取失效（資料庫重置、還原、重建計數後）"""
+    invalidate(ALL)
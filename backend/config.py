@@ -22,22 +22,94 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # 設為 True 可看到 SQL 語句
     
+    # 連線池設定（每個 worker 行程各自一個連線池）
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))  # 常駐連線數
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '20'))  # 尖峰時可額外建立的連線數
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))  # 等待可用連線的秒數（整數）
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # 連線使用超過此秒數即重建（需小於 wait_timeout）
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'  # 借出前檢查連線是否仍有效
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', '10'))  # 建立連線逾時秒數
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'connect_args': {'connect_timeout': DB_CONNECT_TIMEOUT}
+    }
+    
     # 檔案上傳設定
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', str(50 * 1024 * 1024)))  # 預設 50MB
     ALLOWED_EXTENSIONS = {'json'}
     
+    # 匯入設定
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))  # 每批多列 INSERT 筆數
+    IMPORT_STREAMING = os.environ.get('IMPORT_STREAMING', 'true').lower() == 'true'  # 串流解析上傳檔案
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', str(os.cpu_count() or 1)))  # 批次匯入解析行程數
+    IMPORT_ASYNC = os.environ.get('IMPORT_ASYNC', 'true').lower() == 'true'  # 上傳後排入背景工作
+    IMPORT_MODE = os.environ.get('IMPORT_MODE', 'append')  # append: 每次建立新報告 / upsert: 合併到同網站的既有報告
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))  # 背景工作執行緒數
+    STATUS_BATCH_SIZE = int(os.environ.get('STATUS_BATCH_SIZE', '1000'))  # 批次狀態更新每次 UPDATE 的 id 數
+    JOB_PROGRESS_INTERVAL = float(os.environ.get('JOB_PROGRESS_INTERVAL', '1.0'))  # 進度寫回資料庫間隔（秒）
+    INSTANCE_PAGE_SIZE = int(os.environ.get('INSTANCE_PAGE_SIZE', '100'))  # 實例列表預設每頁筆數
+    INSTANCE_PAGE_MAX = int(os.environ.get('INSTANCE_PAGE_MAX', '1000'))  # 實例列表每頁上限
+    
+    # 搜尋設定
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')  # auto / fulltext / fts5 / like
+    SEARCH_FIELD_LIMIT = int(os.environ.get('SEARCH_FIELD_LIMIT', '2000'))  # 每個欄位納入索引的字元數上限
+    
+    # 列表分頁設定
+    COUNT_CACHE_TTL = int(os.environ.get('COUNT_CACHE_TTL', '30'))  # include_total 總筆數快取秒數（0 為不快取）
+    
+    # 回應快取設定
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')  # memory / redis / none
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', '60'))  # 快取存活秒數
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1000'))  # memory 後端項目上限
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # memory 後端總大小上限
+    DIFF_CACHE_TTL = int(os.environ.get('DIFF_CACHE_TTL', '3600'))  # 報告差異快取秒數（只用於 redis 後端，其他後端使用 CACHE_TTL）
+    
     # JSON 匯出設定
     EXPORT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))  # 串流匯出每批讀取的實例數
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', str(64 * 1024)))  # 串流回應區塊大小（字元）
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '1'))  # 全部匯出時平行產生 JSON 的執行緒數
+    EXPORT_SAVE = os.environ.get('EXPORT_SAVE', 'false').lower() == 'true'  # 匯出時同時寫入 EXPORT_FOLDER
+    
+    # SQL 匯出設定（mysqldump 不可用或要求壓縮 / 平行時使用 Python 匯出）
+    SQL_DUMP_ROWS_PER_STATEMENT = int(os.environ.get('SQL_DUMP_ROWS_PER_STATEMENT', '1000'))  # 每個 INSERT 的列數上限
+    SQL_DUMP_MAX_PACKET = int(os.environ.get('SQL_DUMP_MAX_PACKET', str(1024 * 1024)))  # 每個 INSERT 的位元組上限
+    SQL_DUMP_GZIP = os.environ.get('SQL_DUMP_GZIP', 'false').lower() == 'true'  # 預設以 gzip 壓縮
+    SQL_DUMP_WORKERS = int(os.environ.get('SQL_DUMP_WORKERS', '1'))  # 平行匯出的資料表數
+    
+    # SQL 還原設定
+    RESTORE_BATCH_SIZE = int(os.environ.get('RESTORE_BATCH_SIZE', '100'))  # 每個交易包含的語句數
+    RESTORE_STOP_ON_ERROR = os.environ.get('RESTORE_STOP_ON_ERROR', 'false').lower() == 'true'  # 遇到錯誤時中止
+    
+    # 伺服器設定（python app.py 與 gunicorn.conf.py / wsgi.py 共用）
+    SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.environ.get('SERVER_PORT', '10000'))
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', str((os.cpu_count() or 1) * 2 + 1)))  # worker 行程數
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', '4'))  # 每個 worker 的執行緒數
+    WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', '120'))  # worker 無回應多久後重啟（秒）
+    WEB_GRACEFUL_TIMEOUT = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '60'))  # 重載 / 停止時等待進行中請求與背景工作的秒數
+    WEB_MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS', '0'))  # 每個 worker 處理多少請求後重啟（0 為不重啟）
+    
+    # 效能指標設定（/api/metrics）
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '1.0'))  # 超過即記錄慢請求與其 SQL（0 為不記錄）
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off')  # 路由超過宣告的查詢數上限時 off / warn / raise
     
     # CORS 設定
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')  # 允許的前端來源，用逗號分隔
     CORS_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
-    CORS_HEADERS = ['Content-Type', 'Authorization']
+    CORS_HEADERS = ['Content-Type', 'Authorization', 'If-None-Match']
+    CORS_EXPOSE_HEADERS = ['ETag']
 
 
 class DevelopmentConfig(Config):
-    DEBUG = True
+    DEBUG = os.environ.get('FLASK_DEBUG', 'true').lower() == 'true'
     SQLALCHEMY_ECHO = True
 
 
@@ -45,9 +117,24 @@ class ProductionConfig(Config):
     DEBUG = False
 
 
+class TestingConfig(Config):
+    """效能基準（bench/）使用：預設為記憶體中的 SQLite，匯入同步執行且不快取回應"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URI', 'sqlite://')
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # SQLite 不使用 DB_POOL_* 與 connect_timeout
+    IMPORT_ASYNC = False
+    CACHE_BACKEND = 'none'
+    SLOW_REQUEST_SECONDS = 0
+    QUERY_BUDGET_MODE = 'raise'
+
+
 config_map = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
 
+# 啟動時使用的設定名稱（wsgi.py 預設 production，python app.py 預設 development）
+CONFIG_NAME = os.environ.get('APP_CONFIG')
+
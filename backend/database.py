@@ -0,0 +1,123 @@
+"""
+資料庫連線管理
+
+- SQLALCHEMY_ENGINE_OPTIONS 由 Config 的 DB_POOL_* 環境變數產生，
+  連線池使用 TimedQueuePool 以統計等待時間與逾時次數
+- raw_connection(): 需要直接操作 PyMySQL 的路徑（SQL 匯出、還原）從
+  同一個連線池借出 DBAPI 連線，close() 時歸還，不另外建立連線；
+  會改變 session 狀態的還原以 invalidate() 作廢連線，不歸還連線池
+- server_connection(): 不指定資料庫的連線，只用於 CREATE / DROP DATABASE
+- pool_stats(): 連線池狀態
+"""
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+
+class TimedQueuePool(QueuePool):
+    """記錄取得連線等待時間的 QueuePool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += elapsed
+                self.wait_max = max(self.wait_max, elapsed)
+
+    def wait_stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_total_seconds': round(self.wait_total, 6),
+                'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'timeouts': self.timeouts
+            }
+
+
+def configure(app):
+    """在 db.init_app 之前呼叫：有設定連線池大小時改用 TimedQueuePool"""
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if 'pool_size' in options:
+        options.setdefault('poolclass', TimedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def raw_connection(engine=None):
+    """
+    從連線池借出 DBAPI（PyMySQL）連線
+
+    需在 app context 中呼叫，或傳入 engine（例如給其他執行緒使用）。
+    close() 時歸還連線池，交易會被回滾；執行過 USE / SET 等改變 session
+    狀態的語句時改呼叫 invalidate()，關閉連線而不歸還。
+    """
+    return (engine or db.engine).raw_connection()
+
+
+def server_connection(uri: str, **kwargs):
+    """
+    建立不指定資料庫的 PyMySQL 連線（CREATE / DROP DATABASE 用，不經連線池）
+
+    Args:
+        uri: SQLALCHEMY_DATABASE_URI
+    """
+    import pymysql
+
+    url = make_url(uri)
+    return pymysql.connect(
+        host=url.host or 'localhost',
+        port=url.port or 3306,
+        user=url.username,
+        password=url.password or '',
+        charset=url.query.get('charset', 'utf8mb4'),
+        **kwargs
+    )
+
+
+def dispose(close: bool = True):
+    """
+    捨棄連線池中所有連線
+
+    資料庫重建後以 close=True 關閉舊連線；fork 出的 worker 行程以
+    close=False 只丟棄繼承來的連線，不關閉父行程仍在使用的 socket。
+    """
+    db.engine.dispose(close=close)
+
+
+def pool_stats(engine=None) -> dict:
+    """連線池狀態：大小、借出數、溢出數與等待時間"""
+    pool = (engine or db.engine).pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(0, pool.overflow()),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout()
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update(pool.wait_stats())
+    return stats
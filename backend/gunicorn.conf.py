@@ -0,0 +1,62 @@
+"""
+gunicorn 設定
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+worker 數、執行緒數與逾時取自 Config（WEB_* 環境變數）。
+- kill -HUP <master pid>：平滑重載，新 worker 啟動後舊 worker 處理完進行中的請求再結束
+  （WEB_PRELOAD=true 時程式碼在 master 載入，更新程式碼需改用 USR2 或重新啟動）
+- 每個 worker 各自有連線池與背景工作執行緒，資料庫連線上限約為
+  WEB_WORKERS × (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+- 多個 worker 時 CACHE_BACKEND=memory 的失效無法同步到其他 worker，
+  會改為不快取（CACHE_BACKEND=none）；需要快取請設定 CACHE_BACKEND=redis
+"""
+import os
+import sys
+
+from config import Config
+
+bind = f"{Config.SERVER_HOST}:{Config.SERVER_PORT}"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = 'gthread'
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = Config.WEB_GRACEFUL_TIMEOUT
+max_requests = Config.WEB_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get('WEB_PRELOAD', 'false').lower() == 'true'
+accesslog = '-'
+
+
+def on_starting(server):
+    """多個 worker 時提示 memory 快取會被停用（實際停用於 post_worker_init）"""
+    if server.cfg.workers > 1 and Config.CACHE_BACKEND == 'memory':
+        server.log.warning(
+            'CACHE_BACKEND=memory 無法在 %d 個 worker 之間同步失效，已改為不快取；'
+            '需要快取請設定 CACHE_BACKEND=redis', server.cfg.workers
+        )
+
+
+def post_fork(server, worker):
+    """preload 時 app 已在 master 建立，丟棄繼承來的資料庫連線"""
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is not None:
+        import database
+        with wsgi.app.app_context():
+            database.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """worker 結束前等待執行中的背景工作完成（最多 graceful_timeout 秒）"""
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is not None:
+        from jobs import get_runner
+        get_runner(wsgi.app).shutdown(wait=True)
+
+
+def post_worker_init(worker):
+    """多個 worker 時停用行程內的 memory 快取（見 on_starting）"""
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is not None:
+        import cache
+        cache.disable_process_local(wsgi.app, worker.cfg.workers)
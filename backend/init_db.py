@@ -2,38 +2,49 @@
 """
 資料庫初始化腳本
 執行此腳本來建立資料庫表結構
+
+create_app() 不會連線資料庫；部署或升級後、啟動 worker 前執行一次：
+    python init_db.py
+    flask --app app init-db
 """
 
-import pymysql
-from config import Config
+from sqlalchemy.engine import make_url
+
+from config import Config, CONFIG_NAME
+from database import server_connection
 
-def create_database():
+def create_database(uri=None):
     """建立資料庫（如果不存在）"""
-    conn = pymysql.connect(
-        host=Config.DB_HOST,
-        port=int(Config.DB_PORT),
-        user=Config.DB_USER,
-        password=Config.DB_PASSWORD,
-        charset='utf8mb4'
-    )
+    uri = uri or Config.SQLALCHEMY_DATABASE_URI
+    db_name = make_url(uri).database
+    conn = server_connection(uri)
     
     try:
         with conn.cursor() as cursor:
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.DB_NAME} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-            print(f"✅ 資料庫 '{Config.DB_NAME}' 已建立或已存在")
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            print(f"✅ 資料庫 '{db_name}' 已建立或已存在")
     finally:
         conn.close()
 
-def create_tables():
-    """建立所有表結構"""
-    from app import create_app
-    from models import db
+def create_tables(app=None):
+    """建立所有表結構（缺少的欄位、索引與計數表一併補上）"""
+    from services import SchemaService
     
-    app = create_app('development')
+    if app is None:
+        from app import create_app
+        app = create_app(CONFIG_NAME or 'development')
     with app.app_context():
-        db.create_all()
+        SchemaService.upgrade()
         print("✅ 資料表已建立")
 
+def bootstrap(app):
+    """開發伺服器啟動前建立資料庫與資料表（無法連線時只顯示警告）"""
+    try:
+        create_database(app.config['SQLALCHEMY_DATABASE_URI'])
+    except Exception as e:
+        print(f"⚠️ 無法自動建立資料庫: {e}")
+    create_tables(app)
+
 def main():
     print("🔧 初始化資料庫...")
     print(f"   主機: {Config.DB_HOST}:{Config.DB_PORT}")
@@ -45,7 +56,7 @@ def main():
         create_tables()
         print()
         print("🎉 資料庫初始化完成！")
-        print("   執行 'python app.py' 啟動伺服器")
+        print("   執行 'python app.py' 啟動開發伺服器，或 'gunicorn -c gunicorn.conf.py wsgi:app'")
     except Exception as e:
         print(f"❌ 初始化失敗: {e}")
         raise
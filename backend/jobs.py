@@ -0,0 +1,186 @@
+"""
+背景工作執行器
+
+上傳的檔案先暫存到 UPLOAD_FOLDER，API 立即回傳 job id，
+實際匯入在執行緒池中進行，進度透過 JobService 查詢。
+"""
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from models import db
+from services import ReportService, JobService, LogService, SchemaService
+import cache
+import metrics
+import sqlrestore
+from database import raw_connection
+
+
+class CountingReader:
+    """包裝檔案物件並統計已讀取的位元組數"""
+
+    def __init__(self, f):
+        self.f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class JobRunner:
+    """以執行緒池執行背景工作，每個工作在自己的 app context 中執行"""
+
+    def __init__(self, app, workers: int = 2):
+        self.app = app
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # 延遲建立，fork 出的 worker 行程才不會繼承父行程的執行緒
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            return self._executor
+
+    def submit(self, fn, *args):
+        return self.executor.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        with self.app.app_context():
+            try:
+                return fn(*args)
+            except Exception as e:
+                print(f"背景工作失敗: {e}")
+                raise
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+def get_runner(app) -> JobRunner:
+    """取得（必要時建立）app 的背景工作執行器"""
+    runner = app.extensions.get('job_runner')
+    if runner is None:
+        runner = app.extensions['job_runner'] = JobRunner(app, app.config.get('JOB_WORKERS', 2))
+    return runner
+
+
+def run_import_job(job_id: str, file_path: str, file_name: str, streaming: bool = True, mode: str = None):
+    """背景匯入單一報告檔"""
+    JobService.start(job_id)
+    reader = None
+    try:
+        with open(file_path, 'rb') as f:
+            reader = CountingReader(f)
+
+            def progress(instances):
+                JobService.update_progress(job_id, processed_instances=instances,
+                                           processed_bytes=reader.bytes_read)
+
+            if streaming:
+                report = ReportService.import_json_stream(reader, file_name, progress=progress, mode=mode)
+            else:
+                report = ReportService.import_json(json.load(reader), file_name, progress=progress, mode=mode)
+
+        stats = report.import_stats
+        JobService.finish(job_id, result={
+            'report_id': report.id,
+            'site_url': report.site_url,
+            'stats': stats
+        }, processed_instances=stats['instances'], processed_bytes=reader.bytes_read)
+        LogService.log('IMPORT', f'匯入報告: {file_name} → {report.site_url} (ID: {report.id}, '
+                                 f'{stats["rows"]} 列, {stats["rows_per_sec"]} 列/秒)')
+    except Exception as e:
+        db.session.rollback()
+        JobService.finish(job_id, errors=[{'file': file_name, 'error': str(e)}],
+                          processed_bytes=reader.bytes_read if reader else 0)
+        LogService.log('IMPORT', f'匯入失敗: {file_name} ({e})')
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def run_bulk_import_job(job_id: str, staged: list, skipped: list, mode: str = None):
+    """背景批次匯入多個報告檔（staged 為 [(file_path, file_name), ...]）"""
+    JobService.start(job_id)
+    sizes = {file_name: os.path.getsize(file_path) for file_path, file_name in staged}
+    done = {'bytes': 0, 'instances': 0}
+
+    def progress(entry):
+        done['bytes'] += sizes.get(entry['file'], 0)
+        done['instances'] += entry.get('stats', {}).get('instances', 0)
+        JobService.update_progress(job_id, processed_bytes=done['bytes'],
+                                   processed_instances=done['instances'])
+
+    try:
+        results = ReportService.parallel_import_files(staged, progress=progress, mode=mode)
+        results['errors'] = skipped + results['errors']
+        JobService.finish(job_id, result=results if results['imported'] else None,
+                          errors=results['errors'])
+        LogService.log('IMPORT', f'批次匯入: 成功 {len(results["imported"])} 個, 失敗 {len(results["errors"])} 個')
+    except Exception as e:
+        db.session.rollback()
+        JobService.finish(job_id, errors=skipped + [{'file': None, 'error': str(e)}])
+        LogService.log('IMPORT', f'批次匯入失敗: {e}')
+    finally:
+        for file_path, _ in staged:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def run_restore_job(job_id: str, file_path: str, file_name: str,
+                    batch_size: int = sqlrestore.DEFAULT_BATCH_SIZE, stop_on_error: bool = False):
+    """
+    背景還原 SQL dump（.sql 或 .sql.gz）
+
+    進度的 processed_instances 為已執行的語句數。
+    """
+    JobService.start(job_id)
+    reader = None
+    try:
+        conn = raw_connection()
+        try:
+            with open(file_path, 'rb') as f:
+                reader = CountingReader(f)
+                source = gzip.GzipFile(fileobj=reader) if file_name.endswith('.gz') else reader
+
+                def progress(statements):
+                    JobService.update_progress(job_id, processed_instances=statements,
+                                               processed_bytes=reader.bytes_read)
+
+                result = sqlrestore.restore(conn, source, batch_size=batch_size,
+                                            stop_on_error=stop_on_error, progress=progress)
+        finally:
+            # dump 中的 USE / SET 會改變連線的資料庫與 session 設定（中止時不會還原），
+            # 作廢連線而不歸還連線池
+            conn.invalidate()
+
+        # dump 可能來自舊版本：補上缺少的結構，並清除所有快取
+        db.session.remove()
+        SchemaService.upgrade()
+        cache.invalidate_all()
+
+        errors = result.pop('errors')
+        metrics.inc('restore_statements_total', result['statements'], result='ok')
+        metrics.inc('restore_statements_total', result['failed'], result='failed')
+        JobService.finish(job_id, result=None if result['stopped'] else result, errors=errors,
+                          processed_instances=result['statements'], processed_bytes=reader.bytes_read)
+        LogService.log('IMPORT', f"還原 SQL: {file_name}（{result['statements']} 個語句，"
+                                 f"失敗 {result['failed']} 個{'，已中止' if result['stopped'] else ''}）")
+    except Exception as e:
+        db.session.rollback()
+        JobService.finish(job_id, errors=[{'file': file_name, 'error': str(e)}],
+                          processed_bytes=reader.bytes_read if reader else 0)
+        LogService.log('IMPORT', f'還原失敗: {file_name} ({e})')
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
@@ -0,0 +1,271 @@
+"""
+串流式 JSON 解析器
+
+提供與 ijson 相容的事件介面（basic_parse / parse），逐段讀取檔案，
+記憶體用量只與單一 token 大小有關，與整份檔案大小無關。
+若環境已安裝 ijson，basic_parse 會改用 ijson 的實作。
+"""
+import codecs
+import json
+import re
+from json.decoder import scanstring
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?')
+LITERALS = {'true': True, 'false': False, 'null': None}
+
+
+class _Reader:
+    """逐段讀取並解碼輸入，維護目前緩衝區與位置"""
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int = None) -> bool:
+        """讀入更多資料，回傳是否有讀到新內容"""
+        if self.eof:
+            return False
+        data = self.f.read(size or self.chunk_size)
+        if isinstance(data, bytes):
+            text = self.decoder.decode(data, final=not data)
+        else:
+            text = data
+        if not data:
+            self.eof = True
+        # 丟棄已處理的部分
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += text
+        return bool(text) or not self.eof
+
+    def skip_ws(self) -> str:
+        """略過空白並回傳下一個字元（EOF 時回傳空字串）"""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def error(self, msg: str):
+        return json.JSONDecodeError(msg, self.buf, self.pos)
+
+    def read_string(self) -> str:
+        """讀取以 '"' 開頭的字串（self.pos 指向開頭引號）"""
+        search = self.pos + 1
+        while True:
+            end = self.buf.find('"', search)
+            if end == -1:
+                search = len(self.buf)
+                start = self.pos
+                # 長字串：讀入量隨緩衝區成長，避免重複掃描
+                if not self.fill(max(self.chunk_size, len(self.buf))):
+                    raise self.error('Unterminated string')
+                search -= start
+                continue
+            # 計算引號前的反斜線數量，奇數表示跳脫
+            backslashes = 0
+            i = end - 1
+            while i > self.pos and self.buf[i] == '\\':
+                backslashes += 1
+                i -= 1
+            if backslashes % 2:
+                search = end + 1
+                continue
+            value, self.pos = scanstring(self.buf, self.pos + 1, True)
+            return value
+
+    def read_number(self):
+        while True:
+            match = NUMBER.match(self.buf, self.pos)
+            if match is None:
+                # 負號剛好落在緩衝區結尾
+                if len(self.buf) - self.pos < 2 and not self.eof:
+                    self.fill()
+                    continue
+                raise self.error('Expecting value')
+            # 數字可能被切在緩衝區結尾（例如 "1." 或 "1e+"）
+            if len(self.buf) - match.end() < 3 and not self.eof:
+                self.fill()
+                continue
+            integer = match.group(1) is None and match.group(2) is None
+            text = match.group(0)
+            self.pos = match.end()
+            return int(text) if integer else float(text)
+
+    def read_literal(self):
+        while len(self.buf) - self.pos < 5 and not self.eof:
+            self.fill()
+        for word, value in LITERALS.items():
+            if self.buf.startswith(word, self.pos):
+                self.pos += len(word)
+                return value
+        raise self.error('Expecting value')
+
+
+def _basic_parse(f, chunk_size: int = CHUNK_SIZE):
+    reader = _Reader(f, chunk_size)
+    stack = []  # 'map' / 'array'
+
+    def parse_value(ch):
+        if ch == '{':
+            reader.pos += 1
+            stack.append('map')
+            return ('start_map', None), 'key_or_end'
+        if ch == '[':
+            reader.pos += 1
+            stack.append('array')
+            return ('start_array', None), 'value_or_end'
+        if ch == '"':
+            return ('string', reader.read_string()), 'after_value'
+        if ch == '-' or ch.isdigit():
+            return ('number', reader.read_number()), 'after_value'
+        if ch in 'tfn':
+            value = reader.read_literal()
+            if value is None:
+                return ('null', None), 'after_value'
+            return ('boolean', value), 'after_value'
+        raise reader.error('Expecting value')
+
+    state = 'value'
+    while True:
+        ch = reader.skip_ws()
+
+        if state == 'after_value':
+            if not stack:
+                if ch:
+                    raise reader.error('Extra data')
+                return
+            if ch == ',':
+                reader.pos += 1
+                state = 'key' if stack[-1] == 'map' else 'value'
+                continue
+            if ch == '}' and stack[-1] == 'map':
+                reader.pos += 1
+                stack.pop()
+                yield 'end_map', None
+                continue
+            if ch == ']' and stack[-1] == 'array':
+                reader.pos += 1
+                stack.pop()
+                yield 'end_array', None
+                continue
+            raise reader.error("Expecting ',' delimiter")
+
+        if not ch:
+            raise reader.error('Unexpected end of data')
+
+        if state in ('key', 'key_or_end'):
+            if ch == '}' and state == 'key_or_end':
+                reader.pos += 1
+                stack.pop()
+                yield 'end_map', None
+                state = 'after_value'
+                continue
+            if ch != '"':
+                raise reader.error('Expecting property name enclosed in double quotes')
+            key = reader.read_string()
+            if reader.skip_ws() != ':':
+                raise reader.error("Expecting ':' delimiter")
+            reader.pos += 1
+            yield 'map_key', key
+            state = 'value'
+            continue
+
+        if state == 'value_or_end' and ch == ']':
+            reader.pos += 1
+            stack.pop()
+            yield 'end_array', None
+            state = 'after_value'
+            continue
+
+        event, state = parse_value(ch)
+        yield event
+
+
+def basic_parse(f, chunk_size: int = CHUNK_SIZE):
+    """
+    逐一產生 (event, value) 事件
+
+    事件名稱與 ijson 相同：start_map, map_key, end_map, start_array,
+    end_array, string, number, boolean, null。數字以 int/float 表示。
+
+    Args:
+        f: 檔案物件（bytes 或 str 皆可）
+        chunk_size: 每次讀取的大小
+    """
+    if ijson is not None:
+        return ijson.basic_parse(f, buf_size=chunk_size, use_float=True)
+    return _basic_parse(f, chunk_size)
+
+
+def parse(f, chunk_size: int = CHUNK_SIZE):
+    """逐一產生 (prefix, event, value) 事件，prefix 格式同 ijson"""
+    path = []
+    for event, value in basic_parse(f, chunk_size):
+        if event == 'map_key':
+            yield '.'.join(path[:-1]) if path else '', event, value
+            path[-1] = value
+            continue
+        if event in ('end_map', 'end_array'):
+            path.pop()
+        prefix = '.'.join(path)
+        yield prefix, event, value
+        if event == 'start_map':
+            path.append(None)
+        elif event == 'start_array':
+            path.append('item')
+
+
+def build_value(events, first=None):
+    """
+    從事件序列組出下一個完整的值
+
+    Args:
+        events: basic_parse 產生的事件迭代器
+        first: 已取出的第一個事件（可選）
+    """
+    event, value = first if first is not None else next(events)
+    if event == 'start_map':
+        result = {}
+        for event, value in events:
+            if event == 'end_map':
+                return result
+            result[value] = build_value(events)
+        raise json.JSONDecodeError('Unexpected end of data', '', 0)
+    if event == 'start_array':
+        result = []
+        for item in events:
+            if item[0] == 'end_array':
+                return result
+            result.append(build_value(events, item))
+        raise json.JSONDecodeError('Unexpected end of data', '', 0)
+    return value
+
+
+def skip_value(events, first=None):
+    """略過下一個值而不建立物件"""
+    event, _ = first if first is not None else next(events)
+    if event not in ('start_map', 'start_array'):
+        return
+    depth = 1
+    for event, _ in events:
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                return
@@ -0,0 +1,303 @@
+"""
+效能指標
+
+- 每個請求的延遲、SQL 查詢數與資料庫時間（SQLAlchemy engine 事件），依路由規則分組
+- 匯入、匯出、SQL dump / 還原的處理量計數
+- 連線池與回應快取狀態（擷取時即時讀取）
+- 慢請求記錄：超過 SLOW_REQUEST_SECONDS 的請求寫入 app.logger，附上最慢的 SQL
+  與重複最多次的 SQL（N+1 查詢的特徵）
+
+以 Prometheus 文字格式輸出於 /api/metrics。指標存在各行程的記憶體中，
+多個 worker 時每次擷取只會看到其中一個行程的數值。
+"""
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter as StatementCounter
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+PREFIX = 'vulntracker_'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SLOW_STATEMENTS = 3       # 慢請求記錄中列出的最慢 SQL 數
+STATEMENT_PREVIEW = 500   # 記錄中每個 SQL 的長度上限
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不減的計數"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            yield self.name + _labels(self.labels, key), value
+
+
+class Histogram:
+    """累積分布（固定 bucket）"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values = {}  # labels -> [各 bucket 次數..., +Inf 次數, 總和]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            data = self.values.get(key)
+            if data is None:
+                data = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            data[bisect.bisect_left(self.buckets, value)] += 1
+            data[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self.values.items())
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), data):
+                cumulative += count
+                yield self.name + '_bucket' + _labels(self.labels, key, f'le="{bound}"'), cumulative
+            yield self.name + '_sum' + _labels(self.labels, key), data[-1]
+            yield self.name + '_count' + _labels(self.labels, key), cumulative
+
+
+class Registry:
+    """一個 app 的全部指標"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []  # 擷取時呼叫，回傳 [(name, type, help, value)]
+
+    def add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{sample} {_number(value)}' for sample, value in metric.samples())
+        for collector in self.collectors:
+            for name, kind, help, value in collector():
+                lines.append(f'# HELP {PREFIX}{name} {help}')
+                lines.append(f'# TYPE {PREFIX}{name} {kind}')
+                lines.append(f'{PREFIX}{name} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _build_registry() -> Registry:
+    registry = Registry()
+    endpoint = ('endpoint',)
+    for metric in (
+        Counter(PREFIX + 'http_requests_total', '請求數', ('endpoint', 'method', 'status')),
+        Histogram(PREFIX + 'http_request_duration_seconds', '請求處理時間（含串流回應）', LATENCY_BUCKETS, endpoint),
+        Histogram(PREFIX + 'http_request_queries', '每個請求的 SQL 查詢數', QUERY_BUCKETS, endpoint),
+        Histogram(PREFIX + 'http_request_db_seconds', '每個請求的資料庫時間', LATENCY_BUCKETS, endpoint),
+        Counter(PREFIX + 'http_slow_requests_total', '超過 SLOW_REQUEST_SECONDS 的請求數', endpoint),
+        Counter(PREFIX + 'db_queries_total', 'SQL 查詢數（含背景工作）'),
+        Counter(PREFIX + 'db_query_seconds_total', 'SQL 查詢累計時間'),
+        Counter(PREFIX + 'import_reports_total', '匯入的報告檔數', ('mode',)),
+        Counter(PREFIX + 'import_rows_total', '匯入寫入的漏洞與實例列數'),
+        Counter(PREFIX + 'import_seconds_total', '匯入寫入累計時間'),
+        Counter(PREFIX + 'export_bytes_total', '匯出的位元組數', ('kind',)),
+        Counter(PREFIX + 'sql_dump_rows_total', 'Python SQL 匯出的資料列數'),
+        Counter(PREFIX + 'restore_statements_total', 'SQL 還原執行的語句數', ('result',)),
+    ):
+        registry.add(metric)
+    return registry
+
+
+class RequestStats:
+    """單一請求的查詢統計（存於 flask.g）"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.status = None
+        self.slowest = []  # 最慢的 SQL（heap: (秒數, 序號, SQL)）
+        self.statements = StatementCounter()
+
+    def record(self, statement: str, elapsed: float):
+        self.queries += 1
+        self.db_time += elapsed
+        self.statements[statement] += 1
+        item = (elapsed, self.queries, statement)
+        if len(self.slowest) < SLOW_STATEMENTS:
+            heapq.heappush(self.slowest, item)
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+
+
+def request_stats():
+    """目前請求的 RequestStats（不在請求中時為 None）"""
+    if not has_request_context():
+        return None
+    return g.get('_request_stats')
+
+
+def get_registry():
+    """目前 app 的指標（未啟用或不在 app context 中時為 None）"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('metrics')
+
+
+def inc(name: str, value=1, **labels):
+    """增加計數（未啟用時不動作），name 不含前綴"""
+    registry = get_registry()
+    if registry is not None and value:
+        registry.metrics[PREFIX + name].inc(value, **labels)
+
+
+def count_stream(chunks, kind: str):
+    """包裝串流回應的產生器，累計輸出的位元組數"""
+    registry = get_registry()
+    counter = registry.metrics[PREFIX + 'export_bytes_total'] if registry is not None else None
+    for chunk in chunks:
+        if counter is not None:
+            counter.inc(len(chunk.encode('utf-8')) if isinstance(chunk, str) else len(chunk), kind=kind)
+        yield chunk
+
+
+def _preview(statement: str) -> str:
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= STATEMENT_PREVIEW else statement[:STATEMENT_PREVIEW] + '...'
+
+
+def _pool_gauges(stats: dict) -> list:
+    """database.pool_stats() 轉為指標"""
+    gauges = [
+        ('db_pool_size', 'gauge', '連線池常駐連線數', 'size'),
+        ('db_pool_checked_out', 'gauge', '借出中的連線數', 'checked_out'),
+        ('db_pool_overflow', 'gauge', '額外建立的連線數', 'overflow'),
+        ('db_pool_checkouts_total', 'counter', '取得連線次數', 'checkouts'),
+        ('db_pool_wait_seconds_total', 'counter', '等待可用連線的累計時間', 'wait_total_seconds'),
+        ('db_pool_timeouts_total', 'counter', '等待連線逾時次數', 'timeouts'),
+    ]
+    return [(name, kind, help, stats[key]) for name, kind, help, key in gauges if key in stats]
+
+
+def _cache_gauges(stats: dict) -> list:
+    """回應快取命中統計轉為指標"""
+    return [
+        ('cache_hits_total', 'counter', '回應快取命中次數', stats.get('hits', 0)),
+        ('cache_misses_total', 'counter', '回應快取未命中次數', stats.get('misses', 0)),
+    ]
+
+
+def init_app(app, engine):
+    """
+    註冊請求鉤子與 engine 事件（在 db.init_app 之後呼叫）
+
+    Args:
+        app: Flask app
+        engine: 要統計查詢的 SQLAlchemy engine
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    import cache
+    import database
+
+    registry = app.extensions['metrics'] = _build_registry()
+    registry.collectors.append(lambda: _pool_gauges(database.pool_stats(engine)))
+    registry.collectors.append(lambda: _cache_gauges(cache.get_cache().stats()))
+    queries_total = registry.metrics[PREFIX + 'db_queries_total']
+    query_seconds = registry.metrics[PREFIX + 'db_query_seconds_total']
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        queries_total.inc()
+        query_seconds.inc(elapsed)
+        stats = request_stats()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        # 查詢失敗時不會觸發 after_cursor_execute
+        if context.connection is not None and context.connection.info.get('metrics_started'):
+            context.connection.info['metrics_started'].pop()
+
+    @app.before_request
+    def start_request_stats():
+        g._request_stats = RequestStats()
+
+    @app.after_request
+    def record_status(response):
+        stats = request_stats()
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_stats(exc):
+        # 串流回應（stream_with_context）在輸出完畢後才執行 teardown，延遲包含串流時間
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = stats.status if stats.status is not None else (500 if exc is not None else '')
+        registry.metrics[PREFIX + 'http_requests_total'].inc(endpoint=endpoint, method=request.method, status=status)
+        registry.metrics[PREFIX + 'http_request_duration_seconds'].observe(elapsed, endpoint=endpoint)
+        registry.metrics[PREFIX + 'http_request_queries'].observe(stats.queries, endpoint=endpoint)
+        registry.metrics[PREFIX + 'http_request_db_seconds'].observe(stats.db_time, endpoint=endpoint)
+
+        slow_seconds = current_app.config.get('SLOW_REQUEST_SECONDS')
+        if slow_seconds and elapsed >= slow_seconds:
+            registry.metrics[PREFIX + 'http_slow_requests_total'].inc(endpoint=endpoint)
+            lines = [f'慢請求: {request.method} {request.full_path.rstrip("?")} {elapsed:.3f}s，'
+                     f'{stats.queries} 個查詢（資料庫 {stats.db_time:.3f}s）']
+            for seconds, _, statement in sorted(stats.slowest, reverse=True):
+                lines.append(f'  {seconds * 1000:.1f}ms  {_preview(statement)}')
+            if stats.statements:
+                statement, count = stats.statements.most_common(1)[0]
+                if count > 1:
+                    lines.append(f'  重複 {count} 次  {_preview(statement)}')
+            app.logger.warning('\n'.join(lines))
+
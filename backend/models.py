@@ -2,6 +2,7 @@
 漏洞報告管理系統 - 資料庫模型
 """
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import mysql
 from datetime import datetime
 from enum import Enum
 
@@ -16,6 +17,13 @@ class FixStatus(Enum):
     FALSE_POSITIVE = "false_positive"  # 誤報
 
 
+class JobStatus(Enum):
+    QUEUED = "queued"        # 等待中
+    RUNNING = "running"      # 執行中
+    SUCCEEDED = "succeeded"  # 已完成
+    FAILED = "failed"        # 失敗
+
+
 class SeverityLevel(Enum):
     HIGH = "High"
     MEDIUM = "Medium"
@@ -32,7 +40,7 @@ class Report(db.Model):
     summary_sequences = db.Column(db.Text)
     sequence_details = db.Column(db.Text)
     file_name = db.Column(db.String(255))  # 原始 JSON 檔名
-    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     notes = db.Column(db.Text)  # 報告級別備註
     
     # 關聯
@@ -40,15 +48,6 @@ class Report(db.Model):
     
     def __repr__(self):
         return f'<Report {self.id}: {self.site_url}>'
-    
-    @property
-    def stats(self):
-        """統計各嚴重等級數量"""
-        stats = {s.value: 0 for s in SeverityLevel}
-        for vuln in self.vulnerabilities:
-            if vuln.severity in stats:
-                stats[vuln.severity] += 1
-        return stats
 
 
 class Vulnerability(db.Model):
@@ -60,6 +59,7 @@ class Vulnerability(db.Model):
     severity = db.Column(db.String(50), nullable=False, index=True)  # High, Medium, Low, Informational
     title = db.Column(db.String(500), nullable=False)
     description = db.Column(db.Text)
+    instance_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 實例數（匯入時寫入）
     
     # 關聯
     instances = db.relationship('VulnInstance', backref='vulnerability', lazy='dynamic', cascade='all, delete-orphan')
@@ -88,9 +88,19 @@ class VulnInstance(db.Model):
     fixed_by = db.Column(db.String(100))
     fix_notes = db.Column(db.Text)  # 修復備註
     
+    # 跨報告識別同一個發現：sha256(site_url, 漏洞標題, url, method, parameter)
+    # 同一漏洞內重複的實例為 NULL（唯一索引允許多個 NULL）
+    fingerprint = db.Column(db.String(64), index=True)
+    first_seen_at = db.Column(db.DateTime)  # 第一次出現的匯入時間
+    last_seen_at = db.Column(db.DateTime)   # 最近一次出現的匯入時間（upsert 匯入時更新）
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('uq_vuln_instances_fingerprint', 'vulnerability_id', 'fingerprint', unique=True),
+    )
+    
     def __repr__(self):
         return f'<VulnInstance {self.id}: {self.url[:50]}>'
 
@@ -108,10 +118,103 @@ class OperationLog(db.Model):
         return f'<Log {self.action_type}: {self.message[:30]}>'
 
 
+class ReportCounter(db.Model):
+    """報告統計計數表（匯入、刪除、狀態變更時同步維護）"""
+    __tablename__ = 'report_counters'
+    
+    report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='CASCADE'), primary_key=True)
+    dimension = db.Column(db.String(20), primary_key=True)  # severity: 漏洞類型數, fix_status: 實例數
+    bucket = db.Column(db.String(50), primary_key=True)     # 嚴重等級或修復狀態
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ReportCounter {self.report_id} {self.dimension}:{self.bucket}={self.count}>'
+
+
+class ImportJob(db.Model):
+    """背景工作表（匯入等長時間作業）"""
+    __tablename__ = 'import_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False, index=True)  # IMPORT, BULK_IMPORT, RESTORE
+    status = db.Column(db.String(20), default=JobStatus.QUEUED.value, index=True)
+    file_name = db.Column(db.String(255))
+    total_bytes = db.Column(db.BigInteger, default=0)
+    processed_bytes = db.Column(db.BigInteger, default=0)
+    processed_instances = db.Column(db.Integer, default=0)
+    result = db.Column(db.JSON)    # 完成後的結果（report_id 等）
+    errors = db.Column(db.JSON)    # 錯誤訊息列表
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ImportJob {self.id}: {self.job_type} {self.status}>'
+
+
+class SearchDocument(db.Model):
+    """全文搜尋文件（每個漏洞實例一筆，body 為切詞後的 token，見 search.py）"""
+    __tablename__ = 'search_documents'
+    
+    instance_id = db.Column(db.Integer, db.ForeignKey('vuln_instances.id', ondelete='CASCADE'), primary_key=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='CASCADE'), nullable=False, index=True)
+    body = db.Column(db.Text().with_variant(mysql.LONGTEXT(), 'mysql', 'mariadb'), nullable=False)
+    
+    __table_args__ = (
+        # FULLTEXT 索引只在 MariaDB / MySQL 建立，SQLite 改用 FTS5 虛擬表
+        db.Index('ft_search_documents_body', 'body', mysql_prefix='FULLTEXT').ddl_if(dialect=('mysql', 'mariadb')),
+    )
+    
+    def __repr__(self):
+        return f'<SearchDocument {self.instance_id}>'
+
+
 # 初始化資料庫輔助函數
 def init_db(app):
     """初始化資料庫"""
     db.init_app(app)
     with app.app_context():
-        db.create_all()
+        ensure_schema()
         print("資料庫表已建立")
+
+
+def ensure_schema() -> list:
+    """
+    建立缺少的資料表、欄位與索引（需在 app context 中執行）
+    
+    db.create_all() 不會修改既有資料表，新版本新增的欄位在此以 ALTER TABLE 補上。
+    
+    Returns:
+        list: 新建立的資料表名稱與新增的 '表.欄位'
+    """
+    engine = db.engine
+    inspector = db.inspect(engine)
+    existing = set(inspector.get_table_names())
+    db.create_all()
+    
+    changes = [name for name in db.metadata.tables if name not in existing]
+    preparer = engine.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        
+        columns = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            ddl = f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} " \
+                  f"{column.type.compile(dialect=engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            with engine.begin() as conn:
+                conn.execute(db.text(ddl))
+            changes.append(f'{table.name}.{column.name}')
+        
+        indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(engine)
+    
+    return changes
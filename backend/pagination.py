@@ -0,0 +1,119 @@
+"""
+Keyset（游標）分頁
+
+列表依 (排序欄位..., id) 遞減排序，下一頁以「小於上一頁最後一筆」的條件
+取得，不使用 OFFSET，翻到多深的頁數查詢成本都相同。
+
+游標是上一頁最後一筆排序值的 base64 編碼，對前端而言不透明。
+總筆數不再每次計算，需以 include_total 要求，並快取 COUNT_CACHE_TTL 秒。
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from models import db
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(values: list) -> str:
+    """排序值 → 游標字串（datetime 以 {'d': iso} 表示）"""
+    data = [{'d': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list:
+    """游標字串 → 排序值；格式錯誤時拋出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if not isinstance(data, list):
+            raise ValueError
+        return [datetime.fromisoformat(v['d']) if isinstance(v, dict) else v for v in data]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('無效的分頁游標')
+
+
+def get_limit(limit: int = None, default: int = DEFAULT_LIMIT) -> int:
+    if not limit or limit < 1:
+        return default
+    return min(limit, MAX_LIMIT)
+
+
+def _before(columns: list, values: list):
+    """(c1, c2, ...) < (v1, v2, ...) 展開為 OR 條件，各資料庫都能走索引範圍掃描"""
+    conditions = []
+    for i, column in enumerate(columns):
+        conditions.append(db.and_(*[columns[j] == values[j] for j in range(i)], column < values[i]))
+    return db.or_(*conditions)
+
+
+def keyset_page(query, keys: list, cursor: str = None, limit: int = DEFAULT_LIMIT):
+    """
+    以 keyset 取得一頁資料
+
+    Args:
+        query: select 語句（需包含 keys 中的欄位）
+        keys: [(排序運算式, 結果列屬性名), ...]，皆為遞減排序，最後一個需唯一
+        cursor: 上一頁回傳的 next_cursor
+        limit: 每頁筆數
+
+    Returns:
+        tuple: (本頁資料列, 下一頁游標或 None)
+    """
+    columns = [column for column, _ in keys]
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError('無效的分頁游標')
+        query = query.where(_before(columns, values))
+
+    rows = db.session.execute(
+        query.order_by(*[column.desc() for column in columns]).limit(limit + 1)
+    ).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], attr) for _, attr in keys])
+
+
+class _CountCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+
+def cached_count(key: tuple, query) -> int:
+    """
+    計算查詢的總筆數並快取（COUNT_CACHE_TTL 秒，0 表示不快取）
+
+    Args:
+        key: 快取鍵（需包含會影響結果的篩選條件）
+        query: 未排序、未分頁的 select 語句
+    """
+    ttl = current_app.config.get('COUNT_CACHE_TTL', 30)
+    cache = current_app.extensions.setdefault('count_cache', _CountCache())
+    now = time.monotonic()
+    if ttl:
+        with cache.lock:
+            entry = cache.entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+
+    total = db.session.execute(
+        db.select(db.func.count()).select_from(query.order_by(None).subquery())
+    ).scalar()
+
+    if ttl:
+        with cache.lock:
+            # 清掉過期項目，避免篩選條件很多時無限成長
+            if len(cache.entries) > 1000:
+                cache.entries = {k: v for k, v in cache.entries.items() if v[1] > now}
+            cache.entries[key] = (total, now + ttl)
+    return total
@@ -0,0 +1,54 @@
+"""
+每個請求的 SQL 查詢數上限
+
+路由以 @query_budget.limit(n) 宣告最多執行的 SQL 語句數，計數來自 SQLAlchemy
+engine 事件（含串流回應輸出期間的查詢）。QUERY_BUDGET_MODE 決定超過時的處理：
+
+- off：不計數（預設）
+- warn：寫入 app.logger
+- raise：拋出 QueryBudgetExceeded（testing 設定使用，N+1 查詢直接失敗）
+
+bench/query_counts.py 另外檢查所有 /api/* 路由（含寫入路由）的查詢數不隨資料量成長。
+"""
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+MODES = ('off', 'warn', 'raise')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """請求執行的 SQL 查詢數超過路由宣告的上限"""
+
+
+def limit(queries: int):
+    """宣告路由最多執行的 SQL 語句數（放在 @cached 等裝飾器的內側）"""
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def init_app(app, engine):
+    """依 QUERY_BUDGET_MODE 註冊計數與檢查（在 app context 中呼叫）"""
+    mode = app.config.get('QUERY_BUDGET_MODE', 'off')
+    if mode not in MODES:
+        raise ValueError(f'無效的 QUERY_BUDGET_MODE: {mode}')
+    if mode == 'off':
+        return
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        # 背景工作與匯出執行緒沒有 request context，不計入
+        if has_request_context():
+            g._query_count = g.get('_query_count', 0) + 1
+
+    @app.teardown_request
+    def check_query_budget(exc):
+        count = g.pop('_query_count', 0)
+        budget = getattr(app.view_functions.get(request.endpoint), 'query_budget', None)
+        if exc is not None or budget is None or count <= budget:
+            return
+        message = f'{request.method} {request.path} 執行了 {count} 個 SQL 查詢，超過上限 {budget}'
+        if mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        app.logger.warning(message)
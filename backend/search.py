@@ -0,0 +1,368 @@
+"""
+全文搜尋
+
+每個漏洞實例建立一份搜尋文件（漏洞標題、描述、網站、URL、參數、
+攻擊、Evidence、Other Info），依資料庫選用不同的索引後端：
+
+- fulltext: MariaDB / MySQL 的 search_documents 表 + FULLTEXT 索引
+- fts5: SQLite 的 FTS5 虛擬表（本機開發與測試用）
+- like: 無索引，以 LIKE 比對（相容舊行為）
+
+文件內容在寫入前先切成 token：英數字詞轉小寫並加上 'w_' 前綴；
+中日韓文字以相鄰兩字（bigram）切分，並以 'c_' + 字碼十六進位表示。
+如此 MariaDB 內建的 FULLTEXT 解析器也能索引中文，且 token 長度
+不受 innodb_ft_min_token_size 與停用字表影響。
+"""
+import re
+
+from flask import current_app
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import OperationalError
+
+from models import db, Report, Vulnerability, VulnInstance, SearchDocument
+from pagination import keyset_page, cached_count, get_limit
+
+WORD = re.compile(r'[0-9a-z]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+MAX_WORD_LENGTH = 80  # innodb_ft_max_token_size 預設 84
+
+# 實例文件內容（依序）
+VULN_FIELDS = ('title', 'description')
+INSTANCE_FIELDS = ('url', 'parameter', 'attack', 'evidence', 'other_info')
+
+
+def _cjk_token(text: str) -> str:
+    return 'c_' + ''.join(f'{ord(ch):05x}' for ch in text)
+
+
+def iter_tokens(text: str, query: bool = False):
+    """
+    將文字切成索引 token
+
+    Args:
+        text: 原始文字
+        query: 查詢模式時，單一中文字以前綴比對（回傳 (token, prefix) 配對）
+    """
+    for match in WORD.finditer(text.lower()):
+        run = match.group()
+        if run[0] < '\u0080':
+            token = 'w_' + run[:MAX_WORD_LENGTH]
+            yield (token, True) if query else token
+        elif len(run) == 1:
+            yield (_cjk_token(run), True) if query else _cjk_token(run)
+        else:
+            for i in range(len(run) - 1):
+                token = _cjk_token(run[i:i + 2])
+                yield (token, False) if query else token
+
+
+def build_body(*texts, limit: int = None) -> str:
+    """將多段文字切詞後以空白串接（每段只取前 limit 個字元）"""
+    tokens = []
+    for text in texts:
+        if text:
+            tokens.extend(iter_tokens(text[:limit] if limit else text))
+    return ' '.join(tokens)
+
+
+def query_terms(q: str) -> list:
+    """
+    查詢字串 → 搜尋條件列表
+
+    以空白分隔的每一段為一個條件：只有一個 token 時回傳 (token, prefix)，
+    多個 token（例如 URL 或中文詞）回傳 (token 列表, False)，以片語比對
+    token 相鄰順序，效果接近子字串比對。
+    """
+    terms = []
+    for part in q.split():
+        tokens = list(iter_tokens(part, query=True))
+        if len(tokens) == 1:
+            terms.append(tokens[0])
+        elif tokens:
+            terms.append(([token for token, _ in tokens], False))
+    return terms
+
+
+def render_query(terms: list, required: str = '') -> str:
+    """將搜尋條件組成 FULLTEXT / FTS5 查詢語法（片語加引號，前綴加 *）"""
+    parts = []
+    for term, prefix in terms:
+        if isinstance(term, list):
+            parts.append(required + '"' + ' '.join(term) + '"')
+        else:
+            parts.append(required + term + ('*' if prefix else ''))
+    return ' '.join(parts)
+
+
+class LikeBackend:
+    """無索引的 LIKE 比對（舊行為）"""
+
+    name = 'like'
+
+    def ensure(self, changes: list) -> bool:
+        return False
+
+    def index(self, rows: list):
+        pass
+
+    def delete_report(self, report_id: int):
+        pass
+
+    def clear(self):
+        pass
+
+    def apply(self, query, q: str):
+        query = query.where(db.or_(
+            VulnInstance.url.contains(q),
+            Vulnerability.title.contains(q),
+            Report.site_url.contains(q)
+        ))
+        return query, None
+
+
+class FulltextBackend:
+    """MariaDB / MySQL FULLTEXT 索引（search_documents 表）"""
+
+    name = 'fulltext'
+
+    def ensure(self, changes: list) -> bool:
+        # 資料表與 FULLTEXT 索引由 ensure_schema 建立
+        return 'search_documents' in changes
+
+    def index(self, rows: list):
+        db.session.execute(db.insert(SearchDocument), rows)
+
+    def delete_report(self, report_id: int):
+        db.session.execute(db.delete(SearchDocument).where(SearchDocument.report_id == report_id))
+
+    def clear(self):
+        db.session.execute(db.delete(SearchDocument))
+
+    def apply(self, query, q: str):
+        """加上比對條件，回傳 (query, 相關度分數運算式)；無可索引字詞時回傳 None"""
+        terms = query_terms(q)
+        if not terms:
+            return None
+        # BOOLEAN MODE：每個條件都必須出現，單一英文字詞以前綴比對
+        against = render_query(terms, required='+')
+        score = mysql.match(SearchDocument.body, against=against).in_boolean_mode()
+        query = query.join(SearchDocument, SearchDocument.instance_id == VulnInstance.id).where(score)
+        return query, score
+
+
+class FTS5Backend:
+    """SQLite FTS5 虛擬表（rowid 為實例 ID）"""
+
+    name = 'fts5'
+    TABLE = 'search_fts'
+
+    def ensure(self, changes: list) -> bool:
+        exists = db.session.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.TABLE}
+        ).first()
+        if exists:
+            return False
+        with db.engine.begin() as conn:
+            conn.execute(db.text(
+                f"CREATE VIRTUAL TABLE {self.TABLE} USING fts5(body, tokenize = \"unicode61 tokenchars '_'\")"
+            ))
+        return True
+
+    def index(self, rows: list):
+        db.session.execute(
+            db.text(f"INSERT INTO {self.TABLE} (rowid, body) VALUES (:instance_id, :body)"),
+            rows
+        )
+
+    def delete_report(self, report_id: int):
+        db.session.execute(db.text(
+            f"DELETE FROM {self.TABLE} WHERE rowid IN ("
+            f"SELECT vuln_instances.id FROM vuln_instances "
+            f"JOIN vulnerabilities ON vulnerabilities.id = vuln_instances.vulnerability_id "
+            f"WHERE vulnerabilities.report_id = :report_id)"
+        ), {'report_id': report_id})
+
+    def clear(self):
+        db.session.execute(db.text(f"DELETE FROM {self.TABLE}"))
+
+    def apply(self, query, q: str):
+        terms = query_terms(q)
+        if not terms:
+            return None
+        expression = render_query(terms)
+        # bm25 越小越相關，取負值使分數越大越相關
+        matches = db.text(
+            f"SELECT rowid AS instance_id, -bm25({self.TABLE}) AS score FROM {self.TABLE} "
+            f"WHERE {self.TABLE} MATCH :expression"
+        ).bindparams(expression=expression) \
+            .columns(db.column('instance_id', db.Integer), db.column('score', db.Float)) \
+            .subquery('matches')
+        return query.join(matches, matches.c.instance_id == VulnInstance.id), matches.c.score
+
+
+BACKENDS = {
+    'like': LikeBackend,
+    'fulltext': FulltextBackend,
+    'fts5': FTS5Backend,
+}
+
+
+def _detect_backend() -> str:
+    dialect = db.engine.dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        return 'fulltext'
+    if dialect == 'sqlite':
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(db.text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)"))
+                conn.execute(db.text("DROP TABLE temp.fts5_probe"))
+            return 'fts5'
+        except OperationalError:
+            pass
+    return 'like'
+
+
+def get_backend():
+    """取得目前 app 的搜尋後端（SEARCH_BACKEND: auto / fulltext / fts5 / like）"""
+    backend = current_app.extensions.get('search_backend')
+    if backend is None:
+        name = current_app.config.get('SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            name = _detect_backend()
+        if name not in BACKENDS:
+            raise ValueError(f"無效搜尋後端: {name}")
+        backend = current_app.extensions['search_backend'] = BACKENDS[name]()
+    return backend
+
+
+class SearchService:
+    """搜尋索引維護與查詢"""
+
+    @staticmethod
+    def ensure_index(changes: list) -> bool:
+        """建立搜尋後端所需的資料表，回傳是否需要由既有資料建立索引"""
+        return get_backend().ensure(changes)
+
+    @staticmethod
+    def index_report(report_id: int) -> int:
+        """
+        為報告的所有實例建立搜尋文件（不提交，與匯入在同一交易）
+
+        實例依漏洞排序讀取，漏洞標題與描述只切詞一次。
+
+        Returns:
+            int: 建立的文件數
+        """
+        backend = get_backend()
+        if isinstance(backend, LikeBackend):
+            return 0
+
+        limit = current_app.config.get('SEARCH_FIELD_LIMIT', 2000)
+        batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+        site_url = db.session.execute(db.select(Report.site_url).where(Report.id == report_id)).scalar()
+        site_body = build_body(site_url)
+
+        rows = db.session.execute(
+            db.select(VulnInstance.id, VulnInstance.vulnerability_id, Vulnerability.title, Vulnerability.description,
+                      *[getattr(VulnInstance, f) for f in INSTANCE_FIELDS])
+            .join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id)
+            .where(Vulnerability.report_id == report_id)
+            .order_by(VulnInstance.vulnerability_id, VulnInstance.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        count = 0
+        batch = []
+        vuln_id = vuln_body = None
+        for row in rows:
+            if row.vulnerability_id != vuln_id:
+                vuln_id = row.vulnerability_id
+                vuln_body = build_body(*(getattr(row, f) for f in VULN_FIELDS), limit=limit)
+            body = build_body(*(getattr(row, f) for f in INSTANCE_FIELDS), limit=limit)
+            batch.append({
+                'instance_id': row.id,
+                'report_id': report_id,
+                'body': ' '.join(part for part in (vuln_body, site_body, body) if part)
+            })
+            if len(batch) >= batch_size:
+                backend.index(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            backend.index(batch)
+            count += len(batch)
+        return count
+
+    @staticmethod
+    def delete_report(report_id: int):
+        """刪除報告的搜尋文件（不提交，需在刪除實例之前呼叫）"""
+        get_backend().delete_report(report_id)
+
+    @staticmethod
+    def reindex(report_id: int = None) -> int:
+        """重建搜尋索引（全部或單一報告）並提交"""
+        backend = get_backend()
+        if report_id is None:
+            backend.clear()
+            report_ids = db.session.execute(db.select(Report.id).order_by(Report.id)).scalars().all()
+        else:
+            backend.delete_report(report_id)
+            report_ids = [report_id]
+
+        count = 0
+        for rid in report_ids:
+            count += SearchService.index_report(rid)
+            db.session.commit()
+        db.session.commit()
+        return count
+
+    @staticmethod
+    def search(q: str = '', severity: str = None, status: str = None, cursor: str = None,
+               limit: int = None, include_total: bool = False) -> dict:
+        """
+        搜尋漏洞實例
+
+        有關鍵字時依相關度排序（like 後端依 ID 新到舊），以 (分數, 實例 ID)
+        做 keyset 分頁；嚴重等級與狀態篩選在同一查詢中套用。
+        """
+        backend = get_backend()
+        limit = get_limit(limit)
+
+        query = db.select(VulnInstance.id, VulnInstance.url, VulnInstance.fix_status,
+                          Vulnerability.severity, Vulnerability.title, Report.id.label('report_id'),
+                          Report.site_url) \
+            .join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id) \
+            .join(Report, Vulnerability.report_id == Report.id)
+        if severity:
+            query = query.where(Vulnerability.severity == severity)
+        if status:
+            query = query.where(VulnInstance.fix_status == status)
+
+        score = None
+        if q:
+            searched = backend.apply(query, q)
+            # 查詢字串沒有可索引的字詞（例如只有符號）時退回 LIKE
+            query, score = searched if searched is not None else LikeBackend().apply(query, q)
+
+        keys = [(VulnInstance.id, 'id')]
+        if score is not None:
+            query = query.add_columns(score.label('score'))
+            keys.insert(0, (score, 'score'))
+        rows, next_cursor = keyset_page(query, keys, cursor, limit)
+
+        result = {
+            'results': [{
+                'instance_id': row.id,
+                'url': row.url,
+                'severity': row.severity,
+                'title': row.title,
+                'fix_status': row.fix_status,
+                'report_id': row.report_id,
+                'site_url': row.site_url
+            } for row in rows],
+            'next_cursor': next_cursor,
+            'backend': backend.name
+        }
+        if include_total:
+            result['total'] = cached_count(('search', backend.name, q, severity, status), query)
+        return result
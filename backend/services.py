@@ -1,93 +1,475 @@
 """
 JSON 報告匯入匯出服務
 """
+import hashlib
 import json
+import multiprocessing
 import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from models import db, Report, Vulnerability, VulnInstance, FixStatus
+from flask import current_app, abort
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import NotFound
+import jsonstream
+from search import SearchService
+from pagination import keyset_page, cached_count, get_limit
+import cache
+import metrics
+from zipstream import ZipStream
+from models import db, ensure_schema, Report, Vulnerability, VulnInstance, FixStatus, SeverityLevel, ReportCounter, ImportJob, JobStatus
+
+
+class BulkImportWriter:
+    """
+    批次寫入器：以多列 INSERT 分段寫入漏洞類型與實例
+    
+    漏洞列先暫存，於下一次 flush 時一次寫入並回查 id；
+    實例列累積到 batch_size 筆時以 executemany 寫入。
+    不會自行 commit，由呼叫端決定交易範圍。
+    
+    實例加入時計算 fingerprint；同一漏洞內重複的實例 fingerprint 為 NULL，
+    dedupe 為 True（upsert 模式）時直接略過。site_url 尚未得知時
+    （串流匯入 SiteURL 出現在實例之後）於 finish 時整份報告重新計算。
+    """
+    
+    def __init__(self, report_id: int, batch_size: int = None, progress=None, site_url: str = None,
+                 dedupe: bool = False):
+        self.report_id = report_id
+        self.batch_size = max(1, batch_size or ReportService.get_batch_size())
+        self.progress = progress  # 每批實例寫入後呼叫 progress(已寫入實例數)
+        self.site_url = site_url
+        self.dedupe = dedupe
+        self.now = datetime.utcnow()
+        self.vuln_count = 0
+        self.instance_count = 0
+        self.duplicate_count = 0
+        self._pending_vulns = []  # [(handle, row)]
+        self._vuln_ids = {}       # handle -> vulnerabilities.id
+        self._last_vuln_id = 0
+        self._instances = []      # [(handle, row, fingerprint)]
+        self._severities = {}     # handle -> severity
+        self._titles = {}         # handle -> title
+        self._instance_counts = {}  # handle -> 實例數
+        self._seen = set()        # 目前漏洞已出現的 finding_key（實例依漏洞連續加入）
+        self._fingerprint_pending = False
+        self._started = time.perf_counter()
+    
+    def add_vulnerability(self, severity: str, title: str, description: str) -> int:
+        """加入一筆漏洞類型，回傳供 add_instance 使用的 handle"""
+        handle = len(self._vuln_ids) + len(self._pending_vulns)
+        self._severities[handle] = severity
+        self._titles[handle] = title
+        self._seen = set()
+        self._pending_vulns.append((handle, {
+            'report_id': self.report_id,
+            'severity': severity,
+            'title': title,
+            'description': description
+        }))
+        return handle
+    
+    def set_description(self, handle: int, description: str):
+        """設定漏洞描述（串流匯入時 Description 可能出現在 instances 之後）"""
+        for pending_handle, row in reversed(self._pending_vulns):
+            if pending_handle == handle:
+                row['description'] = description
+                return
+        
+        table = Vulnerability.__table__
+        db.session.execute(
+            table.update().where(table.c.id == self._vuln_ids[handle]).values(description=description)
+        )
+    
+    def add_instance(self, handle: int, row: dict):
+        """加入一筆實例（row 為 normalize_instance 的輸出）"""
+        key = ReportService.finding_key(row['url'], row['method'], row['parameter'])
+        if key in self._seen:
+            if self.dedupe:
+                self.duplicate_count += 1
+                return
+            fingerprint = None
+        else:
+            self._seen.add(key)
+            if self.site_url is None:
+                fingerprint = None
+                self._fingerprint_pending = True
+            else:
+                fingerprint = ReportService.fingerprint(self.site_url, self._titles[handle], key)
+        self._instances.append((handle, row, fingerprint))
+        if len(self._instances) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """寫入目前暫存的漏洞與實例"""
+        self._flush_vulnerabilities()
+        if not self._instances:
+            return
+        
+        rows = []
+        for handle, row, fingerprint in self._instances:
+            self._instance_counts[handle] = self._instance_counts.get(handle, 0) + 1
+            row = dict(row)
+            row['vulnerability_id'] = self._vuln_ids[handle]
+            row['fix_status'] = FixStatus.PENDING.value
+            row['fingerprint'] = fingerprint
+            row['first_seen_at'] = self.now
+            row['last_seen_at'] = self.now
+            row['created_at'] = self.now
+            row['updated_at'] = self.now
+            rows.append(row)
+        
+        db.session.execute(VulnInstance.__table__.insert(), rows)
+        self.instance_count += len(rows)
+        self._instances = []
+        if self.progress:
+            self.progress(self.instance_count)
+    
+    def _flush_vulnerabilities(self):
+        if not self._pending_vulns:
+            return
+        
+        table = Vulnerability.__table__
+        for i in range(0, len(self._pending_vulns), self.batch_size):
+            chunk = self._pending_vulns[i:i + self.batch_size]
+            db.session.execute(table.insert(), [row for _, row in chunk])
+        
+        # 同一報告的自動遞增 id 依插入順序遞增，依序回查即可對應 handle
+        ids = db.session.execute(
+            db.select(table.c.id)
+            .where(table.c.report_id == self.report_id, table.c.id > self._last_vuln_id)
+            .order_by(table.c.id)
+        ).scalars().all()
+        if len(ids) != len(self._pending_vulns):
+            raise RuntimeError(f'漏洞 id 回查數量不符: 預期 {len(self._pending_vulns)}，實際 {len(ids)}')
+        
+        for (handle, _), vuln_id in zip(self._pending_vulns, ids):
+            self._vuln_ids[handle] = vuln_id
+        self._last_vuln_id = ids[-1]
+        self.vuln_count += len(ids)
+        self._pending_vulns = []
+    
+    def finish(self) -> dict:
+        """寫入剩餘資料、更新統計計數並回傳寫入統計"""
+        self.flush()
+        if self._fingerprint_pending:
+            ReportService.assign_fingerprints(self.report_id)
+        
+        # 回填各漏洞實例數
+        table = Vulnerability.__table__
+        counts = [{'vid': self._vuln_ids[handle], 'cnt': count} for handle, count in self._instance_counts.items()]
+        for i in range(0, len(counts), self.batch_size):
+            db.session.execute(
+                table.update().where(table.c.id == db.bindparam('vid')).values(instance_count=db.bindparam('cnt')),
+                counts[i:i + self.batch_size]
+            )
+        
+        severity_counts = {}
+        for handle in self._vuln_ids:
+            severity = self._severities[handle]
+            severity_counts[severity] = severity_counts.get(severity, 0) + 1
+        CounterService.init_report(self.report_id, severity_counts, {FixStatus.PENDING.value: self.instance_count})
+        
+        elapsed = time.perf_counter() - self._started
+        rows = self.vuln_count + self.instance_count
+        return {
+            'vulnerabilities': self.vuln_count,
+            'instances': self.instance_count,
+            'duplicates': self.duplicate_count,
+            'rows': rows,
+            'elapsed': round(elapsed, 3),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None
+        }
 
 
 class ReportService:
     """報告匯入匯出服務"""
     
     SEVERITY_KEYS = {'High', 'Medium', 'Low', 'Informational'}
+    SEVERITY_ORDER = ('High', 'Medium', 'Low', 'Informational')
     CONTENT_FIELDS = {'方法', 'Parameter', '攻擊', 'Evidence', 'Other Info'}
+    REPORT_FIELDS = {'SiteURL', 'SummaryofSequences', 'SequenceDetails'}
+    FORMAT_ERROR = '報告格式錯誤: 最外層必須是物件'
+    DEFAULT_BATCH_SIZE = 1000
+    MODE_APPEND = 'append'  # 每次匯入建立新報告
+    MODE_UPSERT = 'upsert'  # 合併到同網站的既有報告
+    IMPORT_MODES = (MODE_APPEND, MODE_UPSERT)
+    
+    @staticmethod
+    def get_batch_size() -> int:
+        """取得批次寫入筆數（IMPORT_BATCH_SIZE）"""
+        try:
+            return int(current_app.config.get('IMPORT_BATCH_SIZE', ReportService.DEFAULT_BATCH_SIZE))
+        except RuntimeError:  # 不在 app context 中
+            return ReportService.DEFAULT_BATCH_SIZE
+    
+    @staticmethod
+    def get_import_mode(mode: str = None) -> str:
+        """驗證匯入模式（None 使用 IMPORT_MODE），無效時拋出 ValueError"""
+        if mode is None:
+            mode = current_app.config.get('IMPORT_MODE', ReportService.MODE_APPEND)
+        if mode not in ReportService.IMPORT_MODES:
+            raise ValueError(f'無效的匯入模式: {mode}')
+        return mode
+    
+    @staticmethod
+    def finding_key(url: str, method: str, parameter: str) -> tuple:
+        """同一漏洞內識別實例的欄位（去除前後空白，method 轉大寫）"""
+        return (url or '').strip(), (method or '').strip().upper(), (parameter or '').strip()
+    
+    @staticmethod
+    def fingerprint(site_url: str, title: str, key: tuple) -> str:
+        """計算實例 fingerprint：sha256(site_url, 漏洞標題, url, method, parameter)"""
+        parts = ((site_url or '').strip(), (title or '').strip()) + key
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
     
     @staticmethod
-    def import_json(json_data: dict, file_name: str = None) -> Report:
+    def normalize_instance(inst: dict) -> dict:
+        """將單一實例 JSON 轉換為 vuln_instances 欄位（不含 vulnerability_id）"""
+        content = inst.get('content', {})
+        extra_data = {}
+        
+        # 收集非標準欄位
+        for key, value in inst.items():
+            if key not in ('URL', 'content') and key not in ReportService.CONTENT_FIELDS:
+                extra_data[key] = value
+        
+        return {
+            'url': inst.get('URL', ''),
+            'method': content.get('方法', inst.get('方法', '')),
+            'parameter': content.get('Parameter', inst.get('Parameter', '')),
+            'attack': content.get('攻擊', inst.get('攻擊', '')),
+            'evidence': content.get('Evidence', inst.get('Evidence', '')),
+            'other_info': content.get('Other Info', inst.get('Other Info', '')),
+            'extra_data': extra_data if extra_data else None
+        }
+    
+    @staticmethod
+    def iter_vulnerabilities(json_data: dict):
+        """
+        依嚴重等級走訪報告中的漏洞類型
+        
+        Yields:
+            tuple: (severity, title, description, instances)
+        """
+        for severity in ReportService.SEVERITY_ORDER:
+            vuln_list = json_data.get(severity)
+            if not isinstance(vuln_list, list):
+                continue
+            
+            for vuln_obj in vuln_list:
+                # 每個 vuln_obj 是 {title: {Description: ..., instances: [...]}}
+                for title, vuln_data in vuln_obj.items():
+                    if not isinstance(vuln_data, dict):
+                        continue
+                    yield severity, title, vuln_data.get('Description', ''), vuln_data.get('instances', [])
+    
+    @staticmethod
+    def import_json(json_data: dict, file_name: str = None, batch_size: int = None, progress=None,
+                    mode: str = None) -> Report:
         """
         匯入 JSON 報告到資料庫
         
+        漏洞與實例先在記憶體中整理成資料列，再以多列 INSERT 分批寫入，
+        整份報告在同一個交易中提交。
+        
         Args:
             json_data: 解析後的 JSON 資料
             file_name: 原始檔名
+            batch_size: 每批寫入筆數（預設使用 IMPORT_BATCH_SIZE）
+            progress: 進度回呼，每批寫入後以已寫入實例數呼叫
+            mode: 'append' 或 'upsert'（預設使用 IMPORT_MODE，見 merge_report）
+            
+        Returns:
+            Report: 建立（或 upsert 時合併進去）的報告物件（import_stats 屬性為寫入統計）
+        """
+        vulnerabilities = (
+            (severity, title, description,
+             (ReportService.normalize_instance(inst) for inst in instances if isinstance(inst, dict)))
+            for severity, title, description, instances in ReportService.iter_vulnerabilities(json_data)
+        )
+        return ReportService.write_report(json_data, vulnerabilities, file_name, batch_size, progress, mode)
+    
+    @staticmethod
+    def write_report(header: dict, vulnerabilities, file_name: str = None, batch_size: int = None,
+                     progress=None, mode: str = None) -> Report:
+        """
+        將已正規化的報告資料寫入資料庫並提交
+        
+        Args:
+            header: 含 SiteURL / SummaryofSequences / SequenceDetails 的 dict
+            vulnerabilities: 可迭代的 (severity, title, description, instance_rows)
+            file_name: 原始檔名
+            batch_size: 每批寫入筆數
+            progress: 進度回呼
+            mode: 'append' 或 'upsert'
             
         Returns:
-            Report: 建立的報告物件
+            Report: 建立（或 upsert 時合併進去）的報告物件（import_stats 屬性為寫入統計）
         """
+        mode = ReportService.get_import_mode(mode)
         # 建立報告
         report = Report(
-            site_url=json_data.get('SiteURL', ''),
-            summary_sequences=json_data.get('SummaryofSequences', ''),
-            sequence_details=json_data.get('SequenceDetails', ''),
+            site_url=header.get('SiteURL', ''),
+            summary_sequences=header.get('SummaryofSequences', ''),
+            sequence_details=header.get('SequenceDetails', ''),
             file_name=file_name
         )
         db.session.add(report)
         db.session.flush()  # 取得 report.id
         
-        # 處理各嚴重等級的漏洞
-        for severity in ReportService.SEVERITY_KEYS:
-            if severity not in json_data:
-                continue
-                
-            vuln_list = json_data[severity]
-            if not isinstance(vuln_list, list):
-                continue
-                
-            for vuln_obj in vuln_list:
-                # 每個 vuln_obj 是 {title: {Description: ..., instances: [...]}}
-                for title, vuln_data in vuln_obj.items():
-                    if not isinstance(vuln_data, dict):
-                        continue
-                    
-                    # 建立漏洞類型
-                    vulnerability = Vulnerability(
-                        report_id=report.id,
-                        severity=severity,
-                        title=title,
-                        description=vuln_data.get('Description', '')
-                    )
-                    db.session.add(vulnerability)
-                    db.session.flush()
-                    
-                    # 處理漏洞實例
-                    instances = vuln_data.get('instances', [])
-                    for inst in instances:
-                        if not isinstance(inst, dict):
-                            continue
-                        
-                        content = inst.get('content', {})
-                        extra_data = {}
-                        
-                        # 收集非標準欄位
-                        for key, value in inst.items():
-                            if key not in ('URL', 'content', '方法', 'Parameter', '攻擊', 'Evidence', 'Other Info'):
-                                extra_data[key] = value
-                        
-                        instance = VulnInstance(
-                            vulnerability_id=vulnerability.id,
-                            url=inst.get('URL', ''),
-                            method=content.get('方法', inst.get('方法', '')),
-                            parameter=content.get('Parameter', inst.get('Parameter', '')),
-                            attack=content.get('攻擊', inst.get('攻擊', '')),
-                            evidence=content.get('Evidence', inst.get('Evidence', '')),
-                            other_info=content.get('Other Info', inst.get('Other Info', '')),
-                            extra_data=extra_data if extra_data else None
-                        )
-                        db.session.add(instance)
+        writer = BulkImportWriter(report.id, batch_size, progress, site_url=report.site_url,
+                                  dedupe=mode == ReportService.MODE_UPSERT)
+        for severity, title, description, rows in vulnerabilities:
+            handle = writer.add_vulnerability(severity, title, description)
+            for row in rows:
+                writer.add_instance(handle, row)
+        
+        return ReportService._finish_import(report, writer, mode)
+    
+    @staticmethod
+    def import_json_stream(fileobj, file_name: str = None, batch_size: int = None, progress=None,
+                           mode: str = None) -> Report:
+        """
+        以串流方式匯入 JSON 報告
+        
+        逐一解析各嚴重等級陣列與每個漏洞的 instances，實例每累積 batch_size 筆
+        就寫入一次，記憶體用量不隨報告大小成長。SiteURL 等報告欄位可出現在
+        檔案任何位置，解析完畢後才寫回報告列。
+        
+        Args:
+            fileobj: 檔案物件（bytes 或 str 皆可）
+            file_name: 原始檔名
+            batch_size: 每批寫入筆數（預設使用 IMPORT_BATCH_SIZE）
+            progress: 進度回呼，每批寫入後以已寫入實例數呼叫
+            mode: 'append' 或 'upsert'
+            
+        Returns:
+            Report: 建立（或 upsert 時合併進去）的報告物件（import_stats 屬性為寫入統計）
+        """
+        mode = ReportService.get_import_mode(mode)
+        report = Report(site_url='', summary_sequences='', sequence_details='', file_name=file_name)
+        db.session.add(report)
+        db.session.flush()  # 取得 report.id
+        
+        writer = BulkImportWriter(report.id, batch_size, progress, dedupe=mode == ReportService.MODE_UPSERT)
+        events = iter(jsonstream.basic_parse(fileobj))
+        if ReportService._next_event(events)[0] != 'start_map':
+            raise ValueError(ReportService.FORMAT_ERROR)
+        
+        header = {}
+        for event, key in events:
+            if event == 'end_map':
+                break
+            if key in ReportService.REPORT_FIELDS:
+                header[key] = jsonstream.build_value(events)
+                if key == 'SiteURL':
+                    writer.site_url = header[key]
+            elif key in ReportService.SEVERITY_KEYS:
+                ReportService._stream_severity(events, key, writer)
+            else:
+                jsonstream.skip_value(events)
+        
+        report.site_url = header.get('SiteURL', '')
+        report.summary_sequences = header.get('SummaryofSequences', '')
+        report.sequence_details = header.get('SequenceDetails', '')
+        db.session.flush()  # 實例 fingerprint 需重新計算時由報告列讀取 site_url
+        return ReportService._finish_import(report, writer, mode)
+    
+    @staticmethod
+    def _finish_import(report: Report, writer: BulkImportWriter, mode: str) -> Report:
+        """寫入剩餘資料；upsert 時合併到同網站最新的既有報告，建立搜尋索引並提交"""
+        stats = writer.finish()
+        stats['mode'] = mode
+        metrics.inc('import_reports_total', mode=mode)
+        metrics.inc('import_rows_total', stats['rows'])
+        metrics.inc('import_seconds_total', stats['elapsed'])
+        target_id = None
+        if mode == ReportService.MODE_UPSERT:
+            # 鎖定目標報告，同網站的 upsert 依序合併
+            target_id = db.session.execute(
+                db.select(Report.id)
+                .where(Report.site_url == report.site_url, Report.id != report.id)
+                .order_by(Report.id.desc()).limit(1)
+                .with_for_update()
+            ).scalar()
+        
+        if target_id is None:
+            SearchService.index_report(report.id)
+            db.session.commit()
+            cache.invalidate('dashboard', 'tree')
+            report.import_stats = stats
+            return report
         
+        source_id = report.id
+        db.session.expunge(report)
+        stats.update(ReportService.merge_report(target_id, source_id, writer.now))
+        SearchService.delete_report(target_id)
+        SearchService.index_report(target_id)
         db.session.commit()
-        return report
+        cache.invalidate_reports([target_id])
+        
+        target = db.session.get(Report, target_id)
+        target.import_stats = stats
+        return target
+    
+    @staticmethod
+    def _next_event(events) -> tuple:
+        """取出下一個解析事件（檔案為空或提前結束時拋出 ValueError，而非 StopIteration）"""
+        event = next(events, (None,))
+        if event[0] is None:
+            raise ValueError(ReportService.FORMAT_ERROR)
+        return event
+    
+    @staticmethod
+    def _stream_severity(events, severity: str, writer: BulkImportWriter):
+        """串流處理單一嚴重等級陣列: [{title: {Description, instances}}, ...]"""
+        first = ReportService._next_event(events)
+        if first[0] != 'start_array':
+            jsonstream.skip_value(events, first)
+            return
+        
+        for item in events:
+            if item[0] == 'end_array':
+                return
+            if item[0] != 'start_map':
+                jsonstream.skip_value(events, item)
+                continue
+            for event, title in events:
+                if event == 'end_map':
+                    break
+                ReportService._stream_vulnerability(events, severity, title, writer)
+    
+    @staticmethod
+    def _stream_vulnerability(events, severity: str, title: str, writer: BulkImportWriter):
+        """串流處理單一漏洞類型，實例逐筆交給 writer"""
+        first = ReportService._next_event(events)
+        if first[0] != 'start_map':
+            jsonstream.skip_value(events, first)
+            return
+        
+        handle = writer.add_vulnerability(severity, title, '')
+        for event, key in events:
+            if event == 'end_map':
+                return
+            if key == 'Description':
+                writer.set_description(handle, jsonstream.build_value(events))
+            elif key == 'instances':
+                first = ReportService._next_event(events)
+                if first[0] != 'start_array':
+                    jsonstream.skip_value(events, first)
+                    continue
+                for item in events:
+                    if item[0] == 'end_array':
+                        break
+                    inst = jsonstream.build_value(events, item)
+                    if isinstance(inst, dict):
+                        writer.add_instance(handle, ReportService.normalize_instance(inst))
+            else:
+                jsonstream.skip_value(events)
     
     @staticmethod
     def import_json_file(file_path: str) -> Report:
@@ -103,6 +485,321 @@ class ReportService:
         json_data = json.loads(json_string)
         return ReportService.import_json(json_data, file_name)
     
+    @staticmethod
+    def merge_report(target_id: int, source_id: int, seen_at: datetime) -> dict:
+        """
+        將剛匯入的報告合併到同網站的既有報告（upsert 匯入，不提交）
+        
+        以集合式 SQL 執行，查詢數只與漏洞種類數有關：
+        1. fingerprint 已存在的實例：更新最後出現時間與掃描內容，保留修復狀態
+        2. 刪除來源中已合併的實例
+        3. 其餘實例移到目標報告同名（同嚴重等級）的漏洞下，沒有對應漏洞的
+           漏洞列整列移過去
+        4. 以來源的報告欄位更新目標報告，刪除來源報告並重算目標的統計計數
+        
+        Args:
+            target_id: 既有報告 ID
+            source_id: 剛寫入的報告 ID（合併後刪除）
+            seen_at: 本次匯入時間
+            
+        Returns:
+            dict: {'merged_into': 目標報告 ID, 'updated': 已存在的實例數, 'added': 新增的實例數}
+        """
+        reports = Report.__table__
+        vulns = Vulnerability.__table__
+        instances = VulnInstance.__table__
+        old_vulns = vulns.alias('old_vulns')
+        new_vulns = vulns.alias('new_vulns')
+        old_instances = instances.alias('old_instances')
+        new_instances = instances.alias('new_instances')
+        
+        # 1. 已存在的發現（同嚴重等級且 fingerprint 相同）
+        updated = db.session.execute(
+            instances.update()
+            .where(instances.c.vulnerability_id == old_vulns.c.id,
+                   old_vulns.c.report_id == target_id,
+                   new_instances.c.vulnerability_id == new_vulns.c.id,
+                   new_vulns.c.report_id == source_id,
+                   new_vulns.c.severity == old_vulns.c.severity,
+                   new_instances.c.fingerprint == instances.c.fingerprint)
+            .values(last_seen_at=seen_at,
+                    attack=new_instances.c.attack,
+                    evidence=new_instances.c.evidence,
+                    other_info=new_instances.c.other_info,
+                    extra_data=new_instances.c.extra_data)
+        ).rowcount
+        
+        # 2. 來源中已合併的實例先標記再刪除（MariaDB 不允許 DELETE 的子查詢引用同一個表）
+        db.session.execute(
+            instances.update()
+            .where(instances.c.vulnerability_id == new_vulns.c.id,
+                   new_vulns.c.report_id == source_id,
+                   old_instances.c.vulnerability_id == old_vulns.c.id,
+                   old_vulns.c.report_id == target_id,
+                   old_vulns.c.severity == new_vulns.c.severity,
+                   old_instances.c.fingerprint == instances.c.fingerprint)
+            .values(fingerprint=None)
+        )
+        source_vuln_ids = db.select(vulns.c.id).where(vulns.c.report_id == source_id)
+        db.session.execute(
+            instances.delete()
+            .where(instances.c.vulnerability_id.in_(source_vuln_ids), instances.c.fingerprint.is_(None))
+        )
+        
+        # 3. 對應漏洞（同一標題有多筆時取最早的一筆）
+        existing = {}
+        for vuln in db.session.execute(
+            db.select(vulns.c.id, vulns.c.severity, vulns.c.title)
+            .where(vulns.c.report_id == target_id).order_by(vulns.c.id)
+        ):
+            existing.setdefault((vuln.severity, vuln.title), vuln.id)
+        pairs = []
+        for vuln in db.session.execute(
+            db.select(vulns.c.id, vulns.c.severity, vulns.c.title).where(vulns.c.report_id == source_id)
+        ):
+            target_vuln_id = existing.get((vuln.severity, vuln.title))
+            if target_vuln_id is not None:
+                pairs.append({'src': vuln.id, 'dst': target_vuln_id})
+        
+        added = db.session.execute(
+            db.select(db.func.count()).select_from(instances)
+            .where(instances.c.vulnerability_id.in_(source_vuln_ids))
+        ).scalar()
+        if pairs:
+            db.session.execute(
+                instances.update()
+                .where(instances.c.vulnerability_id == db.bindparam('src'))
+                .values(vulnerability_id=db.bindparam('dst')),
+                pairs
+            )
+            db.session.execute(vulns.delete().where(vulns.c.id.in_([pair['src'] for pair in pairs])))
+        db.session.execute(vulns.update().where(vulns.c.report_id == source_id).values(report_id=target_id))
+        
+        # 4. 報告欄位與統計計數
+        source = db.session.execute(
+            db.select(reports.c.summary_sequences, reports.c.sequence_details, reports.c.file_name)
+            .where(reports.c.id == source_id)
+        ).first()
+        db.session.execute(
+            reports.update().where(reports.c.id == target_id)
+            .values(summary_sequences=source.summary_sequences, sequence_details=source.sequence_details,
+                    file_name=source.file_name, imported_at=seen_at)
+        )
+        CounterService.delete_report(source_id)
+        db.session.execute(reports.delete().where(reports.c.id == source_id))
+        CounterService.rebuild(target_id, commit=False)
+        
+        return {'merged_into': target_id, 'updated': updated, 'added': added}
+    
+    @staticmethod
+    def assign_fingerprints(report_id: int = None, batch_size: int = None) -> int:
+        """
+        由實例內容重新計算 fingerprint（舊資料升級，或串流匯入時 SiteURL 出現在實例之後）
+        
+        依 (vulnerability_id, id) 以 keyset 分批讀取，同一漏洞內重複的實例維持 NULL。
+        全部重算時每批提交一次；只重算單一報告時不提交（與匯入在同一交易）。
+        
+        Returns:
+            int: 設定 fingerprint 的實例數
+        """
+        reports = Report.__table__
+        vulns = Vulnerability.__table__
+        instances = VulnInstance.__table__
+        batch_size = batch_size or ReportService.get_batch_size()
+        
+        query = db.select(
+            instances.c.id, instances.c.vulnerability_id, instances.c.url, instances.c.method,
+            instances.c.parameter, vulns.c.title, reports.c.site_url
+        ).select_from(
+            instances.join(vulns, instances.c.vulnerability_id == vulns.c.id)
+            .join(reports, vulns.c.report_id == reports.c.id)
+        ).order_by(instances.c.vulnerability_id, instances.c.id).limit(batch_size)
+        if report_id is not None:
+            query = query.where(vulns.c.report_id == report_id)
+            db.session.execute(
+                instances.update()
+                .where(instances.c.vulnerability_id.in_(db.select(vulns.c.id).where(vulns.c.report_id == report_id)))
+                .values(fingerprint=None)
+            )
+        
+        update = instances.update().where(instances.c.id == db.bindparam('iid')) \
+            .values(fingerprint=db.bindparam('fp'), updated_at=instances.c.updated_at)
+        count = 0
+        current, seen = None, set()
+        last = None
+        while True:
+            page = query
+            if last is not None:
+                page = page.where(db.or_(
+                    instances.c.vulnerability_id > last[0],
+                    db.and_(instances.c.vulnerability_id == last[0], instances.c.id > last[1])
+                ))
+            rows = db.session.execute(page).all()
+            if not rows:
+                break
+            
+            params = []
+            for row in rows:
+                if row.vulnerability_id != current:
+                    current, seen = row.vulnerability_id, set()
+                key = ReportService.finding_key(row.url, row.method, row.parameter)
+                if key in seen:
+                    continue
+                seen.add(key)
+                params.append({'iid': row.id, 'fp': ReportService.fingerprint(row.site_url, row.title, key)})
+            if params:
+                db.session.execute(update, params)
+                count += len(params)
+            if report_id is None:
+                db.session.commit()
+            last = (rows[-1].vulnerability_id, rows[-1].id)
+        return count
+    
+    @staticmethod
+    def get_severity_counts() -> dict:
+        """取得各嚴重等級的漏洞類型數（由 report_counters 彙總）"""
+        return CounterService.get_totals(CounterService.SEVERITY)
+    
+    @staticmethod
+    def get_report_stats(report_ids: list) -> dict:
+        """
+        批次取得多個報告的各嚴重等級漏洞數
+        
+        Args:
+            report_ids: 報告 ID 列表（例如列表的一頁）
+            
+        Returns:
+            dict: {report_id: {severity: count}}，漏洞總數為各值加總
+        """
+        stats = {report_id: {s.value: 0 for s in SeverityLevel} for report_id in report_ids}
+        counters = CounterService.get_report_counts(report_ids, CounterService.SEVERITY)
+        for report_id, buckets in counters.items():
+            for severity, count in buckets.items():
+                if severity in stats[report_id]:
+                    stats[report_id][severity] = count
+        return stats
+    
+    @staticmethod
+    def _report_header(report_id: int) -> dict:
+        """以單次 tuple 查詢取得報告基本欄位，不存在時回傳 404"""
+        report = db.session.execute(
+            db.select(Report.id, Report.site_url, Report.summary_sequences, Report.sequence_details,
+                      Report.file_name, Report.imported_at, Report.notes)
+            .where(Report.id == report_id)
+        ).first()
+        if report is None:
+            abort(404)
+        return {
+            'id': report.id,
+            'site_url': report.site_url,
+            'summary_sequences': report.summary_sequences,
+            'sequence_details': report.sequence_details,
+            'file_name': report.file_name,
+            'imported_at': report.imported_at.isoformat(),
+            'notes': report.notes
+        }
+    
+    @staticmethod
+    def get_report_summary(report_id: int) -> dict:
+        """
+        取得報告摘要（報告欄位 + 漏洞清單與實例數，不含實例內容）
+        
+        實例數取自 vulnerabilities.instance_count，共兩次查詢，
+        payload 大小只與漏洞種類數有關。
+        """
+        data = ReportService._report_header(report_id)
+        stats = {s.value: 0 for s in SeverityLevel}
+        instance_total = 0
+        vulnerabilities = []
+        for vuln in db.session.execute(
+            db.select(Vulnerability.id, Vulnerability.severity, Vulnerability.title,
+                      Vulnerability.description, Vulnerability.instance_count)
+            .where(Vulnerability.report_id == report_id)
+            .order_by(Vulnerability.id)
+        ):
+            if vuln.severity in stats:
+                stats[vuln.severity] += 1
+            instance_total += vuln.instance_count or 0
+            vulnerabilities.append({
+                'id': vuln.id,
+                'severity': vuln.severity,
+                'title': vuln.title,
+                'description': vuln.description,
+                'instance_count': vuln.instance_count or 0
+            })
+        data['stats'] = stats
+        data['instance_count'] = instance_total
+        data['vulnerabilities'] = vulnerabilities
+        return data
+    
+    @staticmethod
+    def get_report_detail(report_id: int) -> dict:
+        """
+        取得報告詳情（報告、漏洞、實例共三次查詢）
+        
+        直接由查詢結果的 tuple 組成 JSON，統計數在同一次走訪中計算，
+        不建立 ORM 物件。
+        """
+        data = ReportService._report_header(report_id)
+        
+        stats = {s.value: 0 for s in SeverityLevel}
+        vulnerabilities = []
+        by_id = {}
+        for vuln in db.session.execute(
+            db.select(Vulnerability.id, Vulnerability.severity, Vulnerability.title, Vulnerability.description)
+            .where(Vulnerability.report_id == report_id)
+            .order_by(Vulnerability.id)
+        ):
+            if vuln.severity in stats:
+                stats[vuln.severity] += 1
+            vuln_data = by_id[vuln.id] = {
+                'id': vuln.id,
+                'severity': vuln.severity,
+                'title': vuln.title,
+                'description': vuln.description,
+                'instance_count': 0,
+                'instances': []
+            }
+            vulnerabilities.append(vuln_data)
+        
+        columns = InstanceService.columns(InstanceService.ALL_FIELDS)
+        instances = db.session.execute(
+            db.select(VulnInstance.vulnerability_id, *columns)
+            .join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id)
+            .where(Vulnerability.report_id == report_id)
+            .order_by(VulnInstance.vulnerability_id, VulnInstance.id)
+            .execution_options(yield_per=ReportService.get_batch_size())
+        )
+        for inst in instances:
+            vuln_data = by_id[inst.vulnerability_id]
+            vuln_data['instances'].append(InstanceService.to_dict(inst, InstanceService.ALL_FIELDS))
+            vuln_data['instance_count'] += 1
+        
+        data['stats'] = stats
+        data['vulnerabilities'] = vulnerabilities
+        return data
+    
+    @staticmethod
+    def delete_report(report_id: int) -> str:
+        """
+        刪除報告及其漏洞、實例、統計計數與搜尋文件（同一交易，以集合式 DELETE 執行）
+        
+        Returns:
+            str: 被刪除報告的 site_url
+        """
+        report = Report.query.get_or_404(report_id)
+        site_url = report.site_url
+        
+        SearchService.delete_report(report_id)
+        vuln_ids = db.select(Vulnerability.id).where(Vulnerability.report_id == report_id)
+        db.session.execute(db.delete(VulnInstance).where(VulnInstance.vulnerability_id.in_(vuln_ids)))
+        db.session.execute(db.delete(Vulnerability).where(Vulnerability.report_id == report_id))
+        CounterService.delete_report(report_id)
+        db.session.execute(db.delete(Report).where(Report.id == report_id))
+        db.session.commit()
+        cache.invalidate_reports([report_id])
+        return site_url
+    
     @staticmethod
     def export_report(report_id: int, include_status: bool = True) -> dict:
         """
@@ -127,89 +824,863 @@ class ReportService:
         if report.notes:
             output['report_notes'] = report.notes
         
-        # 組織漏洞資料
-        for vuln in report.vulnerabilities:
-            severity = vuln.severity
-            if severity not in output:
-                output[severity] = []
-            
+        # 組織漏洞資料（全部實例以一個查詢依漏洞順序讀出，不逐一查詢各漏洞）
+        vulnerabilities = {}
+        for vuln in report.vulnerabilities.order_by(Vulnerability.id):
             vuln_data = {
                 'Description': vuln.description,
                 'instances': []
             }
+            vulnerabilities[vuln.id] = vuln_data['instances']
+            output.setdefault(vuln.severity, []).append({vuln.title: vuln_data})
+        
+        instances = VulnInstance.query.join(Vulnerability).filter(
+            Vulnerability.report_id == report_id
+        ).order_by(VulnInstance.vulnerability_id, VulnInstance.id)
+        for inst in instances:
+            vulnerabilities[inst.vulnerability_id].append(ReportService._export_instance(inst, include_status))
+        
+        return output
+    
+    @staticmethod
+    def _export_instance(inst, include_status: bool) -> dict:
+        """實例 → 匯出格式（inst 可為 ORM 物件或同名欄位的查詢列）"""
+        inst_data = {
+            'URL': inst.url,
+            'content': {}
+        }
+        
+        if inst.method:
+            inst_data['content']['方法'] = inst.method
+        if inst.parameter:
+            inst_data['content']['Parameter'] = inst.parameter
+        if inst.attack:
+            inst_data['content']['攻擊'] = inst.attack
+        if inst.evidence:
+            inst_data['content']['Evidence'] = inst.evidence
+        if inst.other_info:
+            inst_data['content']['Other Info'] = inst.other_info
+        
+        if inst.extra_data:
+            inst_data.update(inst.extra_data)
+        
+        # 加入修復狀態
+        if include_status:
+            inst_data['_fix_status'] = {
+                'status': inst.fix_status,
+                'fixed_at': inst.fixed_at.isoformat() if inst.fixed_at else None,
+                'fixed_by': inst.fixed_by,
+                'notes': inst.fix_notes
+            }
+        return inst_data
+    
+    @staticmethod
+    def stream_export(report_id: int, include_status: bool = True, filepath: str = None):
+        """
+        以串流方式匯出報告 JSON
+        
+        輸出與 json.dump(export_report(...), indent=2, ensure_ascii=False) 逐位元組相同。
+        報告與漏洞標頭先行讀取（不存在時回傳 404），實例以伺服器端游標
+        依「嚴重等級首次出現順序、漏洞 id、實例 id」逐批讀取，記憶體只保留一批。
+        
+        Args:
+            report_id: 報告 ID
+            include_status: 是否包含修復狀態資訊
+            filepath: 同時寫入的檔案路徑（完成後才出現，None 表示不寫入）
             
-            for inst in vuln.instances:
-                inst_data = {
-                    'URL': inst.url,
-                    'content': {}
-                }
-                
-                if inst.method:
-                    inst_data['content']['方法'] = inst.method
-                if inst.parameter:
-                    inst_data['content']['Parameter'] = inst.parameter
-                if inst.attack:
-                    inst_data['content']['攻擊'] = inst.attack
-                if inst.evidence:
-                    inst_data['content']['Evidence'] = inst.evidence
-                if inst.other_info:
-                    inst_data['content']['Other Info'] = inst.other_info
-                
-                if inst.extra_data:
-                    inst_data.update(inst.extra_data)
-                
-                # 加入修復狀態
-                if include_status:
-                    inst_data['_fix_status'] = {
-                        'status': inst.fix_status,
-                        'fixed_at': inst.fixed_at.isoformat() if inst.fixed_at else None,
-                        'fixed_by': inst.fixed_by,
-                        'notes': inst.fix_notes
-                    }
-                
-                vuln_data['instances'].append(inst_data)
+        Returns:
+            generator: 依序產生 JSON 文字區塊
+        """
+        report = db.session.execute(
+            db.select(Report.site_url, Report.summary_sequences, Report.sequence_details, Report.notes)
+            .where(Report.id == report_id)
+        ).first()
+        if report is None:
+            abort(404)
+        
+        header = {
+            'SiteURL': report.site_url,
+            'SummaryofSequences': report.summary_sequences,
+            'SequenceDetails': report.sequence_details,
+            'exported_at': datetime.utcnow().isoformat(),
+        }
+        if report.notes:
+            header['report_notes'] = report.notes
+        
+        groups = {}  # 嚴重等級 → [漏洞列]，保留首次出現順序
+        for vuln in db.session.execute(
+            db.select(Vulnerability.id, Vulnerability.severity, Vulnerability.title, Vulnerability.description)
+            .where(Vulnerability.report_id == report_id)
+            .order_by(Vulnerability.id)
+        ):
+            groups.setdefault(vuln.severity, []).append(vuln)
+        
+        pieces = ReportService._export_pieces(report_id, header, groups, include_status)
+        return ReportService._export_chunks(pieces, current_app.config.get('EXPORT_CHUNK_SIZE', 64 * 1024), filepath)
+    
+    @staticmethod
+    def _export_pieces(report_id: int, header: dict, groups: dict, include_status: bool):
+        """依 json.dump(indent=2) 的排版逐段產生 JSON 文字"""
+        def dumps(value, level):
+            # 字串內的換行皆已跳脫，直接替換換行即可得到巢狀縮排
+            return json.dumps(value, ensure_ascii=False, indent=2).replace('\n', '\n' + '  ' * level)
+        
+        yield '{'
+        for i, (key, value) in enumerate(header.items()):
+            yield f"{',' if i else ''}\n  {dumps(key, 1)}: {dumps(value, 1)}"
+        if not groups:
+            yield '\n}'
+            return
+        
+        rank = db.case({severity: i for i, severity in enumerate(groups)}, value=Vulnerability.severity)
+        result = db.session.execute(
+            db.select(VulnInstance.vulnerability_id, VulnInstance.url, VulnInstance.method,
+                      VulnInstance.parameter, VulnInstance.attack, VulnInstance.evidence,
+                      VulnInstance.other_info, VulnInstance.extra_data, VulnInstance.fix_status,
+                      VulnInstance.fixed_at, VulnInstance.fixed_by, VulnInstance.fix_notes)
+            .join(Vulnerability, Vulnerability.id == VulnInstance.vulnerability_id)
+            .where(Vulnerability.report_id == report_id)
+            .order_by(rank, VulnInstance.vulnerability_id, VulnInstance.id)
+            .execution_options(yield_per=current_app.config.get('EXPORT_BATCH_SIZE', 1000))
+        )
+        try:
+            rows = iter(result)
+            row = next(rows, None)
+            for severity, vulns in groups.items():
+                yield f",\n  {dumps(severity, 1)}: ["
+                for i, vuln in enumerate(vulns):
+                    yield f"{',' if i else ''}\n    {{\n      {dumps(vuln.title, 3)}: {{" \
+                          f"\n        \"Description\": {dumps(vuln.description, 4)},\n        \"instances\": ["
+                    count = 0
+                    while row is not None and row.vulnerability_id == vuln.id:
+                        inst_data = ReportService._export_instance(row, include_status)
+                        yield f"{',' if count else ''}\n          {dumps(inst_data, 5)}"
+                        count += 1
+                        row = next(rows, None)
+                    yield ('\n        ]' if count else ']') + '\n      }\n    }'
+                yield '\n  ]'
+            yield '\n}'
+        finally:
+            result.close()
+    
+    @staticmethod
+    def _export_chunks(pieces, chunk_size: int, filepath: str = None):
+        """將片段合併為約 chunk_size 字元的區塊，並可同時寫入檔案"""
+        tmp_path = f'{filepath}.part' if filepath else None
+        f = open(tmp_path, 'w', encoding='utf-8') if filepath else None
+        try:
+            buffer, size = [], 0
+            for piece in pieces:
+                buffer.append(piece)
+                size += len(piece)
+                if size >= chunk_size:
+                    chunk = ''.join(buffer)
+                    buffer, size = [], 0
+                    if f:
+                        f.write(chunk)
+                    yield chunk
+            chunk = ''.join(buffer)
+            if f:
+                f.write(chunk)
+                f.close()
+                f = None
+                os.replace(tmp_path, filepath)
+            yield chunk
+        finally:
+            # 中途中斷（例如用戶端斷線）時不留下不完整的檔案
+            if f:
+                f.close()
+                os.remove(tmp_path)
+    
+    @staticmethod
+    def export_filename(report_id: int, site_url: str) -> str:
+        """ZIP 內的報告檔名（使用 site_url 或 id）"""
+        safe_name = (site_url or f'report_{report_id}').replace('://', '_').replace('/', '_')[:50]
+        return f"{safe_name}_{report_id}.json"
+    
+    @staticmethod
+    def iter_export_reports(batch_size: int = 500):
+        """依 id 以 keyset 分批讀取報告 (id, site_url)"""
+        last_id = 0
+        while True:
+            batch = db.session.execute(
+                db.select(Report.id, Report.site_url)
+                .where(Report.id > last_id)
+                .order_by(Report.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1].id
+    
+    @staticmethod
+    def _export_text(app, report_id: int):
+        """在獨立的 app context 中產生整份報告 JSON（報告已刪除時回傳 None）"""
+        with app.app_context():
+            try:
+                return ''.join(ReportService.stream_export(report_id, include_status=True))
+            except NotFound:
+                return None
+    
+    @staticmethod
+    def _iter_export_contents(workers: int):
+        """依 id 順序產生 (報告, JSON 區塊)，報告已刪除時區塊為 None"""
+        if workers == 1:
+            for report in ReportService.iter_export_reports():
+                try:
+                    yield report, ReportService.stream_export(report.id, include_status=True)
+                except NotFound:
+                    yield report, None
+            return
+        
+        app = current_app._get_current_object()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        pending = deque()  # [(報告, future)]，依 id 順序
+        try:
+            for report in ReportService.iter_export_reports():
+                pending.append((report, executor.submit(ReportService._export_text, app, report.id)))
+                # 視窗已滿時等待最舊的一份，其餘已完成的也先送出
+                while pending and (len(pending) >= workers * 2 or pending[0][1].done()):
+                    done, future = pending.popleft()
+                    text = future.result()
+                    yield done, None if text is None else [text]
+            while pending:
+                done, future = pending.popleft()
+                text = future.result()
+                yield done, None if text is None else [text]
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    @staticmethod
+    def stream_export_zip(workers: int = None):
+        """
+        串流匯出全部報告為 JSON ZIP
+        
+        報告依 id 分批讀取，每份報告由 stream_export 產生並即時壓縮送出。
+        workers > 1 時由執行緒池平行產生各報告 JSON，同時進行中的報告
+        最多 workers * 2 份，仍依 id 順序寫入 ZIP。
+        
+        Args:
+            workers: 平行產生 JSON 的執行緒數（預設 EXPORT_WORKERS）
             
-            output[severity].append({vuln.title: vuln_data})
+        Yields:
+            bytes: ZIP 資料區塊
+        """
+        workers = max(1, workers or current_app.config.get('EXPORT_WORKERS', 1))
+        zs = ZipStream()
+        count = 0
+        for report, chunks in ReportService._iter_export_contents(workers):
+            if chunks is None:
+                continue
+            yield from zs.write_entry(ReportService.export_filename(report.id, report.site_url), chunks)
+            count += 1
         
-        return output
+        yield zs.close()
+        LogService.log('EXPORT', f'匯出全部 JSON: {count} 個報告')
     
     @staticmethod
-    def bulk_import_directory(directory: str) -> list:
+    def bulk_import_directory(directory: str) -> dict:
         """批次匯入目錄下所有 JSON 檔案"""
-        imported = []
-        errors = []
+        files = [
+            (os.path.join(directory, filename), filename)
+            for filename in sorted(os.listdir(directory))
+            if filename.endswith('.json')
+        ]
+        return ReportService.parallel_import_files(files)
+    
+    @staticmethod
+    def parallel_import_files(files: list, workers: int = None, batch_size: int = None, progress=None,
+                              mode: str = None) -> dict:
+        """
+        平行批次匯入多個報告檔
         
-        for filename in os.listdir(directory):
-            if not filename.endswith('.json'):
-                continue
+        JSON 解析與實例正規化在 ProcessPoolExecutor 中進行，寫入階段在目前
+        執行緒依檔案順序逐一提交；每個檔案各自成功或失敗，互不影響。
+        同時進行中的檔案數限制為 workers 的兩倍，避免解析結果堆積在記憶體。
+        workers 為 1 時不建立行程池，直接以串流方式逐檔匯入。
+        
+        Args:
+            files: [(file_path, file_name), ...]
+            workers: 行程數（預設使用 IMPORT_WORKERS）
+            batch_size: 每批寫入筆數
+            progress: 每個檔案處理完後以該檔結果 dict 呼叫
+            mode: 'append' 或 'upsert'（同網站的檔案依序合併）
             
-            file_path = os.path.join(directory, filename)
-            try:
-                report = ReportService.import_json_file(file_path)
-                imported.append({
-                    'file': filename,
-                    'report_id': report.id,
-                    'site_url': report.site_url
-                })
-            except Exception as e:
-                errors.append({
-                    'file': filename,
-                    'error': str(e)
-                })
-        
-        return {'imported': imported, 'errors': errors}
+        Returns:
+            dict: {'imported': [...], 'errors': [...]}，每筆含 timing 計時資訊
+        """
+        mode = ReportService.get_import_mode(mode)
+        if workers is None:
+            workers = current_app.config.get('IMPORT_WORKERS', 1)
+        workers = max(1, min(workers, len(files) or 1))
+        results = {'imported': [], 'errors': []}
+        
+        def record_success(file_name, report, timing):
+            timing['write'] = report.import_stats['elapsed']
+            entry = {
+                'file': file_name,
+                'report_id': report.id,
+                'site_url': report.site_url,
+                'stats': report.import_stats,
+                'timing': timing
+            }
+            results['imported'].append(entry)
+            if progress:
+                progress(entry)
+        
+        def record_error(file_name, error, timing):
+            db.session.rollback()
+            entry = {
+                'file': file_name,
+                'error': str(error),
+                'timing': timing
+            }
+            results['errors'].append(entry)
+            if progress:
+                progress(entry)
+        
+        if workers == 1:
+            for file_path, file_name in files:
+                started = time.perf_counter()
+                try:
+                    with open(file_path, 'rb') as f:
+                        report = ReportService.import_json_stream(f, file_name, batch_size, mode=mode)
+                    record_success(file_name, report, {'total': round(time.perf_counter() - started, 3)})
+                except Exception as e:
+                    record_error(file_name, e, {'total': round(time.perf_counter() - started, 3)})
+            return results
+        
+        context = multiprocessing.get_context('spawn')  # 避免 fork 帶走資料庫連線與執行緒狀態
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            queue = deque()
+            pending = iter(files)
+            
+            def submit_next():
+                item = next(pending, None)
+                if item is not None:
+                    file_path, file_name = item
+                    queue.append((file_name, time.perf_counter(),
+                                  executor.submit(prepare_import_file, file_path)))
+            
+            for _ in range(workers * 2):
+                submit_next()
+            
+            while queue:
+                file_name, submitted, future = queue.popleft()
+                try:
+                    prepared = future.result()
+                except Exception as e:
+                    submit_next()
+                    record_error(file_name, e, {'total': round(time.perf_counter() - submitted, 3)})
+                    continue
+                
+                submit_next()
+                timing = {'parse': prepared['parse_time']}
+                try:
+                    report = ReportService.write_report(
+                        prepared['header'], prepared['vulnerabilities'], file_name, batch_size, mode=mode
+                    )
+                    timing['total'] = round(time.perf_counter() - submitted, 3)
+                    record_success(file_name, report, timing)
+                except Exception as e:
+                    timing['total'] = round(time.perf_counter() - submitted, 3)
+                    record_error(file_name, e, timing)
+        
+        return results
+
+
+def prepare_import_file(file_path: str) -> dict:
+    """
+    解析並正規化單一報告檔（於子行程中執行，不存取資料庫）
+    
+    Returns:
+        dict: header 報告欄位、vulnerabilities 正規化後的漏洞與實例列、parse_time 秒數
+    """
+    started = time.perf_counter()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+    
+    vulnerabilities = [
+        (severity, title, description,
+         [ReportService.normalize_instance(inst) for inst in instances if isinstance(inst, dict)])
+        for severity, title, description, instances in ReportService.iter_vulnerabilities(json_data)
+    ]
+    return {
+        'header': {key: json_data.get(key, '') for key in ReportService.REPORT_FIELDS},
+        'vulnerabilities': vulnerabilities,
+        'parse_time': round(time.perf_counter() - started, 3)
+    }
+
+
+class InstanceService:
+    """漏洞實例查詢服務（分頁、欄位投影）"""
+    
+    # 列表預設欄位；大型文字欄位需以 fields 參數指定才會回傳
+    DEFAULT_FIELDS = ('id', 'url', 'method', 'parameter', 'fix_status', 'fixed_at', 'fixed_by')
+    LARGE_FIELDS = ('attack', 'evidence', 'other_info', 'extra_data', 'fix_notes')
+    ALL_FIELDS = ('id', 'url', 'method', 'parameter', 'attack', 'evidence', 'other_info',
+                  'extra_data', 'fix_status', 'fixed_at', 'fixed_by', 'fix_notes', 'first_seen_at', 'last_seen_at')
+    DATETIME_FIELDS = ('fixed_at', 'first_seen_at', 'last_seen_at')
+    
+    @staticmethod
+    def parse_fields(fields) -> tuple:
+        """
+        解析 fields 參數
+        
+        None 表示預設欄位；'all' 表示全部欄位；其餘為逗號分隔的欄位名，
+        會加到預設欄位之後（id 一律回傳，供分頁使用）。
+        """
+        if not fields:
+            return InstanceService.DEFAULT_FIELDS
+        if isinstance(fields, str):
+            if fields == 'all':
+                return InstanceService.ALL_FIELDS
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in InstanceService.ALL_FIELDS]
+        if unknown:
+            raise ValueError(f"無效欄位: {', '.join(unknown)}")
+        extra = [f for f in InstanceService.ALL_FIELDS if f in fields and f not in InstanceService.DEFAULT_FIELDS]
+        return InstanceService.DEFAULT_FIELDS + tuple(extra)
+    
+    @staticmethod
+    def columns(fields: tuple) -> list:
+        return [getattr(VulnInstance, f) for f in fields]
+    
+    @staticmethod
+    def to_dict(row, fields: tuple) -> dict:
+        data = {f: getattr(row, f) for f in fields}
+        for f in InstanceService.DATETIME_FIELDS:
+            if data.get(f) is not None:
+                data[f] = data[f].isoformat()
+        return data
+    
+    @staticmethod
+    def get_page_size(limit: int = None) -> int:
+        default = current_app.config.get('INSTANCE_PAGE_SIZE', 100)
+        maximum = current_app.config.get('INSTANCE_PAGE_MAX', 1000)
+        if not limit or limit < 1:
+            return default
+        return min(limit, maximum)
+    
+    @staticmethod
+    def list_instances(vulnerability_id: int, after: int = None, limit: int = None, fields=None,
+                       status=None, url: str = None) -> dict:
+        """
+        以 keyset 分頁列出某漏洞的實例
+        
+        依 id 排序，取 id > after 的下一頁（走 vulnerability_id 索引，
+        不使用 OFFSET）；多取一筆用來判斷是否還有下一頁。
+        
+        Args:
+            vulnerability_id: 漏洞 ID
+            after: 上一頁最後一筆的實例 ID
+            limit: 每頁筆數（上限 INSTANCE_PAGE_MAX）
+            fields: 額外欄位（見 parse_fields）
+            status: 狀態篩選，可為逗號分隔字串或 list
+            url: URL 包含的字串
+        """
+        fields = InstanceService.parse_fields(fields)
+        limit = InstanceService.get_page_size(limit)
+        
+        vuln = db.session.execute(
+            db.select(Vulnerability.id, Vulnerability.report_id, Vulnerability.severity,
+                      Vulnerability.title, Vulnerability.instance_count)
+            .where(Vulnerability.id == vulnerability_id)
+        ).first()
+        if vuln is None:
+            abort(404)
+        
+        query = db.select(*InstanceService.columns(fields)).where(VulnInstance.vulnerability_id == vulnerability_id)
+        if status:
+            statuses = status.split(',') if isinstance(status, str) else list(status)
+            for s in statuses:
+                StatusService.validate_status(s)
+            query = query.where(VulnInstance.fix_status.in_(statuses))
+        if url:
+            query = query.where(VulnInstance.url.contains(url))
+        if after:
+            query = query.where(VulnInstance.id > after)
+        rows = db.session.execute(query.order_by(VulnInstance.id).limit(limit + 1)).all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'vulnerability': {
+                'id': vuln.id,
+                'report_id': vuln.report_id,
+                'severity': vuln.severity,
+                'title': vuln.title,
+                'instance_count': vuln.instance_count or 0
+            },
+            'instances': [InstanceService.to_dict(row, fields) for row in rows],
+            'next_after': rows[-1].id if has_more else None
+        }
+    
+    @staticmethod
+    def get_instance(instance_id: int) -> dict:
+        """取得單一實例完整內容（含所屬漏洞資訊）"""
+        row = db.session.execute(
+            db.select(*InstanceService.columns(InstanceService.ALL_FIELDS),
+                      Vulnerability.id.label('vulnerability_id'), Vulnerability.report_id,
+                      Vulnerability.severity, Vulnerability.title, Vulnerability.description)
+            .join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id)
+            .where(VulnInstance.id == instance_id)
+        ).first()
+        if row is None:
+            abort(404)
+        data = InstanceService.to_dict(row, InstanceService.ALL_FIELDS)
+        data['vulnerability'] = {
+            'id': row.vulnerability_id,
+            'report_id': row.report_id,
+            'severity': row.severity,
+            'title': row.title,
+            'description': row.description
+        }
+        return data
+
+
+class DiffService:
+    """
+    同一網站兩次掃描的差異
+    
+    以實例 fingerprint 比對：compare 有而 base 沒有的為新增（new），base 有而
+    compare 沒有的為已解決（resolved），兩者都有的為未變更（unchanged）。
+    每個類別一次 IN / NOT IN 半連接查詢，查詢數固定，不在 Python 端載入整份報告。
+    """
+    
+    CATEGORIES = ('new', 'resolved', 'unchanged')
+    DEFAULT_INCLUDE = ('new', 'resolved')  # unchanged 通常最多，預設只回傳數量
+    
+    @staticmethod
+    def parse_include(include) -> tuple:
+        """解析 include 參數（逗號分隔的類別），無效時拋出 ValueError"""
+        if not include:
+            return DiffService.DEFAULT_INCLUDE
+        values = [v.strip() for v in include.split(',') if v.strip()]
+        unknown = [v for v in values if v not in DiffService.CATEGORIES]
+        if unknown:
+            raise ValueError(f"無效的類別: {', '.join(unknown)}")
+        return tuple(c for c in DiffService.CATEGORIES if c in values)
+    
+    @staticmethod
+    def _query(report_id: int, other_id: int, present: bool, count: bool = False):
+        """report_id 中 fingerprint 出現（present）或未出現在 other_id 的實例"""
+        instances = VulnInstance.__table__
+        vulns = Vulnerability.__table__
+        other_instances = instances.alias('other_instances')
+        other_vulns = vulns.alias('other_vulns')
+        
+        # 不相關子查詢：資料庫將另一份報告的 fingerprint 實體化一次（雜湊 / 半連接），
+        # 不逐列以相關子查詢探測；排除 NULL 以免 NOT IN 的三值邏輯
+        other_fingerprints = db.select(other_instances.c.fingerprint).select_from(
+            other_instances.join(other_vulns, other_instances.c.vulnerability_id == other_vulns.c.id)
+        ).where(
+            other_vulns.c.report_id == other_id,
+            other_instances.c.fingerprint.isnot(None)
+        )
+        matched = instances.c.fingerprint.in_(other_fingerprints)
+        
+        columns = [db.func.count()] if count else [
+            instances.c.id, instances.c.vulnerability_id, vulns.c.severity, vulns.c.title,
+            instances.c.url, instances.c.method, instances.c.parameter, instances.c.fix_status,
+            instances.c.first_seen_at, instances.c.last_seen_at
+        ]
+        query = db.select(*columns).select_from(
+            instances.join(vulns, instances.c.vulnerability_id == vulns.c.id)
+        ).where(
+            vulns.c.report_id == report_id,
+            instances.c.fingerprint.isnot(None),
+            matched if present else ~matched
+        )
+        if not count:
+            query = query.order_by(instances.c.vulnerability_id, instances.c.id)
+        return query
+    
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            'id': row.id,
+            'vulnerability_id': row.vulnerability_id,
+            'severity': row.severity,
+            'title': row.title,
+            'url': row.url,
+            'method': row.method,
+            'parameter': row.parameter,
+            'fix_status': row.fix_status,
+            'first_seen_at': row.first_seen_at.isoformat() if row.first_seen_at else None,
+            'last_seen_at': row.last_seen_at.isoformat() if row.last_seen_at else None
+        }
+    
+    @staticmethod
+    def diff(base_id: int, compare_id: int, include=None) -> dict:
+        """
+        比較兩份報告
+        
+        Args:
+            base_id: 較早的報告
+            compare_id: 較新的報告
+            include: 需要回傳明細的類別（見 parse_include），其餘只回傳數量
+            
+        Returns:
+            dict: base / compare 報告欄位、summary 各類別數量，以及 include 類別的實例列表
+                  （new、unchanged 為 compare 中的實例，resolved 為 base 中的實例）
+        """
+        include = DiffService.parse_include(include)
+        reports = {
+            row.id: row for row in db.session.execute(
+                db.select(Report.id, Report.site_url, Report.file_name, Report.imported_at)
+                .where(Report.id.in_([base_id, compare_id]))
+            )
+        }
+        if base_id not in reports or compare_id not in reports:
+            abort(404)
+        if reports[base_id].site_url != reports[compare_id].site_url:
+            raise ValueError('只能比較同一網站的報告')
+        
+        # 類別 -> (實例所屬報告, 比對的報告, fingerprint 是否出現在比對報告)
+        queries = {
+            'new': (compare_id, base_id, False),
+            'resolved': (base_id, compare_id, False),
+            'unchanged': (compare_id, base_id, True)
+        }
+        result = {
+            'site_url': reports[base_id].site_url,
+            'base': {'id': base_id, 'file_name': reports[base_id].file_name,
+                     'imported_at': reports[base_id].imported_at.isoformat()},
+            'compare': {'id': compare_id, 'file_name': reports[compare_id].file_name,
+                        'imported_at': reports[compare_id].imported_at.isoformat()},
+            'summary': {}
+        }
+        for category in DiffService.CATEGORIES:
+            report_id, other_id, present = queries[category]
+            if category in include:
+                rows = db.session.execute(DiffService._query(report_id, other_id, present))
+                result[category] = [DiffService._to_dict(row) for row in rows]
+                result['summary'][category] = len(result[category])
+            else:
+                result['summary'][category] = db.session.execute(
+                    DiffService._query(report_id, other_id, present, count=True)
+                ).scalar()
+        return result
+
+
+class TreeService:
+    """漏洞樹狀結構服務"""
+    
+    # 層級：1 報告、2 嚴重等級、3 漏洞、4 實例
+    DEPTH_REPORT = 1
+    DEPTH_SEVERITY = 2
+    DEPTH_VULNERABILITY = 3
+    DEPTH_INSTANCE = 4
+    NAME_LENGTH = 80
+    
+    @staticmethod
+    def _report_node(report) -> dict:
+        return {
+            'id': f'report-{report.id}',
+            'name': report.site_url or report.file_name,
+            'type': 'report',
+            'children': []
+        }
+    
+    @staticmethod
+    def _severity_node(report_id: int, severity: str) -> dict:
+        return {
+            'id': f'severity-{report_id}-{severity}',
+            'name': severity,
+            'type': 'severity',
+            'instance_count': 0,
+            'children': []
+        }
+    
+    @staticmethod
+    def _vuln_node(vuln) -> dict:
+        return {
+            'id': f'vuln-{vuln.id}',
+            'name': vuln.title,
+            'type': 'vulnerability',
+            'instance_count': vuln.instance_count or 0,
+            'children': []
+        }
+    
+    @staticmethod
+    def _instance_node(instance_id: int, url: str, status: str) -> dict:
+        return {
+            'id': f'instance-{instance_id}',
+            'name': url[:TreeService.NAME_LENGTH] + '...' if len(url) > TreeService.NAME_LENGTH else url,
+            'type': 'instance',
+            'status': status
+        }
+    
+    @staticmethod
+    def _mark_lazy(nodes: list):
+        """未展開的節點以 lazy 標記，由 get_children 載入子節點"""
+        for node in nodes:
+            del node['children']
+            node['lazy'] = True
+    
+    @staticmethod
+    def validate_depth(depth) -> int:
+        if depth is None:
+            return TreeService.DEPTH_INSTANCE
+        if not TreeService.DEPTH_REPORT <= depth <= TreeService.DEPTH_INSTANCE:
+            raise ValueError(f"無效深度: {depth}（1-4）")
+        return depth
+    
+    @staticmethod
+    def build_tree(report_ids: list = None, depth: int = None) -> list:
+        """
+        建構漏洞樹
+        
+        報告、漏洞、實例各一次依序查詢，單次走訪組成
+        報告 → 嚴重等級 → 漏洞 → 實例 的階層；depth 以下的層級不查詢，
+        最深一層節點標記 lazy。
+        
+        Args:
+            report_ids: 限定的報告 ID，None 表示全部（依匯入時間新到舊）
+            depth: 展開深度 1-4（預設 4，完整展開）
+        """
+        depth = TreeService.validate_depth(depth)
+        
+        query = db.select(Report.id, Report.site_url, Report.file_name)
+        if report_ids is not None:
+            query = query.where(Report.id.in_(report_ids))
+        reports = db.session.execute(query.order_by(Report.imported_at.desc(), Report.id.desc())).all()
+        
+        report_nodes = {r.id: TreeService._report_node(r) for r in reports}
+        if depth == TreeService.DEPTH_REPORT or not report_nodes:
+            TreeService._mark_lazy(report_nodes.values())
+            return list(report_nodes.values())
+        
+        # 漏洞依報告分組，再依嚴重等級排序
+        severity_nodes = {rid: {} for rid in report_nodes}
+        vuln_nodes = {}
+        query = db.select(Vulnerability.id, Vulnerability.report_id, Vulnerability.severity,
+                          Vulnerability.title, Vulnerability.instance_count)
+        if report_ids is not None:
+            query = query.where(Vulnerability.report_id.in_(report_nodes))
+        for vuln in db.session.execute(query.order_by(Vulnerability.report_id, Vulnerability.id)):
+            groups = severity_nodes.get(vuln.report_id)
+            if groups is None or vuln.severity not in ReportService.SEVERITY_KEYS:
+                continue
+            group = groups.get(vuln.severity)
+            if group is None:
+                group = groups[vuln.severity] = TreeService._severity_node(vuln.report_id, vuln.severity)
+            group['instance_count'] += vuln.instance_count or 0
+            if depth >= TreeService.DEPTH_VULNERABILITY:
+                node = vuln_nodes[vuln.id] = TreeService._vuln_node(vuln)
+                group['children'].append(node)
+        
+        for report_id, groups in severity_nodes.items():
+            report_nodes[report_id]['children'] = [
+                groups[sev] for sev in ReportService.SEVERITY_ORDER if sev in groups
+            ]
+        
+        if depth == TreeService.DEPTH_SEVERITY:
+            for groups in severity_nodes.values():
+                TreeService._mark_lazy(groups.values())
+        elif depth == TreeService.DEPTH_VULNERABILITY:
+            TreeService._mark_lazy(vuln_nodes.values())
+        elif vuln_nodes:
+            query = db.select(VulnInstance.id, VulnInstance.vulnerability_id, VulnInstance.url, VulnInstance.fix_status)
+            if report_ids is not None:
+                query = query.join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id) \
+                    .where(Vulnerability.report_id.in_(report_nodes))
+            instances = db.session.execute(
+                query.order_by(VulnInstance.vulnerability_id, VulnInstance.id)
+                .execution_options(yield_per=ReportService.get_batch_size())
+            )
+            for inst in instances:
+                node = vuln_nodes.get(inst.vulnerability_id)
+                if node is not None:
+                    node['children'].append(TreeService._instance_node(inst.id, inst.url, inst.fix_status))
+        
+        return list(report_nodes.values())
+    
+    @staticmethod
+    def get_children(node_id: str, after: int = None, limit: int = None) -> dict:
+        """
+        載入單一節點的下一層子節點（側邊欄延遲展開用）
+        
+        報告 → 嚴重等級、嚴重等級 → 漏洞為單次查詢；漏洞 → 實例以
+        keyset 分頁，回傳 next_after。
+        """
+        # 只有節點 id 的格式錯誤回報為無效節點，查詢本身的錯誤（例如 after / limit）原樣拋出
+        kind, _, key = node_id.partition('-')
+        severity = None
+        try:
+            if kind == 'severity':
+                key, _, severity = key.partition('-')
+                if not severity:
+                    raise ValueError(node_id)
+            elif kind not in ('report', 'vuln'):
+                raise ValueError(node_id)
+            target_id = int(key)
+        except ValueError:
+            raise ValueError(f"無效節點: {node_id}") from None
+        
+        if kind == 'vuln':
+            page = InstanceService.list_instances(target_id, after=after, limit=limit,
+                                                  fields=('url', 'fix_status'))
+            return {
+                'id': node_id,
+                'children': [TreeService._instance_node(inst['id'], inst['url'], inst['fix_status'])
+                             for inst in page['instances']],
+                'next_after': page['next_after']
+            }
+        
+        if db.session.get(Report, target_id) is None:
+            abort(404)
+        
+        if kind == 'severity':
+            rows = db.session.execute(
+                db.select(Vulnerability.id, Vulnerability.title, Vulnerability.instance_count)
+                .where(Vulnerability.report_id == target_id, Vulnerability.severity == severity)
+                .order_by(Vulnerability.id)
+            ).all()
+            children = [TreeService._vuln_node(vuln) for vuln in rows]
+            TreeService._mark_lazy(children)
+            return {'id': node_id, 'children': children, 'next_after': None}
+        
+        rows = db.session.execute(
+            db.select(Vulnerability.severity, db.func.sum(Vulnerability.instance_count).label('total'))
+            .where(Vulnerability.report_id == target_id)
+            .group_by(Vulnerability.severity)
+        ).all()
+        totals = {row.severity: int(row.total or 0) for row in rows}
+        children = []
+        for sev in ReportService.SEVERITY_ORDER:
+            if sev in totals:
+                node = TreeService._severity_node(target_id, sev)
+                node['instance_count'] = totals[sev]
+                children.append(node)
+        TreeService._mark_lazy(children)
+        return {'id': node_id, 'children': children, 'next_after': None}
 
 
 class StatusService:
     """修復狀態管理服務"""
     
+    FILTER_FIELDS = {'report_id', 'vulnerability_id', 'severity', 'current_status', 'url'}  # update_status_by_filter 條件
+    
+    @staticmethod
+    def validate_status(status: str):
+        if status not in [s.value for s in FixStatus]:
+            raise ValueError(f"無效狀態: {status}")
+    
     @staticmethod
     def update_instance_status(instance_id: int, status: str, notes: str = None, fixed_by: str = None) -> VulnInstance:
         """更新漏洞實例狀態"""
         instance = VulnInstance.query.get_or_404(instance_id)
+        StatusService.validate_status(status)
         
-        if status not in [s.value for s in FixStatus]:
-            raise ValueError(f"無效狀態: {status}")
+        report_id = instance.vulnerability.report_id
+        if instance.fix_status != status:
+            CounterService.apply_status_deltas({
+                (report_id, instance.fix_status): -1,
+                (report_id, status): 1
+            })
         
         instance.fix_status = status
         instance.fix_notes = notes
@@ -219,36 +1690,499 @@ class StatusService:
             instance.fixed_by = fixed_by
         
         db.session.commit()
+        cache.invalidate_reports([report_id])
         return instance
     
     @staticmethod
-    def batch_update_status(instance_ids: list, status: str, notes: str = None, fixed_by: str = None) -> int:
-        """批次更新多個實例狀態"""
-        updated = 0
+    def _status_values(status: str, notes: str, fixed_by: str) -> dict:
+        """狀態更新要寫入的欄位（fixed_at / fixed_by 只在 FIXED 時設定）"""
+        now = datetime.utcnow()
+        values = {'fix_status': status, 'fix_notes': notes, 'updated_at': now}
+        if status == FixStatus.FIXED.value:
+            values['fixed_at'] = now
+            values['fixed_by'] = fixed_by
+        return values
+    
+    @staticmethod
+    def batch_update_status(instance_ids: list, status: str, notes: str = None, fixed_by: str = None) -> dict:
+        """
+        批次更新多個實例狀態
+        
+        每 STATUS_BATCH_SIZE 個 id 執行一次 UPDATE ... WHERE id IN (...)，
+        全部在同一個交易中提交。
+        
+        Returns:
+            dict: {'updated': 已更新的 id, 'not_found': 不存在的 id}
+        """
+        StatusService.validate_status(status)
+        
+        # id 來自請求內容，先轉為整數再去除重複（清單、物件等無法轉換的值列入 not_found）
+        ids = []
+        not_found = []
         for inst_id in instance_ids:
             try:
-                StatusService.update_instance_status(inst_id, status, notes, fixed_by)
-                updated += 1
-            except Exception:
-                continue
-        return updated
+                ids.append(int(inst_id))
+            except (TypeError, ValueError):
+                not_found.append(inst_id)
+        ids = list(dict.fromkeys(ids))
+        
+        chunk_size = current_app.config.get('STATUS_BATCH_SIZE', 1000)
+        values = StatusService._status_values(status, notes, fixed_by)
+        updated = []
+        deltas = {}
+        report_ids = set()
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                rows = db.session.execute(
+                    db.select(VulnInstance.id, Vulnerability.report_id, VulnInstance.fix_status)
+                    .join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id)
+                    .where(VulnInstance.id.in_(chunk))
+                    .with_for_update()
+                ).all()
+                found = {row.id for row in rows}
+                for row in rows:
+                    report_ids.add(row.report_id)
+                    if row.fix_status != status:
+                        deltas[(row.report_id, row.fix_status)] = deltas.get((row.report_id, row.fix_status), 0) - 1
+                        deltas[(row.report_id, status)] = deltas.get((row.report_id, status), 0) + 1
+                
+                if found:
+                    db.session.execute(
+                        db.update(VulnInstance).where(VulnInstance.id.in_(found)).values(**values)
+                        .execution_options(synchronize_session=False)
+                    )
+                updated.extend(inst_id for inst_id in chunk if inst_id in found)
+                not_found.extend(inst_id for inst_id in chunk if inst_id not in found)
+            
+            CounterService.apply_status_deltas(deltas)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        cache.invalidate_reports(report_ids)
+        return {'updated': updated, 'not_found': not_found}
     
     @staticmethod
-    def get_status_summary(report_id: int = None) -> dict:
-        """取得狀態統計"""
-        query = VulnInstance.query
-        if report_id:
-            query = query.join(Vulnerability).filter(Vulnerability.report_id == report_id)
+    def update_status_by_filter(filters: dict, status: str, notes: str = None, fixed_by: str = None) -> int:
+        """
+        依條件批次更新狀態（不需傳送 id 清單）
         
-        summary = {s.value: 0 for s in FixStatus}
-        for instance in query.all():
-            if instance.fix_status in summary:
-                summary[instance.fix_status] += 1
+        Args:
+            filters: 可包含 report_id、vulnerability_id、severity、
+                     current_status（目前狀態）、url（URL 包含字串），至少需指定一項
+            
+        Returns:
+            int: 更新的實例數
+        """
+        StatusService.validate_status(status)
+        
+        vuln_conditions = []
+        if filters.get('report_id'):
+            vuln_conditions.append(Vulnerability.report_id == int(filters['report_id']))
+        if filters.get('severity'):
+            vuln_conditions.append(Vulnerability.severity == filters['severity'])
+        
+        conditions = []
+        if filters.get('vulnerability_id'):
+            conditions.append(VulnInstance.vulnerability_id == int(filters['vulnerability_id']))
+        if filters.get('current_status'):
+            conditions.append(VulnInstance.fix_status == filters['current_status'])
+        if filters.get('url'):
+            # % 與 _ 視為一般字元，避免篩選條件擴大批次更新的範圍
+            conditions.append(VulnInstance.url.contains(filters['url'], autoescape=True))
+        if vuln_conditions:
+            conditions.append(VulnInstance.vulnerability_id.in_(
+                db.select(Vulnerability.id).where(*vuln_conditions)
+            ))
+        
+        if not conditions:
+            raise ValueError('至少需指定一個篩選條件')
+        
+        try:
+            # 先以彙總查詢計算統計計數的增減；FOR UPDATE 鎖定符合條件的列，
+            # 其他交易無法在彙總與 UPDATE 之間改變狀態，計數與實際更新的列一致
+            rows = db.session.execute(
+                db.select(Vulnerability.report_id, VulnInstance.fix_status, db.func.count())
+                .join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id)
+                .where(*conditions)
+                .group_by(Vulnerability.report_id, VulnInstance.fix_status)
+                .with_for_update()
+            ).all()
+            deltas = {}
+            for report_id, fix_status, count in rows:
+                if fix_status != status:
+                    deltas[(report_id, fix_status)] = deltas.get((report_id, fix_status), 0) - count
+                    deltas[(report_id, status)] = deltas.get((report_id, status), 0) + count
+            
+            result = db.session.execute(
+                db.update(VulnInstance).where(*conditions)
+                .values(**StatusService._status_values(status, notes, fixed_by))
+                .execution_options(synchronize_session=False)
+            )
+            CounterService.apply_status_deltas(deltas)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
         
+        cache.invalidate_reports({report_id for report_id, _, _ in rows})
+        return result.rowcount
+    
+    @staticmethod
+    def get_status_counts(report_id: int = None) -> dict:
+        """取得各狀態的實例數（由 report_counters 彙總）"""
+        if report_id:
+            return CounterService.get_report_counts([report_id], CounterService.FIX_STATUS)[report_id]
+        return CounterService.get_totals(CounterService.FIX_STATUS)
+    
+    @staticmethod
+    def get_status_summary(report_id: int = None, counts: dict = None) -> dict:
+        """取得狀態統計"""
+        if counts is None:
+            counts = StatusService.get_status_counts(report_id)
+        
+        summary = {s.value: counts.get(s.value, 0) for s in FixStatus}
         summary['total'] = sum(summary.values())
         return summary
 
 
+class CounterService:
+    """
+    報告統計計數維護
+    
+    report_counters 以 (report_id, dimension, bucket) 儲存各報告的漏洞類型數
+    （severity）與實例數（fix_status），所有寫入都在呼叫端的交易中進行，
+    不會自行 commit。讀取時只需查詢 O(報告數) 列。
+    """
+    
+    SEVERITY = 'severity'
+    FIX_STATUS = 'fix_status'
+    
+    @staticmethod
+    def _buckets():
+        return [(CounterService.SEVERITY, s.value) for s in SeverityLevel] + \
+               [(CounterService.FIX_STATUS, s.value) for s in FixStatus]
+    
+    @staticmethod
+    def init_report(report_id: int, severity_counts: dict, status_counts: dict):
+        """新報告匯入後建立全部計數列（含 0 的欄位，之後只需 UPDATE）"""
+        counts = {CounterService.SEVERITY: severity_counts, CounterService.FIX_STATUS: status_counts}
+        rows = [{
+            'report_id': report_id,
+            'dimension': dimension,
+            'bucket': bucket,
+            'count': counts[dimension].get(bucket, 0)
+        } for dimension, bucket in CounterService._buckets()]
+        db.session.execute(ReportCounter.__table__.insert(), rows)
+    
+    @staticmethod
+    def apply_status_deltas(deltas: dict):
+        """
+        套用修復狀態計數增減
+        
+        Args:
+            deltas: {(report_id, fix_status): 增減量}
+        """
+        table = ReportCounter.__table__
+        params = [
+            {'rid': report_id, 'b': status, 'delta': delta}
+            for (report_id, status), delta in deltas.items() if delta
+        ]
+        if not params:
+            return
+        db.session.execute(
+            table.update()
+            .where(table.c.report_id == db.bindparam('rid'),
+                   table.c.dimension == CounterService.FIX_STATUS,
+                   table.c.bucket == db.bindparam('b'))
+            .values(count=table.c.count + db.bindparam('delta')),
+            params
+        )
+    
+    @staticmethod
+    def delete_report(report_id: int):
+        db.session.execute(db.delete(ReportCounter).where(ReportCounter.report_id == report_id))
+    
+    @staticmethod
+    def get_totals(dimension: str) -> dict:
+        """取得全部報告加總後的計數 {bucket: count}"""
+        rows = db.session.query(ReportCounter.bucket, db.func.sum(ReportCounter.count)) \
+            .filter(ReportCounter.dimension == dimension) \
+            .group_by(ReportCounter.bucket).all()
+        return {bucket: int(count or 0) for bucket, count in rows}
+    
+    @staticmethod
+    def get_report_counts(report_ids: list, dimension: str) -> dict:
+        """
+        取得多個報告的計數 {report_id: {bucket: count}}
+        
+        一次查詢 report_counters；尚無計數列的報告（例如由舊版備份還原）
+        再以一次 GROUP BY 即時計算，不逐一查詢。
+        """
+        result = {report_id: {} for report_id in report_ids}
+        if not report_ids:
+            return result
+        
+        rows = db.session.query(ReportCounter.report_id, ReportCounter.bucket, ReportCounter.count) \
+            .filter(ReportCounter.report_id.in_(report_ids), ReportCounter.dimension == dimension).all()
+        for report_id, bucket, count in rows:
+            result[report_id][bucket] = count
+        
+        missing = [report_id for report_id, buckets in result.items() if not buckets]
+        if missing:
+            for report_id, bucket, count in CounterService._live_counts(missing, dimension):
+                result[report_id][bucket] = count
+        return result
+    
+    @staticmethod
+    def _live_counts(report_ids: list, dimension: str) -> list:
+        """由原始資料以 GROUP BY 計算 [(report_id, bucket, count)]"""
+        if dimension == CounterService.SEVERITY:
+            query = db.select(Vulnerability.report_id, Vulnerability.severity, db.func.count()) \
+                .where(Vulnerability.report_id.in_(report_ids)) \
+                .group_by(Vulnerability.report_id, Vulnerability.severity)
+        else:
+            query = db.select(Vulnerability.report_id, VulnInstance.fix_status, db.func.count()) \
+                .join(Vulnerability, VulnInstance.vulnerability_id == Vulnerability.id) \
+                .where(Vulnerability.report_id.in_(report_ids)) \
+                .group_by(Vulnerability.report_id, VulnInstance.fix_status)
+        return db.session.execute(query).all()
+    
+    @staticmethod
+    def rebuild(report_id: int = None, commit: bool = True):
+        """
+        由原始資料重建統計計數（修正計數偏差），並提交
+        
+        Args:
+            report_id: 只重建指定報告；None 表示全部
+            commit: False 時不提交也不清除快取（在呼叫端的交易中執行）
+        """
+        counters = ReportCounter.__table__
+        vulns = Vulnerability.__table__
+        instances = VulnInstance.__table__
+        
+        delete = counters.delete()
+        if report_id:
+            delete = delete.where(counters.c.report_id == report_id)
+        db.session.execute(delete)
+        
+        # 各報告的漏洞類型數
+        severity_select = db.select(
+            vulns.c.report_id, db.literal(CounterService.SEVERITY), vulns.c.severity, db.func.count()
+        ).group_by(vulns.c.report_id, vulns.c.severity)
+        # 各報告的實例修復狀態數
+        status_select = db.select(
+            vulns.c.report_id, db.literal(CounterService.FIX_STATUS), instances.c.fix_status, db.func.count()
+        ).select_from(instances.join(vulns, instances.c.vulnerability_id == vulns.c.id)) \
+            .where(instances.c.fix_status.isnot(None)) \
+            .group_by(vulns.c.report_id, instances.c.fix_status)
+        if report_id:
+            severity_select = severity_select.where(vulns.c.report_id == report_id)
+            status_select = status_select.where(vulns.c.report_id == report_id)
+        
+        columns = ['report_id', 'dimension', 'bucket', 'count']
+        db.session.execute(counters.insert().from_select(columns, severity_select))
+        db.session.execute(counters.insert().from_select(columns, status_select))
+        
+        # 補上計數為 0 的欄位
+        reports = Report.__table__
+        for dimension, bucket in CounterService._buckets():
+            exists = db.select(counters.c.report_id).where(
+                counters.c.report_id == reports.c.id,
+                counters.c.dimension == dimension,
+                counters.c.bucket == bucket
+            ).exists()
+            zero_select = db.select(reports.c.id, db.literal(dimension), db.literal(bucket), db.literal(0)) \
+                .where(~exists)
+            if report_id:
+                zero_select = zero_select.where(reports.c.id == report_id)
+            db.session.execute(counters.insert().from_select(columns, zero_select))
+        
+        # 各漏洞實例數
+        count_select = db.select(db.func.count()).where(instances.c.vulnerability_id == vulns.c.id) \
+            .scalar_subquery()
+        update = vulns.update().values(instance_count=count_select)
+        if report_id:
+            update = update.where(vulns.c.report_id == report_id)
+        db.session.execute(update)
+        
+        if commit:
+            db.session.commit()
+            cache.invalidate_all()
+
+
+class SchemaService:
+    """資料庫結構升級"""
+    
+    @staticmethod
+    def upgrade() -> list:
+        """
+        建立缺少的資料表、欄位與索引，並為新建立的計數表與搜尋索引補上資料
+        
+        於啟動時與 SQL 還原後執行（還原的 dump 可能來自舊版本）。
+        
+        Returns:
+            list: ensure_schema() 的變更項目
+        """
+        changes = ensure_schema()
+        # 統計計數表或欄位剛建立時，由既有資料重建一次
+        if 'report_counters' in changes or 'vulnerabilities.instance_count' in changes:
+            CounterService.rebuild()
+        # 搜尋索引剛建立時，為既有報告建立索引
+        if SearchService.ensure_index(changes):
+            SearchService.reindex()
+        # fingerprint 與出現時間欄位剛建立時，由既有實例補上
+        if 'vuln_instances.first_seen_at' in changes:
+            instances = VulnInstance.__table__
+            db.session.execute(instances.update().values(
+                first_seen_at=instances.c.created_at, last_seen_at=instances.c.created_at,
+                updated_at=instances.c.updated_at
+            ))
+            db.session.commit()
+        if 'vuln_instances.fingerprint' in changes:
+            ReportService.assign_fingerprints()
+        return changes
+
+
+class JobService:
+    """背景工作狀態服務"""
+    
+    # 本行程執行中工作的即時進度（job_id -> dict），避免每批都寫資料庫
+    _live = {}
+    _live_lock = threading.Lock()
+    _last_persisted = {}
+    # 執行中工作的基本欄位；工作表在執行期間被重建（SQL 還原）時用來補回該列
+    _rows = {}
+    
+    @staticmethod
+    def create(job_type: str, file_name: str = None, total_bytes: int = 0) -> ImportJob:
+        """建立排隊中的工作"""
+        job = ImportJob(
+            id=uuid.uuid4().hex,
+            job_type=job_type,
+            status=JobStatus.QUEUED.value,
+            file_name=file_name,
+            total_bytes=total_bytes,
+            processed_bytes=0,
+            processed_instances=0
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+    
+    @staticmethod
+    def start(job_id: str):
+        """標記工作開始執行"""
+        job = db.session.get(ImportJob, job_id)
+        job.status = JobStatus.RUNNING.value
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        with JobService._live_lock:
+            JobService._live[job_id] = {'processed_bytes': 0, 'processed_instances': 0}
+            JobService._rows[job_id] = {
+                'job_type': job.job_type,
+                'file_name': job.file_name,
+                'total_bytes': job.total_bytes,
+                'created_at': job.created_at,
+                'started_at': job.started_at
+            }
+    
+    @staticmethod
+    def update_progress(job_id: str, **progress):
+        """
+        更新工作進度
+        
+        進度先記在本行程記憶體；每隔 JOB_PROGRESS_INTERVAL 秒以獨立連線寫回資料庫，
+        讓其他 worker 行程也查得到。SQLite 僅允許單一寫入者，匯入交易進行中
+        無法另外寫入，因此只保留記憶體進度。
+        """
+        with JobService._live_lock:
+            JobService._live.setdefault(job_id, {}).update(progress)
+        
+        if db.engine.dialect.name == 'sqlite':
+            return
+        now = time.monotonic()
+        interval = current_app.config.get('JOB_PROGRESS_INTERVAL', 1.0)
+        if now - JobService._last_persisted.get(job_id, 0) < interval:
+            return
+        JobService._last_persisted[job_id] = now
+        
+        table = ImportJob.__table__
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(table.update().where(table.c.id == job_id).values(**progress))
+        except Exception as e:
+            print(f"工作進度寫入失敗: {e}")
+    
+    @staticmethod
+    def finish(job_id: str, result: dict = None, errors: list = None, **progress):
+        """標記工作完成；有 errors 且沒有 result 時視為失敗"""
+        with JobService._live_lock:
+            live = JobService._live.pop(job_id, {})
+            row = JobService._rows.pop(job_id, None)
+        JobService._last_persisted.pop(job_id, None)
+        
+        job = db.session.get(ImportJob, job_id)
+        if job is None and row is not None:
+            job = ImportJob(id=job_id, **row)
+            db.session.add(job)
+        for key, value in {**live, **progress}.items():
+            setattr(job, key, value)
+        job.result = result
+        job.errors = errors or None
+        job.status = JobStatus.FAILED.value if errors and not result else JobStatus.SUCCEEDED.value
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return job
+    
+    @staticmethod
+    def get_job(job_id: str) -> dict:
+        """取得工作狀態（含處理速率與預估剩餘時間）"""
+        try:
+            job = db.session.get(ImportJob, job_id)
+        except SQLAlchemyError:
+            # SQL 還原重建工作表的瞬間查詢會失敗，改用記憶體中的資料
+            db.session.rollback()
+            job = None
+        if job is None:
+            with JobService._live_lock:
+                row = JobService._rows.get(job_id)
+            if row is None:
+                return None
+            job = ImportJob(id=job_id, status=JobStatus.RUNNING.value, **row)
+        
+        data = {
+            'id': job.id,
+            'job_type': job.job_type,
+            'status': job.status,
+            'file_name': job.file_name,
+            'total_bytes': job.total_bytes or 0,
+            'processed_bytes': job.processed_bytes or 0,
+            'processed_instances': job.processed_instances or 0,
+            'result': job.result,
+            'errors': job.errors or [],
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+            'rate': None,
+            'eta': None
+        }
+        with JobService._live_lock:
+            data.update(JobService._live.get(job_id, {}))
+        
+        if job.started_at:
+            elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+            data['elapsed'] = round(elapsed, 1)
+            if elapsed > 0:
+                data['rate'] = round(data['processed_instances'] / elapsed, 1)
+            done, total = data['processed_bytes'], data['total_bytes']
+            if job.status == JobStatus.RUNNING.value and done and total:
+                data['eta'] = round(elapsed * (total - done) / done, 1)
+        return data
+
+
 class LogService:
     """操作日誌服務"""
     
@@ -265,12 +2199,24 @@ class LogService:
         return log
     
     @staticmethod
-    def get_logs(page: int = 1, per_page: int = 50, action_type: str = None):
-        """取得日誌列表"""
+    def get_logs(cursor: str = None, limit: int = None, action_type: str = None, include_total: bool = False) -> dict:
+        """取得日誌列表（依 (created_at, id) 遞減的 keyset 分頁）"""
         from models import OperationLog
-        query = OperationLog.query
+        query = db.select(OperationLog.id, OperationLog.action_type, OperationLog.message, OperationLog.created_at)
         if action_type:
-            query = query.filter(OperationLog.action_type == action_type)
-        return query.order_by(OperationLog.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+            query = query.where(OperationLog.action_type == action_type)
+        rows, next_cursor = keyset_page(
+            query, [(OperationLog.created_at, 'created_at'), (OperationLog.id, 'id')], cursor, get_limit(limit)
         )
+        result = {
+            'logs': [{
+                'id': log.id,
+                'action_type': log.action_type,
+                'message': log.message,
+                'created_at': log.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            } for log in rows],
+            'next_cursor': next_cursor
+        }
+        if include_total:
+            result['total'] = cached_count(('logs', action_type), query)
+        return result
@@ -0,0 +1,173 @@
+"""
+SQL 匯出（mysqldump 無法使用時的備用方案）
+
+資料以 SSCursor（不緩衝）逐列讀取，組成多列 INSERT，每個語句不超過
+rows_per_statement 列與 max_packet 位元組；值的跳脫交由 PyMySQL 處理。
+輸出直接寫入檔案（可選 gzip），記憶體只保留一個語句。
+
+workers > 1 時各資料表由獨立連線平行匯出到暫存檔，完成後依資料表順序
+合併；gzip 時每個暫存檔各自是一個 gzip member，串接後仍是合法的 gzip 檔。
+"""
+import gzip
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from pymysql.cursors import SSCursor
+
+DEFAULT_ROWS_PER_STATEMENT = 1000
+DEFAULT_MAX_PACKET = 1024 * 1024  # 與 mysqldump 的 net_buffer_length 預設相同
+WRITE_BUFFER = 1024 * 1024
+
+
+def _open(path: str, compress: bool, mode: str = 'wb'):
+    # gzip 以 'ab' 開啟時會附加新的 member
+    if compress:
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode, buffering=WRITE_BUFFER)
+
+
+def _quote(name: str) -> str:
+    return '`' + name.replace('`', '``') + '`'
+
+
+def list_tables(conn) -> list:
+    """列出資料庫中的資料表（不含 view）"""
+    with conn.cursor() as cursor:
+        cursor.execute("SHOW FULL TABLES WHERE Table_type = 'BASE TABLE'")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def dump_table(conn, table: str, f, rows_per_statement: int = DEFAULT_ROWS_PER_STATEMENT,
+               max_packet: int = DEFAULT_MAX_PACKET) -> int:
+    """
+    匯出單一資料表的結構與資料
+
+    Args:
+        conn: PyMySQL 連線
+        table: 資料表名稱
+        f: 以二進位模式開啟的輸出檔
+        rows_per_statement: 每個 INSERT 的列數上限
+        max_packet: 每個 INSERT 的位元組上限（單列超過時仍單獨輸出）
+
+    Returns:
+        int: 匯出的列數
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"SHOW CREATE TABLE {_quote(table)}")
+        create_stmt = cursor.fetchone()[1]
+    f.write(f"DROP TABLE IF EXISTS {_quote(table)};\n{create_stmt};\n\n".encode('utf-8'))
+
+    def escape(value):
+        # 二進位值輸出為十六進位字面值（同 mysqldump --hex-blob），檔案維持合法 UTF-8
+        if isinstance(value, (bytes, bytearray)):
+            return f"X'{value.hex()}'"
+        return conn.escape(value)
+
+    count = 0
+    with conn.cursor(SSCursor) as cursor:
+        cursor.execute(f"SELECT * FROM {_quote(table)}")
+        columns = ', '.join(_quote(column[0]) for column in cursor.description)
+        prefix = f"INSERT INTO {_quote(table)} ({columns}) VALUES\n".encode('utf-8')
+        statement, size = [], len(prefix)
+
+        for row in cursor:
+            values = ('(' + ','.join(escape(value) for value in row) + ')').encode('utf-8')
+            if statement and (len(statement) >= rows_per_statement or size + len(values) + 2 > max_packet):
+                f.write(prefix + b',\n'.join(statement) + b';\n')
+                statement, size = [], len(prefix)
+            statement.append(values)
+            size += len(values) + 2
+            count += 1
+
+        if statement:
+            f.write(prefix + b',\n'.join(statement) + b';\n')
+    if count:
+        f.write(b'\n')
+    return count
+
+
+def _header() -> bytes:
+    return (
+        "-- VulnTracker SQL Dump\n"
+        f"-- Generated: {datetime.now().isoformat()}\n\n"
+        "SET NAMES utf8mb4;\n"
+        "SET FOREIGN_KEY_CHECKS = 0;\n\n"
+    ).encode('utf-8')
+
+
+FOOTER = b"SET FOREIGN_KEY_CHECKS = 1;\n"
+
+
+def _start_snapshot(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+
+
+def dump(connect, filepath: str, compress: bool = False, workers: int = 1,
+         rows_per_statement: int = DEFAULT_ROWS_PER_STATEMENT, max_packet: int = DEFAULT_MAX_PACKET) -> dict:
+    """
+    匯出整個資料庫到檔案
+
+    單一連線時在同一個一致性快照中匯出所有資料表；平行匯出時每個
+    資料表各自一個快照。
+
+    Args:
+        connect: 建立 PyMySQL 連線的函式（不需參數）
+        filepath: 輸出檔路徑
+        compress: 是否以 gzip 壓縮
+        workers: 平行匯出的資料表數
+
+    Returns:
+        dict: {'tables': 資料表數, 'rows': 總列數}
+    """
+    options = {'rows_per_statement': max(1, rows_per_statement), 'max_packet': max_packet}
+    conn = connect()
+    try:
+        tables = list_tables(conn)
+        if workers <= 1 or len(tables) <= 1:
+            _start_snapshot(conn)
+            with _open(filepath, compress) as f:
+                f.write(_header())
+                rows = sum(dump_table(conn, table, f, **options) for table in tables)
+                f.write(FOOTER)
+            conn.commit()
+            return {'tables': len(tables), 'rows': rows}
+    finally:
+        conn.close()
+
+    def dump_part(index, table):
+        part_path = f'{filepath}.{index}.part'
+        table_conn = connect()
+        try:
+            _start_snapshot(table_conn)
+            with _open(part_path, compress) as f:
+                rows = dump_table(table_conn, table, f, **options)
+            table_conn.commit()
+            return part_path, rows
+        finally:
+            table_conn.close()
+
+    rows = 0
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sqldump')
+    futures = [executor.submit(dump_part, i, table) for i, table in enumerate(tables)]
+    try:
+        with _open(filepath, compress) as f:
+            f.write(_header())
+        with open(filepath, 'ab') as out:
+            for future in futures:
+                part_path, part_rows = future.result()
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, out, WRITE_BUFFER)
+                os.remove(part_path)
+                rows += part_rows
+        with _open(filepath, compress, 'ab') as f:
+            f.write(FOOTER)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        for i in range(len(tables)):
+            if os.path.exists(f'{filepath}.{i}.part'):
+                os.remove(f'{filepath}.{i}.part')
+    return {'tables': len(tables), 'rows': rows}
@@ -0,0 +1,272 @@
+"""
+SQL 還原
+
+SQL dump 以串流方式逐段讀取並切分語句，記憶體只保留目前的語句，
+可處理數 GB 的檔案。切分時會辨識：
+
+- 字串與識別字（'...'、"..."、`...`），含反斜線跳脫與重複引號
+- 註解（-- 、#、/* */）；MySQL 可執行註解 /*! */、/*M! */ 保留在語句中
+- DELIMITER 指令（mysqldump --routines / --triggers 的輸出）
+
+還原時關閉外鍵與唯一性檢查，每 batch_size 個語句提交一次交易。
+"""
+import codecs
+import re
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_BATCH_SIZE = 100
+MAX_ERRORS = 100  # 最多記錄的錯誤筆數（之後只計數）
+
+WHITESPACE = re.compile(r'\s*')
+DELIMITER_COMMAND = re.compile(r'DELIMITER[ \t]+(\S+)[^\n]*', re.IGNORECASE)
+# 完整字串（unrolled loop 寫法，無法配對時不會大量回溯）
+STRING = {
+    "'": re.compile(r"'[^'\\]*(?:(?:\\[\s\S]|'')[^'\\]*)*'"),
+    '"': re.compile(r'"[^"\\]*(?:(?:\\[\s\S]|"")[^"\\]*)*"'),
+    '`': re.compile(r'`[^`]*(?:``[^`]*)*`'),
+}
+STRING_BODY = ''.join('|' + pattern.pattern for pattern in STRING.values())
+# 字串跨越緩衝區時逐段尋找結尾
+STRING_END = {
+    "'": re.compile(r"[\\']"),
+    '"': re.compile(r'[\\"]'),
+    '`': re.compile(r'`'),
+}
+
+
+class StatementReader:
+    """
+    逐一產生 SQL 語句（不含結尾分隔符號）
+
+    buf[pos:scan] 是目前語句已掃描但尚未複製的部分，只在語句結束、
+    遇到註解或需要讀入下一段時才複製到 parts，避免逐 token 切字串。
+
+    Args:
+        f: 以二進位模式開啟的檔案（UTF-8）
+        chunk_size: 每次讀取的位元組數
+    """
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.scan = 0
+        self.eof = False
+        self.parts = []
+        self.set_delimiter(';')
+
+    def set_delimiter(self, delimiter: str):
+        self.delimiter = delimiter
+        self.special = re.compile(r"""['"`#]|--|/\*|""" + re.escape(delimiter))
+
+        # body 一次略過一般文字與完整字串，停在下一個可能的特殊符號
+        # （重複引號 '' 視為兩個相鄰字串，涵蓋範圍相同，不影響切分）
+        first, rest = delimiter[0], delimiter[1:]
+        follow = {'/': [r'\*'], '-': ['-']}
+        singles = []
+        for char, forbidden in follow.items():
+            if char == first:
+                if not rest:
+                    continue
+                forbidden = forbidden + [re.escape(rest)]
+            singles.append(f"{re.escape(char)}(?!{'|'.join(forbidden)})")
+        if first not in follow and rest:
+            singles.append(f"{re.escape(first)}(?!{re.escape(rest)})")
+        self.body = re.compile(
+            r"""(?:[^'"`#/\-""" + re.escape(first) + r"""]+"""
+            + STRING_BODY + '|' + '|'.join(singles) + ')*'
+        )
+        self.edge = '-/' + first
+
+    def fill(self) -> bool:
+        """讀入更多資料（保留 pos 之後的部分），回傳是否有讀到新內容"""
+        if self.eof:
+            return False
+        data = self.f.read(self.chunk_size)
+        text = self.decoder.decode(data, final=not data)
+        if not data:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + text
+        self.scan -= self.pos
+        self.pos = 0
+        return bool(data)
+
+    def _keep(self, end: int):
+        """將 buf[pos:end] 加入目前語句"""
+        if end > self.pos:
+            self.parts.append(self.buf[self.pos:end])
+        self.pos = self.scan = end
+
+    def _skip(self, end: int):
+        """捨棄 buf[pos:end]"""
+        self.pos = self.scan = end
+
+    def _skip_to(self, terminator: str, keep: bool):
+        """前進到 terminator 之後（keep 為 False 時捨棄經過的內容）"""
+        advance = self._keep if keep else self._skip
+        while True:
+            index = self.buf.find(terminator, self.pos)
+            if index >= 0:
+                advance(index + len(terminator))
+                return
+            # terminator 可能跨越兩段緩衝區，保留尾端
+            advance(max(self.pos, len(self.buf) - len(terminator) + 1))
+            if not self.fill():
+                advance(len(self.buf))
+                return
+
+    def _skip_string(self, quote: str):
+        """逐段前進到字串結尾（pos 位於開頭引號之後）"""
+        pattern = STRING_END[quote]
+        while True:
+            m = pattern.search(self.buf, self.pos)
+            if m is None or m.end() >= len(self.buf):
+                # 需要下一個字元判斷跳脫或重複引號
+                self._keep(len(self.buf) if m is None else m.start())
+                if not self.fill():
+                    self._keep(len(self.buf))
+                    return
+                continue
+            if m.group() == '\\' or self.buf[m.end()] == quote:
+                self._keep(m.end() + 1)
+            else:
+                self._keep(m.end())
+                return
+
+    def _empty_before(self, index: int) -> bool:
+        """目前語句在 index 之前是否只有空白"""
+        return not self.parts and not self.buf[self.pos:index].strip()
+
+    def _statement(self) -> str:
+        statement = ''.join(self.parts).strip()
+        self.parts = []
+        return statement
+
+    def __iter__(self):
+        while True:
+            if not self.parts and self.pos == self.scan:
+                # 語句開頭：略過空白並處理 DELIMITER 指令
+                self._skip(WHITESPACE.match(self.buf, self.pos).end())
+                if self.pos >= len(self.buf) - len('DELIMITER'):
+                    if self.fill():
+                        continue
+                    if self.pos >= len(self.buf):
+                        return
+                if self.buf[self.pos:self.pos + 9].upper() == 'DELIMITER':
+                    if self.buf.find('\n', self.pos) < 0 and self.fill():
+                        continue
+                    m = DELIMITER_COMMAND.match(self.buf, self.pos)
+                    if m:
+                        self.set_delimiter(m.group(1))
+                        self._skip(m.end())
+                        continue
+
+            end = self.body.match(self.buf, self.scan).end()
+            if end == len(self.buf) and end > self.scan and not self.eof and self.buf[end - 1] in self.edge:
+                end -= 1  # 可能是跨越緩衝區的 -- 、/* 或分隔符號
+            self.scan = end
+
+            m = self.special.search(self.buf, self.scan)
+            if m is None or m.end() + 2 > len(self.buf):
+                # 沒有特殊符號或太接近緩衝區結尾：先讀入更多資料
+                if not self.eof:
+                    if m is None:
+                        self._keep(max(self.scan, len(self.buf) - len(self.delimiter) - 1))
+                    self.fill()
+                    continue
+                if m is None:
+                    self._keep(len(self.buf))
+                    statement = self._statement()
+                    if statement:
+                        yield statement
+                    return
+
+            token = m.group()
+            if token == self.delimiter:
+                self._keep(m.start())
+                self._skip(m.end())
+                statement = self._statement()
+                if statement:
+                    yield statement
+            elif token in STRING:
+                s = STRING[token].match(self.buf, m.start())
+                if s:
+                    self.scan = s.end()
+                else:  # 字串跨越緩衝區
+                    self._keep(m.end())
+                    self._skip_string(token)
+            elif token == '--' and m.end() < len(self.buf) and not self.buf[m.end()].isspace():
+                # 不是註解（例如 a--1），只前進一個字元
+                self.scan = m.start() + 1
+            elif token in ('--', '#'):
+                # 語句開頭的註解直接捨棄，之後仍可辨識 DELIMITER
+                at_start = self._empty_before(m.start())
+                self._keep(m.start())
+                self._skip_to('\n', keep=False)
+                if not at_start:
+                    self.parts.append('\n')
+            else:  # /*
+                at_start = self._empty_before(m.start())
+                self._keep(m.start())
+                follow = self.buf[m.end():m.end() + 2]
+                if follow.startswith('!') or follow == 'M!':
+                    self._skip_to('*/', keep=True)
+                else:
+                    self._skip_to('*/', keep=False)
+                    if not at_start:
+                        self.parts.append(' ')
+
+
+def restore(conn, f, batch_size: int = DEFAULT_BATCH_SIZE, stop_on_error: bool = False, progress=None) -> dict:
+    """
+    執行 SQL dump
+
+    Args:
+        conn: PyMySQL 連線（autocommit 關閉）
+        f: 以二進位模式開啟的 dump 檔
+        batch_size: 每個交易包含的語句數（DDL 會自動提交）
+        stop_on_error: 遇到錯誤時停止，否則記錄後繼續
+        progress: 每個交易提交後呼叫 progress(已執行語句數)
+
+    Returns:
+        dict: {'statements': 成功執行數, 'failed': 失敗數, 'errors': [...], 'stopped': 是否中止}
+    """
+    result = {'statements': 0, 'failed': 0, 'errors': [], 'stopped': False}
+    with conn.cursor() as cursor:
+        cursor.execute("SET NAMES utf8mb4")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        cursor.execute("SET UNIQUE_CHECKS = 0")
+        try:
+            pending = 0
+            for index, statement in enumerate(StatementReader(f), start=1):
+                try:
+                    cursor.execute(statement)
+                    result['statements'] += 1
+                except Exception as e:
+                    # MySQL 只回滾失敗的語句，交易中先前的語句不受影響
+                    result['failed'] += 1
+                    if len(result['errors']) < MAX_ERRORS:
+                        result['errors'].append({
+                            'statement': index,
+                            'sql': statement[:200],
+                            'error': str(e)
+                        })
+                    if stop_on_error:
+                        conn.rollback()
+                        result['stopped'] = True
+                        break
+
+                pending += 1
+                if pending >= batch_size:
+                    conn.commit()
+                    pending = 0
+                    if progress:
+                        progress(result['statements'])
+            else:
+                conn.commit()
+        finally:
+            cursor.execute("SET UNIQUE_CHECKS = 1")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    return result
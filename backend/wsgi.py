@@ -0,0 +1,23 @@
+"""
+WSGI 進入點（正式環境）
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    python wsgi.py    # 無法使用 gunicorn 的環境（例如 Windows）改以 waitress 執行
+
+啟動前先執行一次 `flask --app app init-db` 建立資料庫與資料表。
+"""
+from app import create_app
+from config import Config, CONFIG_NAME
+
+app = create_app(CONFIG_NAME or 'production')
+
+
+if __name__ == '__main__':
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit('❌ 請安裝 waitress（pip install waitress），或使用 gunicorn -c gunicorn.conf.py wsgi:app')
+    # waitress 只有單一行程，以 worker 數 × 執行緒數作為總執行緒數
+    print(f"🚀 waitress 伺服器啟動: http://{Config.SERVER_HOST}:{Config.SERVER_PORT}/api/")
+    serve(app, host=Config.SERVER_HOST, port=Config.SERVER_PORT,
+          threads=Config.WEB_WORKERS * Config.WEB_THREADS)
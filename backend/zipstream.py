@@ -0,0 +1,75 @@
+"""
+串流式 ZIP 產生器
+
+ZIP 內容寫入一個只能附加的緩衝區，每寫入一段就把已壓縮的位元組取出交給
+呼叫端，不需要暫存檔，也不需要把整個壓縮檔放在記憶體中。
+緩衝區提供 tell() 但不能 seek，zipfile 會改以 data descriptor 記錄各項目
+的大小與 CRC，因此檔案大小不必事先知道。
+"""
+import zipfile
+
+
+class _Sink:
+    """只能附加寫入的緩衝區"""
+
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class ZipStream:
+    """
+    逐項目寫入並產生 ZIP 位元組
+
+    用法：
+        zs = ZipStream()
+        yield from zs.write_entry('a.json', chunks)
+        yield zs.close()
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED, compresslevel: int = None):
+        self.sink = _Sink()
+        self.zf = zipfile.ZipFile(self.sink, 'w', compression, compresslevel=compresslevel)
+
+    def write_entry(self, name: str, chunks):
+        """
+        寫入一個檔案項目
+
+        Args:
+            name: ZIP 內的檔名
+            chunks: 檔案內容區塊（str 以 UTF-8 編碼，或 bytes）
+
+        Yields:
+            bytes: 目前已產生的 ZIP 資料
+        """
+        # 大小未知，一律使用 ZIP64 標頭以免超過 4GB 時失敗
+        with self.zf.open(name, 'w', force_zip64=True) as f:
+            for chunk in chunks:
+                f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                data = self.sink.drain()
+                if data:
+                    yield data
+        data = self.sink.drain()
+        if data:
+            yield data
+
+    def close(self) -> bytes:
+        """寫入中央目錄，回傳最後一段 ZIP 資料"""
+        self.zf.close()
+        return self.sink.drain()
@@ -29,12 +29,14 @@ def serve_static(path):
 if __name__ == '__main__':
     # 設定 Port 為 8000，與後端的 5000 或 10000 錯開
     # host='0.0.0.0' 代表允許外部 IP (如手機、學長電腦) 連線
-    port = 8000
+    port = int(os.environ.get('FRONTEND_PORT', '8000'))
+    # 除錯模式（自動重載、錯誤頁面）只在開發時開啟：FLASK_DEBUG=false 關閉
+    debug = os.environ.get('FLASK_DEBUG', 'true').lower() == 'true'
     print(f"=================================================")
     print(f"前端伺服器已啟動！")
     print(f"本機訪問: http://127.0.0.1:{port}")
     print(f"外部訪問: http://IP:{port}")
     print(f"=================================================")
     
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=debug)
     #app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
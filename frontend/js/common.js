@@ -5,6 +5,9 @@
 // ==================== API 工具函數 ====================
 // 注意：此檔案需要在 config.js 之後載入
 
+// GET 回應的 ETag 快取（url → { etag, data }），伺服器回傳 304 時沿用
+const etagCache = new Map();
+
 async function api(endpoint, options = {}) {
     // 如果 endpoint 已經是完整 URL，直接使用
     let url = endpoint.startsWith('http') ? endpoint : endpoint;
@@ -32,14 +35,30 @@ async function api(endpoint, options = {}) {
         config.body = JSON.stringify(config.body);
     }
     
+    const cached = config.method === 'GET' ? etagCache.get(url) : null;
+    if (cached) {
+        config.headers['If-None-Match'] = cached.etag;
+        // 自行處理條件請求，略過瀏覽器 HTTP 快取才能收到 304
+        config.cache = 'no-store';
+    }
+    
     try {
         const response = await fetch(url, config);
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+        
         const data = await response.json();
         
         if (!response.ok) {
             throw new Error(data.error || '請求失敗');
         }
         
+        const etag = response.headers.get('ETag');
+        if (config.method === 'GET' && etag) {
+            etagCache.set(url, { etag, data });
+        }
+        
         return data;
     } catch (error) {
         console.error('API Error:', error);
@@ -152,11 +171,20 @@ async function handleFileUpload(files) {
             progressText.textContent = `上傳中: ${files[0].name}`;
             progressFill.style.width = '50%';
             
-            const result = await fetch(`${API_BASE}/import`, {
+            let result = await fetch(`${API_BASE}/import`, {
                 method: 'POST',
                 body: formData
             }).then(r => r.json());
             
+            // 背景匯入：輪詢工作進度直到完成
+            if (result.job_id) {
+                const job = await waitForJob(result.job_id, job => showJobProgress(job, files[0].name));
+                if (job.status !== 'succeeded') {
+                    throw new Error(job.errors.length ? job.errors[0].error : '匯入失敗');
+                }
+                result = { success: true, ...job.result };
+            }
+            
             progressFill.style.width = '100%';
             
             if (result.success) {
@@ -188,11 +216,24 @@ async function handleFileUpload(files) {
             progressText.textContent = `上傳中: ${files.length} 個檔案`;
             progressFill.style.width = '50%';
             
-            const result = await fetch(`${API_BASE}/import/bulk`, {
+            let result = await fetch(`${API_BASE}/import/bulk`, {
                 method: 'POST',
                 body: formData
             }).then(r => r.json());
             
+            if (result.error) {
+                throw new Error(result.error);
+            }
+            
+            // 背景匯入：輪詢工作進度直到完成
+            if (result.job_id) {
+                const job = await waitForJob(result.job_id, job => showJobProgress(job, `${files.length} 個檔案`));
+                result = {
+                    imported: job.result ? job.result.imported : [],
+                    errors: job.result ? job.result.errors : job.errors
+                };
+            }
+            
             progressFill.style.width = '100%';
             progressText.textContent = '上傳完成';
             
@@ -220,6 +261,33 @@ async function handleFileUpload(files) {
     }
 }
 
+// ==================== 背景工作 ====================
+
+async function waitForJob(jobId, onProgress, interval = 1000) {
+    while (true) {
+        const job = await api(`/jobs/${jobId}`);
+        if (onProgress) onProgress(job);
+        if (job.status === 'succeeded' || job.status === 'failed') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
+function showJobProgress(job, label) {
+    const progressFill = document.getElementById('progress-fill');
+    const progressText = document.getElementById('progress-text');
+    if (!progressFill || !progressText) return;
+    
+    const percent = job.total_bytes ? Math.min(100, Math.round(job.processed_bytes / job.total_bytes * 100)) : 50;
+    progressFill.style.width = `${percent}%`;
+    
+    let text = job.status === 'queued' ? `排隊中: ${label}` : `匯入中: ${label} - ${job.processed_instances} 筆`;
+    if (job.rate) text += `，${Math.round(job.rate)} 筆/秒`;
+    if (job.eta !== null && job.eta !== undefined) text += `，預估剩餘 ${Math.ceil(job.eta)} 秒`;
+    progressText.textContent = text;
+}
+
 // ==================== 工具函數 ====================
 
 function formatDate(isoString) {
@@ -6,6 +6,13 @@ let reportData = null;
 let selectedInstances = new Set();
 let REPORT_ID = null;
 
+// 漏洞 id → 漏洞摘要
+const vulnById = new Map();
+// 表格分頁狀態
+let tableNextAfter = null;
+
+const INSTANCE_PAGE_SIZE = 100;
+
 document.addEventListener('DOMContentLoaded', () => {
     // 從 URL 參數取得 report_id
     const urlParams = new URLSearchParams(window.location.search);
@@ -20,7 +27,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
 async function loadReportDetail() {
     try {
-        reportData = await api(`/reports/${REPORT_ID}`);
+        // 只取摘要（漏洞清單與實例數），實例內容依需要分頁載入
+        reportData = await api(`/reports/${REPORT_ID}/summary`);
+        vulnById.clear();
+        reportData.vulnerabilities.forEach(vuln => vulnById.set(vuln.id, vuln));
         
         // 更新標題
         document.getElementById('report-title').textContent = reportData.site_url || '報告詳情';
@@ -38,13 +48,20 @@ async function loadReportDetail() {
         buildVulnTree(reportData.vulnerabilities);
         
         // 填充漏洞表格
-        populateInstancesTable(reportData.vulnerabilities);
+        populateVulnSelect(reportData.vulnerabilities);
+        reloadInstancesTable();
         
     } catch (error) {
         showToast('載入報告失敗: ' + error.message, 'error');
     }
 }
 
+async function fetchInstances(vulnId, after, params = {}) {
+    const query = new URLSearchParams({ limit: INSTANCE_PAGE_SIZE, ...params });
+    if (after) query.set('after', after);
+    return api(`/vulnerabilities/${vulnId}/instances?${query}`);
+}
+
 // ==================== 漏洞樹 ====================
 
 function buildVulnTree(vulnerabilities) {
@@ -84,31 +101,19 @@ function buildVulnTree(vulnerabilities) {
                 <div class="tree-children">
         `;
         
+        // 漏洞節點預設收合，展開時才載入實例
         vulns.forEach(vuln => {
             html += `
                 <div class="tree-node">
-                    <div class="tree-node-header" onclick="toggleTreeNode(this)" data-vuln-id="${vuln.id}">
-                        <span class="tree-toggle expanded">▶</span>
+                    <div class="tree-node-header" onclick="toggleVulnNode(this)" data-vuln-id="${vuln.id}">
+                        <span class="tree-toggle">▶</span>
                         <span class="tree-icon">📄</span>
                         <span class="tree-label" title="${escapeHtml(vuln.title)}">${truncate(vuln.title, 30)}</span>
                         <span class="tree-count">${vuln.instance_count}</span>
                     </div>
-                    <div class="tree-children">
+                    <div class="tree-children collapsed" data-loaded="false"></div>
+                </div>
             `;
-            
-            vuln.instances.forEach(inst => {
-                html += `
-                    <div class="tree-node">
-                        <div class="tree-node-header" onclick="selectInstance(${inst.id}, this)" data-instance-id="${inst.id}">
-                            <span class="tree-toggle" style="visibility:hidden">▶</span>
-                            <span class="tree-icon">${getStatusEmoji(inst.fix_status)}</span>
-                            <span class="tree-label" title="${escapeHtml(inst.url)}">${truncate(inst.url, 40)}</span>
-                        </div>
-                    </div>
-                `;
-            });
-            
-            html += '</div></div>';
         });
         
         html += '</div></div>';
@@ -117,6 +122,56 @@ function buildVulnTree(vulnerabilities) {
     container.innerHTML = html;
 }
 
+function renderTreeInstances(instances) {
+    return instances.map(inst => `
+        <div class="tree-node">
+            <div class="tree-node-header" onclick="selectInstance(${inst.id}, this)" data-instance-id="${inst.id}">
+                <span class="tree-toggle" style="visibility:hidden">▶</span>
+                <span class="tree-icon">${getStatusEmoji(inst.fix_status)}</span>
+                <span class="tree-label" title="${escapeHtml(inst.url)}">${truncate(inst.url, 40)}</span>
+            </div>
+        </div>
+    `).join('');
+}
+
+async function loadTreeInstances(children, vulnId, after = null) {
+    try {
+        const page = await fetchInstances(vulnId, after);
+        children.querySelector('.tree-load-more')?.remove();
+        children.insertAdjacentHTML('beforeend', renderTreeInstances(page.instances));
+        if (page.next_after) {
+            children.insertAdjacentHTML('beforeend', `
+                <div class="tree-node tree-load-more">
+                    <div class="tree-node-header" onclick="loadTreeInstances(this.closest('.tree-children'), ${vulnId}, ${page.next_after})">
+                        <span class="tree-toggle" style="visibility:hidden">▶</span>
+                        <span class="tree-label">載入更多...</span>
+                    </div>
+                </div>
+            `);
+        }
+        children.dataset.loaded = 'true';
+    } catch (error) {
+        showToast('載入實例失敗: ' + error.message, 'error');
+    }
+}
+
+function toggleVulnNode(header) {
+    const children = header.nextElementSibling;
+    toggleTreeNode(header);
+    
+    // 表格同步切換到此漏洞
+    const select = document.getElementById('table-vuln');
+    if (select.value !== header.dataset.vulnId) {
+        select.value = header.dataset.vulnId;
+        reloadInstancesTable();
+    }
+
+    if (children.dataset.loaded === 'false' && !children.classList.contains('collapsed')) {
+        children.dataset.loaded = 'loading';
+        loadTreeInstances(children, parseInt(header.dataset.vulnId));
+    }
+}
+
 function toggleTreeNode(header) {
     const toggle = header.querySelector('.tree-toggle');
     const children = header.nextElementSibling;
@@ -128,8 +183,12 @@ function toggleTreeNode(header) {
 }
 
 function expandAll() {
-    document.querySelectorAll('.tree-children').forEach(el => el.classList.remove('collapsed'));
-    document.querySelectorAll('.tree-toggle').forEach(el => el.classList.add('expanded'));
+    // 只展開已載入實例的節點，未載入的漏洞節點仍需點擊展開
+    document.querySelectorAll('.tree-children').forEach(el => {
+        if (el.dataset.loaded === 'false') return;
+        el.classList.remove('collapsed');
+        el.previousElementSibling.querySelector('.tree-toggle').classList.add('expanded');
+    });
 }
 
 function collapseAll() {
@@ -137,28 +196,17 @@ function collapseAll() {
     document.querySelectorAll('.tree-toggle').forEach(el => el.classList.remove('expanded'));
 }
 
-function selectInstance(instanceId, element) {
+async function selectInstance(instanceId, element) {
     // 移除其他選中狀態
     document.querySelectorAll('.tree-node-header.selected').forEach(el => el.classList.remove('selected'));
-    element.classList.add('selected');
+    element?.classList.add('selected');
     
-    // 找到對應的實例資料
-    let instance = null;
-    let vulnInfo = null;
-    
-    for (const vuln of reportData.vulnerabilities) {
-        for (const inst of vuln.instances) {
-            if (inst.id === instanceId) {
-                instance = inst;
-                vulnInfo = vuln;
-                break;
-            }
-        }
-        if (instance) break;
-    }
-    
-    if (instance) {
-        showInstanceDetail(instance, vulnInfo);
+    // 完整內容（含 evidence 等大型欄位）只在點選時取得
+    try {
+        const instance = await api(`/instances/${instanceId}`);
+        showInstanceDetail(instance, instance.vulnerability);
+    } catch (error) {
+        showToast('載入實例失敗: ' + error.message, 'error');
     }
 }
 
@@ -243,26 +291,79 @@ function showInstanceDetail(instance, vulnInfo) {
 
 // ==================== 漏洞表格 ====================
 
-function populateInstancesTable(vulnerabilities) {
+function populateVulnSelect(vulnerabilities) {
+    const select = document.getElementById('table-vuln');
+    const current = parseInt(select.value);
+    select.innerHTML = vulnerabilities.map(vuln => `
+        <option value="${vuln.id}">${getSeverityEmoji(vuln.severity)} ${escapeHtml(truncate(vuln.title, 60))} (${vuln.instance_count})</option>
+    `).join('');
+    if (vulnById.has(current)) {
+        select.value = current;
+    }
+}
+
+function getTableFilters() {
+    const params = {};
+    const status = document.getElementById('table-status').value;
+    const url = document.getElementById('table-url').value.trim();
+    if (status) params.status = status;
+    if (url) params.url = url;
+    return params;
+}
+
+async function reloadInstancesTable() {
+    document.getElementById('instances-tbody').innerHTML = '';
+    document.getElementById('select-all').checked = false;
+    tableNextAfter = null;
+    updateSelection();
+    await loadMoreInstances();
+}
+
+async function loadMoreInstances() {
     const tbody = document.getElementById('instances-tbody');
-    let html = '';
+    const vulnId = parseInt(document.getElementById('table-vuln').value);
+    const vuln = vulnById.get(vulnId);
     
-    vulnerabilities.forEach(vuln => {
-        vuln.instances.forEach(inst => {
-            html += `
-                <tr>
-                    <td><input type="checkbox" class="instance-checkbox" value="${inst.id}" onchange="updateSelection()"></td>
-                    <td><span class="severity-badge ${vuln.severity}">${getSeverityEmoji(vuln.severity)}</span></td>
-                    <td title="${escapeHtml(vuln.title)}">${truncate(vuln.title, 40)}</td>
-                    <td title="${escapeHtml(inst.url)}" style="font-family: var(--font-mono); font-size: 12px;">${truncate(inst.url, 50)}</td>
-                    <td><span class="status-badge ${inst.fix_status}">${getStatusEmoji(inst.fix_status)} ${getStatusLabel(inst.fix_status)}</span></td>
-                    <td><button class="btn btn-xs" onclick="openStatusModal(${inst.id})">編輯</button></td>
-                </tr>
-            `;
-        });
-    });
+    if (!vuln) {
+        tbody.innerHTML = '<tr><td colspan="6" class="loading">無漏洞實例</td></tr>';
+        document.getElementById('instances-more').style.display = 'none';
+        return;
+    }
     
-    tbody.innerHTML = html || '<tr><td colspan="6" class="loading">無漏洞實例</td></tr>';
+    try {
+        const page = await fetchInstances(vulnId, tableNextAfter, getTableFilters());
+        tableNextAfter = page.next_after;
+        
+        const html = page.instances.map(inst => `
+            <tr>
+                <td><input type="checkbox" class="instance-checkbox" value="${inst.id}" onchange="updateSelection()"></td>
+                <td><span class="severity-badge ${vuln.severity}">${getSeverityEmoji(vuln.severity)}</span></td>
+                <td title="${escapeHtml(vuln.title)}">${truncate(vuln.title, 40)}</td>
+                <td title="${escapeHtml(inst.url)}" style="font-family: var(--font-mono); font-size: 12px; cursor: pointer;" onclick="selectInstance(${inst.id})">${truncate(inst.url, 50)}</td>
+                <td><span class="status-badge ${inst.fix_status}">${getStatusEmoji(inst.fix_status)} ${getStatusLabel(inst.fix_status)}</span></td>
+                <td><button class="btn btn-xs" onclick="openStatusModal(${inst.id})">編輯</button></td>
+            </tr>
+        `).join('');
+        tbody.insertAdjacentHTML('beforeend', html);
+        
+        if (!tbody.children.length) {
+            tbody.innerHTML = '<tr><td colspan="6" class="loading">無漏洞實例</td></tr>';
+        }
+        document.getElementById('instances-more').style.display = tableNextAfter ? 'flex' : 'none';
+    } catch (error) {
+        showToast('載入實例失敗: ' + error.message, 'error');
+    }
+}
+
+async function refreshInstances() {
+    // 狀態變更後重新載入表格與已展開的樹節點
+    reloadInstancesTable();
+    document.querySelectorAll('#vuln-tree [data-vuln-id]').forEach(header => {
+        const children = header.nextElementSibling;
+        if (children.dataset.loaded !== 'true') return;
+        children.innerHTML = '';
+        loadTreeInstances(children, parseInt(header.dataset.vulnId));
+    });
 }
 
 function toggleSelectAll() {
@@ -286,19 +387,18 @@ function updateSelection() {
 
 // ==================== 狀態更新 ====================
 
-function openStatusModal(instanceId) {
+async function openStatusModal(instanceId) {
     document.getElementById('status-instance-id').value = instanceId;
     
-    // 找到對應的實例資料
-    for (const vuln of reportData.vulnerabilities) {
-        for (const inst of vuln.instances) {
-            if (inst.id === instanceId) {
-                document.getElementById('status-select').value = inst.fix_status;
-                document.getElementById('status-fixed-by').value = inst.fixed_by || '';
-                document.getElementById('status-notes').value = inst.fix_notes || '';
-                break;
-            }
-        }
+    // 列表未包含備註，需取得完整內容
+    try {
+        const inst = await api(`/instances/${instanceId}`);
+        document.getElementById('status-select').value = inst.fix_status;
+        document.getElementById('status-fixed-by').value = inst.fixed_by || '';
+        document.getElementById('status-notes').value = inst.fix_notes || '';
+    } catch (error) {
+        showToast('載入實例失敗: ' + error.message, 'error');
+        return;
     }
     
     openModal('status-modal');
@@ -318,7 +418,7 @@ async function submitStatusUpdate() {
         
         showToast('狀態已更新');
         closeModal('status-modal');
-        loadReportDetail();
+        refreshInstances();
     } catch (error) {
         showToast('更新失敗: ' + error.message, 'error');
     }
@@ -337,7 +437,7 @@ async function batchUpdateStatus() {
     }
     
     try {
-        await api('/instances/batch-status', {
+        const result = await api('/instances/batch-status', {
             method: 'PUT',
             body: JSON.stringify({
                 instance_ids: Array.from(selectedInstances),
@@ -345,9 +445,9 @@ async function batchUpdateStatus() {
             })
         });
         
-        showToast(`已更新 ${selectedInstances.size} 個項目`);
+        showToast(`已更新 ${result.updated_count} 個項目`);
         document.getElementById('batch-status').value = '';
-        loadReportDetail();
+        refreshInstances();
     } catch (error) {
         showToast('批次更新失敗: ' + error.message, 'error');
     }
@@ -2,6 +2,8 @@
  * 報告列表頁面 JavaScript
  */
 
+// cursors[i] 為第 i+1 頁的游標（第一頁為 null）
+let cursors = [null];
 let currentPage = 1;
 let currentSearch = '';
 
@@ -15,24 +17,32 @@ document.addEventListener('DOMContentLoaded', () => {
 });
 
 async function loadReports(page = 1) {
+    if (page === 1) {
+        cursors = [null];
+    }
     currentPage = page;
     const tbody = document.getElementById('reports-tbody');
     tbody.innerHTML = '<tr><td colspan="5" class="loading">載入中...</td></tr>';
     
     try {
         const params = new URLSearchParams({
-            page: page,
-            per_page: 20
+            per_page: 20,
+            include_total: 1
         });
         
+        if (cursors[page - 1]) {
+            params.append('cursor', cursors[page - 1]);
+        }
         if (currentSearch) {
             params.append('search', currentSearch);
         }
         
         const data = await api(`/reports?${params}`);
+        cursors[page] = data.next_cursor;
         
         if (!data.reports.length) {
             tbody.innerHTML = '<tr><td colspan="5" class="loading">尚無報告</td></tr>';
+            document.getElementById('pagination').innerHTML = '';
             return;
         }
         
@@ -58,7 +68,7 @@ async function loadReports(page = 1) {
         `).join('');
         
         // 更新分頁
-        updatePagination(data.current_page, data.pages, data.total);
+        updatePagination(page, data.next_cursor, data.total);
         
     } catch (error) {
         tbody.innerHTML = `<tr><td colspan="5" class="loading">載入失敗: ${error.message}</td></tr>`;
@@ -66,30 +76,20 @@ async function loadReports(page = 1) {
     }
 }
 
-function updatePagination(current, total, count) {
+function updatePagination(current, nextCursor, count) {
     const container = document.getElementById('pagination');
     
-    if (total <= 1) {
-        container.innerHTML = `<span style="color: var(--text-muted);">共 ${count} 筆</span>`;
-        return;
-    }
-    
     let html = `<span style="color: var(--text-muted); margin-right: 16px;">共 ${count} 筆</span>`;
     
-    // 上一頁
-    html += `<button class="btn btn-sm" ${current === 1 ? 'disabled' : ''} onclick="loadReports(${current - 1})">←</button>`;
-    
-    // 頁碼
-    for (let i = 1; i <= total; i++) {
-        if (i === 1 || i === total || (i >= current - 2 && i <= current + 2)) {
-            html += `<button class="btn btn-sm ${i === current ? 'active' : ''}" onclick="loadReports(${i})">${i}</button>`;
-        } else if (i === current - 3 || i === current + 3) {
-            html += '<span style="color: var(--text-muted);">...</span>';
-        }
+    if (current === 1 && !nextCursor) {
+        container.innerHTML = html;
+        return;
     }
     
-    // 下一頁
-    html += `<button class="btn btn-sm" ${current === total ? 'disabled' : ''} onclick="loadReports(${current + 1})">→</button>`;
+    // 游標分頁只能逐頁前後移動
+    html += `<button class="btn btn-sm" ${current === 1 ? 'disabled' : ''} onclick="loadReports(${current - 1})">←</button>`;
+    html += `<span style="color: var(--text-muted);">第 ${current} 頁</span>`;
+    html += `<button class="btn btn-sm" ${nextCursor ? '' : 'disabled'} onclick="loadReports(${current + 1})">→</button>`;
     
     container.innerHTML = html;
 }